@@ -5,7 +5,6 @@ Creates and configures the Flask application
 
 import os
 from flask import Flask
-from flask_mail import Mail
 from flask_migrate import Migrate
 from flask_babel import Babel
 from flask_login import LoginManager
@@ -15,6 +14,16 @@ from config import get_config, print_config_status
 from db import db
 from db.models import User
 from routes.send_sms import test_sms_connection
+from utils.outbox import init_outbox
+from utils.blog_related import init_related_posts
+from utils.write_queue import init_write_queue
+from utils.sqlite_engine import init_sqlite_engine
+from db.routing import init_read_replica
+from utils.schema_migration import schema_cli
+from utils.archive import archive_cli
+from utils.backup import backup_cli
+from utils.blog_store import blog_cli
+from utils.mail_pool import PooledMail
 
 
 def create_app(config_name=None):
@@ -62,6 +71,15 @@ def create_app(config_name=None):
     # Initialize database
     initialize_database(app)
     
+    # Start the group-commit writer (if SQLITE_GROUP_COMMIT is on)
+    init_write_queue(app)
+    
+    # Start the notification outbox workers (booking emails/SMS)
+    init_outbox(app)
+    
+    # Start the related blog posts rebuild worker
+    init_related_posts(app)
+    
     return app
 
 
@@ -70,15 +88,21 @@ def initialize_extensions(app):
     
     # Database
     db.init_app(app)
+    init_sqlite_engine(app)
+    init_read_replica(app)
     
     # Migration
     migrate = Migrate(app, db)
+    app.cli.add_command(schema_cli)  # flask schema status|migrate|rebuild
+    app.cli.add_command(archive_cli)  # flask archive run
+    app.cli.add_command(backup_cli)  # flask backup create|list|prune|restore
+    app.cli.add_command(blog_cli)  # flask blog import|export|reindex|related
     
     # Babel for internationalization
     babel = Babel(app)
     
-    # Mail
-    mail = Mail(app)
+    # Mail (pooled SMTP connections, same API as Flask-Mail's Mail)
+    mail = PooledMail(app)
     app.mail = mail  # Make mail available globally for blueprints
     
     # Login Manager
@@ -177,10 +201,10 @@ def initialize_database(app):
             # Ensure the instance directory exists
             os.makedirs(app.instance_path, exist_ok=True)
             
-            # Try to create all tables
-            db.create_all()
+            # Apply Alembic migrations (or create a new database)
+            upgrade_database()
             
-            # Check and fix database schema if needed
+            # Report anything the migrations do not cover
             check_database_schema()
             
             # Insert default data
@@ -190,39 +214,47 @@ def initialize_database(app):
             
         except Exception as e:
             print(f"❌ Database initialization error: {e}")
-            print("🔄 Recreating database...")
-            try:
-                os.makedirs(app.instance_path, exist_ok=True)
-                db.drop_all()
-                db.create_all()
-                insert_default_data()
-                print("✅ Database recreated successfully")
-            except Exception as e2:
-                print(f"❌ Failed to recreate database: {e2}")
+            db.session.rollback()
+            print("   Run 'flask db upgrade' (or 'flask schema migrate' for a database outside Alembic), "
+                  "then restart")
+
+
+def upgrade_database():
+    """Bring an Alembic-managed database to the newest revision; create and stamp a new one"""
+    
+    import sqlalchemy as sa
+    from flask_migrate import upgrade, stamp
+    
+    migrations = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+    tables = set(sa.inspect(db.engine).get_table_names())
+    
+    if 'alembic_version' in tables:
+        upgrade(directory=migrations)
+    elif not tables:
+        db.create_all()
+        stamp(directory=migrations)
+        print("✅ New database created from the models")
+    else:
+        # Predates Alembic: add missing tables only; columns are reported below
+        db.create_all()
 
 
 def check_database_schema():
-    """Check and fix database schema issues"""
+    """Report differences between the models and the database (nothing is changed here)"""
     
-    from sqlalchemy import inspect
-    from db.models import Booking
+    from utils.schema_migration import report_schema_drift
+    from utils.blog_store import ensure_fts_index
+    from utils.blog_related import ensure_related_posts
     
-    inspector = inspect(db.engine)
-    if 'booking' in inspector.get_table_names():
-        columns = inspector.get_columns('booking')
-        column_names = [col['name'] for col in columns]
-        
-        if 'service_id' not in column_names:
-            print("⚠️ Missing service_id column. Recreating database...")
-            db.drop_all()
-            db.create_all()
-            print("✅ Database recreated with service_id column")
+    report_schema_drift(db.engine)
+    ensure_fts_index()  # Blog search table (not created by create_all)
+    ensure_related_posts()
 
 
 def insert_default_data():
     """Insert default data if missing"""
     
-    from db.models import Role, User, SiteSetting, EmailTemplate, Service
+    from db.models import Role, User, SiteSetting, EmailTemplate, Service, BlogPost
     from utils.site_settings import create_or_update_setting
     from werkzeug.security import generate_password_hash
     
@@ -322,3 +354,11 @@ If you need to reschedule or have any questions, please contact us.""",
         
         db.session.commit()
         print("✅ Default services created")
+    
+    # Import the built-in blog posts if the blog is empty
+    if not BlogPost.query.first():
+        from features.blog.blog import load_blog_data
+        from utils.blog_store import import_posts
+        
+        import_posts(load_blog_data()['posts'])
+        print("✅ Default blog posts imported")
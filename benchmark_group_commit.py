@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the group-commit writer against direct SQLite commits
+Serves a small app with werkzeug's threaded server (threaded=True, as in
+development) on a temporary SQLite file and POSTs testimonials from many
+client threads, first with every request committing on its own, then with
+SQLITE_GROUP_COMMIT. Every tenth request fails inside its write unit to
+check that a failing unit only rolls back itself.
+
+Usage: python benchmark_group_commit.py [number_of_requests] [client_threads]
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from db import db
+from db.models import Testimonial
+from utils.write_queue import run_write, init_write_queue, stop_write_queue, get_write_queue_status
+
+FAIL_EVERY = 10
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def save_testimonial(number):
+    db.session.add(Testimonial(
+        client_name=f"Client {number}",
+        testimonial_text="Group commit benchmark",
+        rating=5,
+        is_approved=True
+    ))
+    db.session.flush()
+    if number % FAIL_EVERY == 0:
+        raise ValueError(f"Rejected testimonial {number}")
+    return number
+
+
+def make_app(db_path, group_commit):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_path}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SQLITE_GROUP_COMMIT=group_commit,
+        GROUP_COMMIT_MAX_DELAY_MS=2
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    @app.route("/write", methods=["POST"])
+    def write():
+        number = int(request.form['number'])
+        try:
+            return jsonify({"saved": run_write(save_testimonial, number)}), 201
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    init_write_queue(app)
+    return app
+
+
+def post_many(port, count, threads):
+    statuses = {}
+    lock = threading.Lock()
+
+    def post_one(number):
+        data = f"number={number}".encode()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/write", data=data, timeout=30) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            status = 'error'
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(post_one, range(1, count + 1)))
+    return time.perf_counter() - started, statuses
+
+
+def run(label, group_commit, count, threads):
+    handle, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    try:
+        app = make_app(db_path, group_commit)
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        elapsed, statuses = post_many(server.server_port, count, threads)
+        writer_stats = get_write_queue_status()
+
+        server.shutdown()
+        stop_write_queue()
+        with app.app_context():
+            stored = Testimonial.query.count()
+            db.engine.dispose()
+    finally:
+        os.remove(db_path)
+
+    committed = statuses.get(201, 0)
+    print(f"   {label:<13} {count} requests in {elapsed:.2f}s "
+          f"({committed / elapsed:.0f} commits/s, statuses {statuses})")
+    if writer_stats:
+        print(f"   {'':<13} {writer_stats['commits']} group commits, "
+              f"{writer_stats['units_per_commit']} writes per commit, largest group {writer_stats['largest_group']}")
+
+    expected = count - count // FAIL_EVERY
+    if committed != expected or stored != expected:
+        print(f"   ❌ {label}: {committed} committed responses, {stored} rows stored, expected {expected}")
+        return False, committed / elapsed
+    return True, committed / elapsed
+
+
+def benchmark_group_commit(count=1000, threads=32):
+    print(f"🧪 Benchmarking group commit ({count} POSTs from {threads} client threads)...")
+
+    direct_passed, direct_rate = run("Direct", False, count, threads)
+    group_passed, group_rate = run("Group commit", True, count, threads)
+
+    if direct_rate:
+        print(f"📊 Group commit: {group_rate / direct_rate:.1f}x the commits/s of direct commits")
+
+    all_passed = direct_passed and group_passed
+    print("🎉 Group commit benchmark passed!" if all_passed else "❌ Group commit benchmark failed")
+    return all_passed
+
+
+if __name__ == "__main__":
+    number_of_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    client_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    sys.exit(0 if benchmark_group_commit(number_of_requests, client_threads) else 1)
@@ -2,32 +2,33 @@
 """
 Blog Management Utility
 Easily add, edit, and manage blog posts for the Serenity Wellness Studio blog
+(stored in the blog_posts table; use 'flask blog export' for a JSON copy)
 """
 
-import json
 import os
-from datetime import datetime
+from datetime import date
 from typing import Dict, List, Optional
 
-BLOG_DATA_FILE = 'blog_data.json'
+from flask import Flask
 
-def load_blog_data() -> Dict:
-    """Load blog posts from JSON file"""
-    if os.path.exists(BLOG_DATA_FILE):
-        with open(BLOG_DATA_FILE, 'r') as f:
-            return json.load(f)
-    return {"posts": []}
+from config import get_config, database_uri
+from db import db
+from db.models import BlogPost
+from utils.sqlite_engine import init_sqlite_engine
+import utils.blog_store  # Keeps the blog search index in step with these edits
 
-def save_blog_data(data: Dict) -> None:
-    """Save blog posts to JSON file"""
-    with open(BLOG_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def setup_app():
+    """Setup Flask app context for database access"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PRAGMAS'] = get_config().SQLITE_PRAGMAS  # Same tuning as the web app
 
-def get_next_post_id(data: Dict) -> int:
-    """Get the next available post ID"""
-    if not data.get('posts'):
-        return 1
-    return max(post['id'] for post in data['posts']) + 1
+    db.init_app(app)
+    init_sqlite_engine(app)
+    return app
 
 def create_slug(title: str) -> str:
     """Create a URL-friendly slug from title"""
@@ -50,78 +51,72 @@ def add_blog_post(
 ) -> Dict:
     """Add a new blog post"""
     
-    data = load_blog_data()
-    
-    new_post = {
-        "id": get_next_post_id(data),
-        "title": title,
-        "slug": create_slug(title),
-        "category": category,
-        "excerpt": excerpt,
-        "content": content,
-        "author": author,
-        "published_date": datetime.now().strftime("%Y-%m-%d"),
-        "tags": tags or [],
-        "featured_image": featured_image,
-        "read_time": read_time,
-        "published": published
-    }
-    
-    data['posts'].append(new_post)
-    save_blog_data(data)
+    post = BlogPost(
+        title=title,
+        slug=create_slug(title),
+        category=category,
+        excerpt=excerpt,
+        content=content,
+        author=author,
+        published_date=date.today(),
+        featured_image=featured_image,
+        read_time=read_time,
+        published=published
+    )
+    post.tags = tags or []
+    db.session.add(post)
+    db.session.commit()
     
     print(f"✅ Blog post '{title}' added successfully!")
-    print(f"   Slug: {new_post['slug']}")
-    print(f"   URL: /blog/post/{new_post['slug']}")
+    print(f"   Slug: {post.slug}")
+    print(f"   URL: /blog/post/{post.slug}")
     
-    return new_post
+    return post.to_dict()
 
 def list_blog_posts() -> None:
     """List all blog posts"""
-    data = load_blog_data()
+    posts = BlogPost.query.order_by(BlogPost.id).all()
     
-    if not data.get('posts'):
+    if not posts:
         print("No blog posts found.")
         return
     
     print("\n📚 Blog Posts:")
     print("=" * 60)
     
-    for post in data['posts']:
-        status = "✅ Published" if post.get('published', False) else "❌ Draft"
-        print(f"ID: {post['id']}")
-        print(f"Title: {post['title']}")
-        print(f"Slug: {post['slug']}")
-        print(f"Category: {post['category']}")
-        print(f"Author: {post['author']}")
-        print(f"Date: {post['published_date']}")
+    for post in posts:
+        status = "✅ Published" if post.published else "❌ Draft"
+        print(f"ID: {post.id}")
+        print(f"Title: {post.title}")
+        print(f"Slug: {post.slug}")
+        print(f"Category: {post.category}")
+        print(f"Author: {post.author}")
+        print(f"Date: {post.published_date}")
         print(f"Status: {status}")
-        print(f"Tags: {', '.join(post['tags'])}")
+        print(f"Tags: {', '.join(post.tags)}")
         print("-" * 60)
 
 def delete_blog_post(post_id: int) -> None:
     """Delete a blog post by ID"""
-    data = load_blog_data()
+    post = db.session.get(BlogPost, post_id)
     
-    original_count = len(data['posts'])
-    data['posts'] = [post for post in data['posts'] if post['id'] != post_id]
-    
-    if len(data['posts']) < original_count:
-        save_blog_data(data)
+    if post:
+        db.session.delete(post)
+        db.session.commit()
         print(f"✅ Blog post with ID {post_id} deleted successfully!")
     else:
         print(f"❌ Blog post with ID {post_id} not found.")
 
 def update_blog_post(post_id: int, **updates) -> None:
     """Update a blog post by ID"""
-    data = load_blog_data()
+    post = db.session.get(BlogPost, post_id)
     
-    for post in data['posts']:
-        if post['id'] == post_id:
-            post.update(updates)
-            save_blog_data(data)
-            print(f"✅ Blog post with ID {post_id} updated successfully!")
-            return
+    if post:
+        for field, value in updates.items():
+            setattr(post, field, value)
+        db.session.commit()
+        print(f"✅ Blog post with ID {post_id} updated successfully!")
+        return
     
     print(f"❌ Blog post with ID {post_id} not found.")
 
@@ -245,4 +240,5 @@ def main():
             print("❌ Invalid choice! Please select 1-5.")
 
 if __name__ == "__main__":
-    main()
+    with setup_app().app_context():
+        main()
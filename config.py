@@ -5,6 +5,7 @@ Centralized configuration for the Flask application
 
 import os
 import json
+from sqlalchemy.engine import make_url
 
 
 def load_facebook_credentials():
@@ -25,6 +26,56 @@ def load_facebook_credentials():
     return {}
 
 
+def _normalize_uri(uri):
+    # Hosting providers often hand out postgres://, which SQLAlchemy 2 no longer accepts
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def database_uri(instance_path):
+    """
+    Database URI from SQLALCHEMY_DATABASE_URI or DATABASE_URL, falling back
+    to data.sqlite in the instance folder
+    """
+    uri = os.environ.get('SQLALCHEMY_DATABASE_URI') or os.environ.get('DATABASE_URL')
+    if uri:
+        return _normalize_uri(uri)
+    
+    os.makedirs(instance_path, exist_ok=True)
+    return f"sqlite:///{os.path.join(instance_path, 'data.sqlite')}"
+
+
+def pool_options(app, uri=None):
+    """
+    Connection pool settings for server databases (PostgreSQL)
+
+    SQLite keeps SQLAlchemy's defaults: its connections are cheap and the
+    pragmas in SQLITE_PRAGMAS do the tuning.
+    """
+    if (uri or app.config['SQLALCHEMY_DATABASE_URI']).startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING']
+    }
+
+
+def replica_binds(app):
+    """
+    SQLALCHEMY_BINDS with the read replica from DATABASE_REPLICA_URL (see
+    db/routing.py), or no binds when there is no replica
+    """
+    uri = os.environ.get('DATABASE_REPLICA_URL')
+    if not uri:
+        return {}
+    uri = _normalize_uri(uri)
+    return {'replica': {'url': uri, **pool_options(app, uri)}}
+
+
 class Config:
     """Base configuration class"""
     
@@ -34,6 +85,38 @@ class Config:
     # Database
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool for PostgreSQL (per process: size it so that
+    # processes x (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under max_connections)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))   # Seconds, below server/proxy idle timeouts
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    
+    # Read replica (DATABASE_REPLICA_URL): GET requests read from it, except
+    # for a client's requests this many seconds after its own write
+    DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', 10))
+    
+    # SQLite pragmas applied to every connection (utils/sqlite_engine.py).
+    # WAL lets readers run alongside the writer, and synchronous=NORMAL is
+    # durable against application crashes in WAL mode (a power loss can drop
+    # the last commits, never corrupt the file)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 16000)),     # Negative = KiB
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024)),
+        'temp_store': 'MEMORY'
+    }
+    
+    # Group commit: request threads hand write transactions to one writer
+    # thread that commits them together (SQLite only)
+    SQLITE_GROUP_COMMIT = os.environ.get('SQLITE_GROUP_COMMIT', 'False').lower() == 'true'
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 2))
+    GROUP_COMMIT_TIMEOUT = float(os.environ.get('GROUP_COMMIT_TIMEOUT', 10))
+    
     # Session
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
@@ -49,6 +132,47 @@ class Config:
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@holisticweb.com')
     MAIL_TIMEOUT = 10
     
+    # SMTP connection pool (sessions are kept open and reused between sends)
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE', 3))
+    MAIL_POOL_IDLE_SECONDS = int(os.environ.get('MAIL_POOL_IDLE_SECONDS', 45))
+    MAIL_POOL_MAX_MESSAGES = int(os.environ.get('MAIL_POOL_MAX_MESSAGES', 100))
+    
+    # SMS reminders (minutes before the booking starts, e.g. "1440,30" = 24h and 30m)
+    REMINDER_OFFSETS_MINUTES = [int(offset) for offset in os.environ.get('REMINDER_OFFSETS_MINUTES', '1440,30').split(',') if offset.strip()]
+    SMS_MAX_CONCURRENCY = int(os.environ.get('SMS_MAX_CONCURRENCY', 4))
+    SMS_RATE_PER_SECOND = float(os.environ.get('SMS_RATE_PER_SECOND', 1.0))
+    
+    # Notification outbox (booking emails/SMS are sent by a background worker pool)
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 2))
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 20))
+    NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 5))
+    
+    # Live booking stream (SSE): each open stream holds a server thread, so
+    # streams are capped and closed after a while (the browser reconnects)
+    BOOKING_STREAM_MAX_CLIENTS = int(os.environ.get('BOOKING_STREAM_MAX_CLIENTS', 20))
+    BOOKING_STREAM_MAX_SECONDS = float(os.environ.get('BOOKING_STREAM_MAX_SECONDS', 300))
+    BOOKING_STREAM_IDLE_SECONDS = float(os.environ.get('BOOKING_STREAM_IDLE_SECONDS', 60))
+    
+    # Archive tier: bookings that ended and content posted longer ago than
+    # this move to the archive tables (ARCHIVE_INTERVAL_HOURS=0 disables the mover)
+    BOOKING_ARCHIVE_DAYS = int(os.environ.get('BOOKING_ARCHIVE_DAYS', 90))
+    CONTENT_ARCHIVE_DAYS = int(os.environ.get('CONTENT_ARCHIVE_DAYS', 30))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', 24))
+    
+    # Online SQLite backups (BACKUP_DIR defaults to instance/backups;
+    # BACKUP_INTERVAL_HOURS=0 disables the scheduled job)
+    BACKUP_DIR = os.environ.get('BACKUP_DIR')
+    BACKUP_INTERVAL_HOURS = float(os.environ.get('BACKUP_INTERVAL_HOURS', 24))
+    BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 7))
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 1024))
+    BACKUP_STEP_SLEEP_MS = int(os.environ.get('BACKUP_STEP_SLEEP_MS', 50))
+    
+    # Related blog posts: neighbours stored per post, and how long edits must
+    # pause before they are recomputed (-1 recomputes at commit, in the request)
+    BLOG_RELATED_TOP_K = int(os.environ.get('BLOG_RELATED_TOP_K', 6))
+    BLOG_RELATED_REBUILD_DELAY_SECONDS = float(os.environ.get('BLOG_RELATED_REBUILD_DELAY_SECONDS', 5))
+    
     # Facebook Configuration - Load from environment variables or creds.json
     @property
     def facebook_config(self):
@@ -89,30 +213,49 @@ class DevelopmentConfig(Config):
     def init_app(cls, app):
         Config.init_app(app)
         
-        # Set up database path for development
-        os.makedirs(app.instance_path, exist_ok=True)
-        db_path = os.path.join(app.instance_path, 'data.sqlite')
-        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+        # Database from the environment, or the SQLite file in the instance folder
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(app.instance_path)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options(app)
+        app.config['SQLALCHEMY_BINDS'] = replica_binds(app)
 
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     
+    SQLITE_PRAGMAS = dict(
+        Config.SQLITE_PRAGMAS,
+        cache_size=-int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64000)),
+        mmap_size=int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    )
+    
     @classmethod
     def init_app(cls, app):
         Config.init_app(app)
         
-        # Set up database path for production
-        os.makedirs(app.instance_path, exist_ok=True)
-        db_path = os.path.join(app.instance_path, 'data.sqlite')
-        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+        # Database from the environment, or the SQLite file in the instance folder
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(app.instance_path)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options(app)
+        app.config['SQLALCHEMY_BINDS'] = replica_binds(app)
 
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # e.g. TEST_DATABASE_URL=postgresql://localhost/holisticweb_test to test against a local Postgres
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite:///:memory:')
+    NOTIFICATION_WORKERS = 0
+    SQLITE_GROUP_COMMIT = False
+    SQLITE_PRAGMAS = {}  # In-memory database: nothing to tune
+    ARCHIVE_INTERVAL_HOURS = 0
+    BACKUP_INTERVAL_HOURS = 0
+    BLOG_RELATED_REBUILD_DELAY_SECONDS = -1
+    
+    @classmethod
+    def init_app(cls, app):
+        Config.init_app(app)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options(app)
+        app.config['SQLALCHEMY_BINDS'] = replica_binds(app)
 
 
 # Configuration mapping
@@ -134,16 +277,41 @@ def print_config_status(app):
     print("\n" + "="*60)
     print("📁 APPLICATION CONFIGURATION")
     print("="*60)
-    print(f"📁 Database path: {app.config.get('SQLALCHEMY_DATABASE_URI', 'Not set')}")
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    print(f"📁 Database: {make_url(uri).render_as_string(hide_password=True) if uri else 'Not set'}")
+    engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    if 'pool_size' in engine_options:
+        print(f"🔌 Connection pool: {engine_options['pool_size']} + {engine_options['max_overflow']} overflow, "
+              f"recycle {engine_options['pool_recycle']}s, pre-ping {'on' if engine_options['pool_pre_ping'] else 'off'}")
+    replica = (app.config.get('SQLALCHEMY_BINDS') or {}).get('replica')
+    if replica:
+        print(f"📖 Read replica: {make_url(replica['url']).render_as_string(hide_password=True)}")
     print(f"📁 Instance path: {app.instance_path}")
     print(f"🔧 Debug mode: {app.config.get('DEBUG', False)}")
     print(f"🔒 Secret key: {'✅ Set' if app.config.get('SECRET_KEY') != 'your-very-secret-key' else '⚠️ Default'}")
+    if (uri or '').startswith('sqlite'):
+        pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+        print("⚙️ SQLite pragmas: " + (", ".join(f"{name}={value}" for name, value in pragmas.items()) or "defaults"))
+    if app.config.get('SQLITE_GROUP_COMMIT'):
+        print(f"✍️ Group commit: on (up to {app.config.get('GROUP_COMMIT_MAX_BATCH')} writes, "
+              f"{app.config.get('GROUP_COMMIT_MAX_DELAY_MS')}ms max delay)")
+    else:
+        print("✍️ Group commit: off")
+    if app.config.get('ARCHIVE_INTERVAL_HOURS'):
+        print(f"🗄️ Archive: bookings after {app.config.get('BOOKING_ARCHIVE_DAYS')} days, posted content after "
+              f"{app.config.get('CONTENT_ARCHIVE_DAYS')} days (every {app.config.get('ARCHIVE_INTERVAL_HOURS'):g}h)")
+    else:
+        print("🗄️ Archive: off")
+    if (uri or '').startswith('sqlite') and app.config.get('BACKUP_INTERVAL_HOURS'):
+        print(f"💾 Backups: every {app.config.get('BACKUP_INTERVAL_HOURS'):g}h, keeping {app.config.get('BACKUP_KEEP')}")
     
     print("\n📧 EMAIL CONFIGURATION:")
     print(f"   Server: {app.config['MAIL_SERVER']}:{app.config['MAIL_PORT']}")
     print(f"   TLS: {app.config['MAIL_USE_TLS']}, SSL: {app.config['MAIL_USE_SSL']}")
     print(f"   Username: {'✅ Set' if app.config['MAIL_USERNAME'] else '❌ Not set'}")
     print(f"   Password: {'✅ Set' if app.config['MAIL_PASSWORD'] else '❌ Not set'}")
+    print(f"   Connection pool: {app.config.get('MAIL_POOL_SIZE')} connections, idle {app.config.get('MAIL_POOL_IDLE_SECONDS')}s")
+    print(f"   Outbox workers: {app.config.get('NOTIFICATION_WORKERS')} (batch size {app.config.get('NOTIFICATION_BATCH_SIZE')})")
     
     print("\n📘 FACEBOOK CONFIGURATION:")
     print(f"   App ID: {'✅ Set' if app.config['FACEBOOK_APP_ID'] else '❌ Not set'}")
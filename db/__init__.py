@@ -1,3 +1,6 @@
 # Initialize SQLAlchemy instance for use in models and app
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
+from db.routing import RoutingSession
+
+# GET requests read from the 'replica' bind when one is configured (db/routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
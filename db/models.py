@@ -2,6 +2,8 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from db import db
 from datetime import datetime
+from utils.contact import normalize_email, normalize_phone
+from utils.local_time import local_date
 
 
 
@@ -46,6 +48,8 @@ class User(db.Model, UserMixin):
 
 class GeneratedContent(db.Model):
     __tablename__ = 'generated_content'
+    # Ids are never reused, so archived rows keep theirs (utils/archive.py)
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     topic = db.Column(db.String(255), nullable=False)
@@ -70,24 +74,119 @@ class GeneratedContent(db.Model):
     def __repr__(self):
         return f"<GeneratedContent id={self.id} topic={self.topic}>"
 
+
+class GeneratedContentArchive(db.Model):
+    """Posted content moved out of generated_content by the archiver (utils/archive.py), same ids"""
+    __tablename__ = 'generated_content_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    topic = db.Column(db.String(255), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    code = db.Column(db.Text, nullable=True)
+    image_url = db.Column(db.String(512), nullable=True)
+    image_prompt = db.Column(db.Text, nullable=True)
+    user_name = db.Column(db.Text, nullable=True)
+    input_data = db.Column(db.Text, nullable=True)
+    output_data = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=True)
+    posted = db.Column(db.Boolean, default=True, nullable=False)
+    posted_at = db.Column(db.DateTime, nullable=True, index=True)
+    when_post = db.Column(db.Text, nullable=True)
+
+    twitter_id = db.Column(db.String(255), nullable=True)
+    is_reposted = db.Column(db.Boolean, default=False, nullable=False)
+    reposted_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GeneratedContentArchive id={self.id} topic={self.topic}>"
+
+
+def booking_start_date(start_time):
+    """Day bucket of a booking start (Booking.start_date): its date in LOCAL_TZ, the day it is booked for"""
+    return local_date(start_time) if start_time else None
+
+
 class Booking(db.Model):
+    __table_args__ = (
+        db.Index('ix_booking_status_start_time', 'status', 'start_time'),
+        db.Index('ix_booking_service_id_start_time', 'service_id', 'start_time'),
+        # Ids are never reused, so archived rows keep theirs (utils/archive.py)
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     phone_number = db.Column(db.String(20), nullable=True)  # Added for SMS reminders
-    start_time = db.Column(db.DateTime, nullable=False)
+    # Set automatically by the validators below; info['derived_from'] lets
+    # 'flask schema migrate' backfill them the same way
+    email_normalized = db.Column(db.String(120), nullable=True, index=True,
+                                 info={'derived_from': ('email', normalize_email)})  # Lowercase email
+    phone_e164 = db.Column(db.String(20), nullable=True, index=True,
+                           info={'derived_from': ('phone_number', normalize_phone)})  # E.164 phone
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
     end_time = db.Column(db.DateTime, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled
+    start_date = db.Column(db.Date, nullable=True, index=True,
+                           info={'derived_from': ('start_time', booking_start_date)})  # Local day of start_time
+    status = db.Column(db.String(20), default='pending')  # pending, confirmed, waitlisted, cancelled
     admin_notes = db.Column(db.String(255), nullable=True)
     num_people = db.Column(db.Integer, default=1, nullable=False)  # Number of people in the booking (1-10)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reminder_sent_at = db.Column(db.DateTime, nullable=True)  # Last SMS reminder sent
 
     def __repr__(self):
         return f"<Booking {self.user_name} ({self.num_people} people) {self.start_time}>"
     service_id = db.Column(db.Integer, db.ForeignKey('services.id'), nullable=True)
     service = db.relationship("Service", backref="bookings")
+
+    @db.validates('start_time')
+    def _set_start_date(self, key, start_time):
+        """Keep the day bucket in step so per-day queries can use its index"""
+        self.start_date = booking_start_date(start_time)
+        return start_time
+
+    @db.validates('email')
+    def _set_email_normalized(self, key, email):
+        """Store the lookup form of the email alongside what was typed"""
+        self.email_normalized = normalize_email(email)
+        return email
+
+    @db.validates('phone_number')
+    def _set_phone_e164(self, key, phone_number):
+        """Store the E.164 form used for lookups and SMS sends"""
+        self.phone_e164 = normalize_phone(phone_number)
+        return phone_number
     
 
+class BookingArchive(db.Model):
+    """Past bookings moved out of the booking table by the archiver (utils/archive.py), same ids"""
+    __tablename__ = "booking_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=True)
+    email_normalized = db.Column(db.String(120), nullable=True, index=True)
+    phone_e164 = db.Column(db.String(20), nullable=True, index=True)
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
+    end_time = db.Column(db.DateTime, nullable=False)
+    start_date = db.Column(db.Date, nullable=True)
+    status = db.Column(db.String(20), nullable=True)
+    admin_notes = db.Column(db.String(255), nullable=True)
+    num_people = db.Column(db.Integer, default=1, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=True)
+    reminder_sent_at = db.Column(db.DateTime, nullable=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('services.id'), nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    service = db.relationship("Service")
+
+    def __repr__(self):
+        return f"<BookingArchive {self.user_name} ({self.num_people} people) {self.start_time}>"
+
+
 class Service(db.Model):
     __tablename__ = "services"
 
@@ -98,11 +197,146 @@ class Service(db.Model):
     duration = db.Column(db.Integer, nullable=False)  # Duration in minutes
     image_path = db.Column(db.String(255), nullable=True)  # Path to service image
     language = db.Column(db.String(3), nullable=False, default='ENG')  # ENG or MON
+    capacity = db.Column(db.Integer, nullable=False, default=10)  # Max people per time slot
 
     def __repr__(self):
         return f"<Service {self.name} ({self.language})>"
 
 
+class SlotCapacity(db.Model):
+    """Seats taken per (service, slot start), kept in step with Booking writes"""
+    __tablename__ = "slot_capacity"
+    __table_args__ = (
+        db.UniqueConstraint('service_id', 'slot_start', name='uq_slot_capacity_service_slot'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = booking without a service
+    slot_start = db.Column(db.DateTime, nullable=False)
+    booked_people = db.Column(db.Integer, nullable=False, default=0)
+    booking_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f"<SlotCapacity service={self.service_id} {self.slot_start} ({self.booked_people} people)>"
+
+
+class BookingSeries(db.Model):
+    """
+    A recurring booking stored as a rule (every `interval` days/weeks from
+    start_time); occurrences are expanded on demand, not stored
+    """
+    __tablename__ = "booking_series"
+    __table_args__ = (
+        db.Index('ix_booking_series_service_id_start_time', 'service_id', 'start_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=True)
+    email_normalized = db.Column(db.String(120), nullable=True, index=True)  # Lowercase email, set automatically
+    phone_e164 = db.Column(db.String(20), nullable=True)  # E.164 phone, set automatically
+    service_id = db.Column(db.Integer, db.ForeignKey('services.id'), nullable=True)
+    num_people = db.Column(db.Integer, default=1, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)  # First occurrence (UTC)
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    frequency = db.Column(db.String(10), nullable=False, default='weekly')  # daily or weekly
+    interval = db.Column(db.Integer, nullable=False, default=1)  # Every N days/weeks
+    count = db.Column(db.Integer, nullable=True)  # Number of occurrences, or None
+    until = db.Column(db.DateTime, nullable=True)  # No occurrence starts after this (UTC), or None
+    timezone = db.Column(db.String(50), nullable=False, default='America/New_York')  # Repeats at the same local time
+    status = db.Column(db.String(20), nullable=False, default='confirmed')  # Status of each occurrence: pending, confirmed; cancelled ends the series
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    service = db.relationship("Service")
+    exceptions = db.relationship("BookingSeriesException", backref="series", lazy="dynamic")
+
+    def __repr__(self):
+        return f"<BookingSeries {self.user_name} {self.frequency}/{self.interval} from {self.start_time}>"
+
+    @db.validates('email')
+    def _set_email_normalized(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
+
+    @db.validates('phone_number')
+    def _set_phone_e164(self, key, phone_number):
+        self.phone_e164 = normalize_phone(phone_number)
+        return phone_number
+
+
+class BookingSeriesException(db.Model):
+    """An occurrence of a series that differs from the rule (cancelled, or waitlisted because the slot was full)"""
+    __tablename__ = "booking_series_exceptions"
+    __table_args__ = (
+        db.UniqueConstraint('series_id', 'occurrence_start', name='uq_series_exception_occurrence'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    series_id = db.Column(db.Integer, db.ForeignKey('booking_series.id'), nullable=False)
+    occurrence_start = db.Column(db.DateTime, nullable=False)  # Start the rule gives this occurrence (UTC)
+    status = db.Column(db.String(20), nullable=False)  # cancelled, waitlisted
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<BookingSeriesException series={self.series_id} {self.occurrence_start} ({self.status})>"
+
+
+class BookingReminder(db.Model):
+    """
+    One scheduled SMS reminder; a booking gets one per configured offset, a
+    series occurrence gets them once it comes within the scheduler's horizon
+    """
+    __tablename__ = "booking_reminders"
+    __table_args__ = (
+        db.UniqueConstraint('booking_id', 'offset_minutes', name='uq_booking_reminder_offset'),
+        db.UniqueConstraint('series_id', 'occurrence_start', 'offset_minutes', name='uq_series_reminder_offset'),
+        db.Index('ix_booking_reminders_status_fire_at', 'status', 'fire_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=True, index=True)
+    series_id = db.Column(db.Integer, db.ForeignKey('booking_series.id'), nullable=True)
+    occurrence_start = db.Column(db.DateTime, nullable=True)  # Series reminders: which occurrence
+    offset_minutes = db.Column(db.Integer, nullable=False)  # Minutes before start_time
+    fire_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='scheduled')  # scheduled, sent, cancelled, missed, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        owner = f"booking={self.booking_id}" if self.booking_id else f"series={self.series_id} {self.occurrence_start}"
+        return f"<BookingReminder {owner} -{self.offset_minutes}m at {self.fire_at} ({self.status})>"
+
+
+class NotificationOutbox(db.Model):
+    """Email/SMS waiting to be sent, written in the same transaction as the booking change"""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(10), nullable=False)  # email or sms
+    kind = db.Column(db.String(50), nullable=False)  # e.g. booking_confirmation, booking_cancellation
+    booking_id = db.Column(db.Integer, nullable=True)
+    recipient = db.Column(db.String(255), nullable=False)  # Comma-separated emails, or an E.164 phone
+    sender = db.Column(db.String(120), nullable=True)
+    subject = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Lease expiry while sending
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<NotificationOutbox {self.channel} {self.kind} to {self.recipient} ({self.status})>"
+
+
 class SiteSetting(db.Model):
     __tablename__ = "site_settings"
     __table_args__ = (
@@ -176,3 +410,111 @@ class AboutImage(db.Model):
 
     def __repr__(self):
         return f"<AboutImage {self.title} ({self.media_type}) - {'Active' if self.is_active else 'Inactive'}>"
+
+
+class BlogPost(db.Model):
+    """Blog article (features/blog); on SQLite its text is also indexed in the blog_posts_fts FTS5 table"""
+    __tablename__ = "blog_posts"
+    __table_args__ = (
+        # Listings: published posts newest first, overall and per category
+        db.Index('ix_blog_posts_published_date', 'published', 'published_date', 'id'),
+        db.Index('ix_blog_posts_category_date', 'category', 'published', 'published_date', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False)
+    slug = db.Column(db.String(255), nullable=False, unique=True)
+    category = db.Column(db.String(50), nullable=True)  # Key of BLOG_CATEGORIES in features/blog/blog.py
+    excerpt = db.Column(db.Text, nullable=True)
+    content = db.Column(db.Text, nullable=False)  # HTML
+    author = db.Column(db.String(100), nullable=True)
+    published_date = db.Column(db.Date, nullable=False)
+    featured_image = db.Column(db.String(255), nullable=True, default='default-post.jpg')
+    read_time = db.Column(db.Integer, nullable=False, default=5)  # Minutes
+    published = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+
+    tag_rows = db.relationship("BlogPostTag", cascade="all, delete-orphan", order_by="BlogPostTag.position",
+                               lazy="selectin")
+
+    @property
+    def tags(self):
+        return [row.tag for row in self.tag_rows]
+
+    @tags.setter
+    def tags(self, tags):
+        self.tag_rows = [BlogPostTag(tag=tag, position=position) for position, tag in enumerate(tags or [])]
+
+    def to_dict(self, content=True):
+        """The post in blog_data.json format"""
+        data = {
+            "id": self.id,
+            "title": self.title,
+            "slug": self.slug,
+            "category": self.category,
+            "excerpt": self.excerpt,
+            "author": self.author,
+            "published_date": self.published_date.isoformat() if self.published_date else None,
+            "tags": self.tags,
+            "featured_image": self.featured_image,
+            "read_time": self.read_time,
+            "published": self.published
+        }
+        if content:
+            data["content"] = self.content
+        return data
+
+    def __repr__(self):
+        return f"<BlogPost {self.slug} ({'Published' if self.published else 'Draft'})>"
+
+
+class BlogPostTag(db.Model):
+    __tablename__ = "blog_post_tags"
+    __table_args__ = (
+        db.Index('ix_blog_post_tags_tag', 'tag_normalized', 'post_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'), nullable=False, index=True)
+    tag = db.Column(db.String(50), nullable=False)
+    tag_normalized = db.Column(db.String(50), nullable=False)  # Lowercase tag, set automatically
+    position = db.Column(db.Integer, nullable=False, default=0)  # Order of the tag on the post
+
+    @db.validates('tag')
+    def _set_tag_normalized(self, key, tag):
+        self.tag_normalized = tag.strip().lower()
+        return tag
+
+    def __repr__(self):
+        return f"<BlogPostTag {self.tag}>"
+
+
+class BlogRelatedPost(db.Model):
+    """Precomputed nearest neighbour of a published post (utils/blog_related.py), best first by rank"""
+    __tablename__ = "blog_related_posts"
+
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 0 = most similar
+    related_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)  # Cosine similarity, 0..1
+
+    def __repr__(self):
+        return f"<BlogRelatedPost {self.post_id} -> {self.related_id}>"
+
+
+class SchemaMigrationProgress(db.Model):
+    """Checkpoint of a batched online schema migration step (utils/schema_migration.py)"""
+    __tablename__ = "schema_migration_progress"
+
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(200), nullable=False, unique=True)  # e.g. rebuild:booking, backfill:booking.created_at
+    last_id = db.Column(db.Integer, nullable=False, default=0)  # Highest primary key processed so far
+    done_rows = db.Column(db.Integer, nullable=False, default=0)
+    total_rows = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, done
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchemaMigrationProgress {self.task} {self.done_rows}/{self.total_rows} ({self.status})>"
@@ -0,0 +1,91 @@
+"""
+Read replica routing for db.session
+When a 'replica' bind is configured (DATABASE_REPLICA_URL), plain SELECTs
+made while serving a GET or HEAD request go to the replica; everything else
+(flushes, UPDATE/INSERT/DELETE statements, SELECT ... FOR UPDATE, other
+methods, background threads and CLI commands) uses the primary.
+
+A client that has just written (any successful non-GET request) reads from
+the primary for the next DB_READ_YOUR_WRITES_SECONDS, so a redirect after a
+booking or a settings change never shows data older than its own write.
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context, request, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+def _replica_allowed():
+    """Whether the current request may read from the replica"""
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    if g.get('db_use_primary'):
+        return False
+    return http_session.get(STICKY_SESSION_KEY, 0) <= time.time()
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends read-only queries of GET requests to
+    the replica; a session created with its own bind (the group-commit
+    writer's, utils/write_queue.py) sends everything there
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.bind is not None:
+            return self.bind
+        if bind is None and not self._flushing:
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None and _replica_allowed():
+                if clause is None or (isinstance(clause, Select) and clause._for_update_arg is None):
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_from_primary():
+    """Send the block's reads to the primary, e.g. while filling a cache shared by all clients"""
+    if not has_request_context():
+        yield
+        return
+
+    previous = g.get('db_use_primary', False)
+    g.db_use_primary = True
+    try:
+        yield
+    finally:
+        g.db_use_primary = previous
+
+
+def use_primary(view):
+    """Decorator for GET views that must see the latest writes"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        with read_from_primary():
+            return view(*args, **kwargs)
+    return decorated_function
+
+
+def init_read_replica(app):
+    """Register the read-your-writes hook when a replica bind is configured"""
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return False
+
+    window = float(app.config.get('DB_READ_YOUR_WRITES_SECONDS', 10))
+
+    @app.after_request
+    def _stick_to_primary_after_write(response):
+        if request.method not in READ_METHODS and response.status_code < 400:
+            http_session[STICKY_SESSION_KEY] = time.time() + window
+        return response
+
+    print(f"📖 Read replica enabled for GET requests (primary for {window:g}s after a write)")
+    return True
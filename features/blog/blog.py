@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 import os
 import json
 from werkzeug.utils import secure_filename
+from utils.blog_store import published_posts_query, get_published_post, posts_in_category, posts_with_tag, \
+    related_posts as find_related_posts, search_posts, listing_page
 
 # Create blueprint with custom template and static folders
 blog_bp = Blueprint(
@@ -19,7 +21,8 @@ blog_bp = Blueprint(
     static_url_path='/blog/static'
 )
 
-# Mock data storage (replace with database in production)
+# Posts are stored in the blog_posts table (utils/blog_store.py); this JSON
+# file is only an import/export format (flask blog import|export)
 BLOG_DATA_FILE = 'blog_data.json'
 
 # Blog categories with descriptions
@@ -135,7 +138,7 @@ BLOG_CATEGORIES = {
 }
 
 def load_blog_data():
-    """Load blog posts from JSON file"""
+    """Load blog posts from JSON file (the built-in posts when there is none)"""
     if os.path.exists(BLOG_DATA_FILE):
         with open(BLOG_DATA_FILE, 'r') as f:
             return json.load(f)
@@ -275,66 +278,64 @@ def load_blog_data():
         ]
     }
 
-def save_blog_data(data):
-    """Save blog posts to JSON file"""
-    with open(BLOG_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+SEARCH_RESULT_LIMIT = 50
+
+# Listing pages (?page_size=, ?cursor= from the previous page's next_cursor)
+POSTS_PER_PAGE = 12
+MAX_POSTS_PER_PAGE = 50
+
+def get_page_size():
+    """Requested page size, kept within 1..MAX_POSTS_PER_PAGE"""
+    page_size = request.args.get('page_size', POSTS_PER_PAGE, type=int)
+    return min(max(page_size, 1), MAX_POSTS_PER_PAGE)
 
 @blog_bp.route('/')
 def index():
-    """Main blog page with all published posts"""
-    data = load_blog_data()
-    published_posts = [post for post in data['posts'] if post.get('published', False)]
-    
-    # Sort by published date (newest first)
-    published_posts.sort(key=lambda x: x['published_date'], reverse=True)
+    """Main blog page with published posts, one page at a time"""
+    # Published posts, newest first (ix_blog_posts_published_date)
+    try:
+        published_posts, next_cursor = listing_page(
+            published_posts_query(), request.args.get('cursor'), get_page_size()
+        )
+    except ValueError:
+        return redirect(url_for('blog.index'))
     
-    return render_template('blog.html', posts=published_posts, categories=BLOG_CATEGORIES)
+    return render_template('blog.html', posts=published_posts, next_cursor=next_cursor, categories=BLOG_CATEGORIES)
 
 @blog_bp.route('/post/<slug>')
 def post_detail(slug):
     """Individual blog post page"""
-    data = load_blog_data()
-    post = next((p for p in data['posts'] if p['slug'] == slug and p.get('published', False)), None)
+    post = get_published_post(slug)
     
     if not post:
         flash("Blog post not found.", "error")
         return redirect(url_for('blog.index'))
     
-    # Get related posts (same tags, excluding current post)
-    related_posts = []
-    for p in data['posts']:
-        if p['id'] != post['id'] and p.get('published', False):
-            common_tags = set(p['tags']) & set(post['tags'])
-            if common_tags:
-                related_posts.append(p)
-    
-    # Limit to 3 related posts
-    related_posts = related_posts[:3]
+    # Most similar posts (precomputed), limited to 3
+    related_posts = find_related_posts(post, limit=3)
     
     return render_template('blog_post.html', post=post, related_posts=related_posts, categories=BLOG_CATEGORIES)
 
 @blog_bp.route('/category/<category>')
 def posts_by_category(category):
     """Posts filtered by category"""
-    data = load_blog_data()
-    
     # Get category info
     category_info = BLOG_CATEGORIES.get(category)
     if not category_info:
         flash("Category not found.", "error")
         return redirect(url_for('blog.index'))
     
-    # Filter posts by category
-    category_posts = [
-        post for post in data['posts'] 
-        if post.get('category') == category and post.get('published', False)
-    ]
-    
-    category_posts.sort(key=lambda x: x['published_date'], reverse=True)
+    # Published posts in the category, newest first
+    try:
+        category_posts, next_cursor = listing_page(
+            posts_in_category(category), request.args.get('cursor'), get_page_size()
+        )
+    except ValueError:
+        return redirect(url_for('blog.posts_by_category', category=category))
     
     return render_template('blog_category.html', 
                          posts=category_posts, 
+                         next_cursor=next_cursor,
                          category=category,
                          category_info=category_info,
                          categories=BLOG_CATEGORIES)
@@ -342,15 +343,14 @@ def posts_by_category(category):
 @blog_bp.route('/tag/<tag>')
 def posts_by_tag(tag):
     """Posts filtered by tag"""
-    data = load_blog_data()
-    tagged_posts = [
-        post for post in data['posts'] 
-        if tag.lower() in [t.lower() for t in post['tags']] and post.get('published', False)
-    ]
-    
-    tagged_posts.sort(key=lambda x: x['published_date'], reverse=True)
+    # Tags match case-insensitively; newest first
+    try:
+        tagged_posts, next_cursor = listing_page(posts_with_tag(tag), request.args.get('cursor'), get_page_size())
+    except ValueError:
+        return redirect(url_for('blog.posts_by_tag', tag=tag))
     
-    return render_template('blog_tag.html', posts=tagged_posts, tag=tag, categories=BLOG_CATEGORIES)
+    return render_template('blog_tag.html', posts=tagged_posts, next_cursor=next_cursor,
+                         total_posts=posts_with_tag(tag).count(), tag=tag, categories=BLOG_CATEGORIES)
 
 @blog_bp.route('/search')
 def search():
@@ -360,42 +360,41 @@ def search():
     if not query:
         return redirect(url_for('blog.index'))
     
-    data = load_blog_data()
-    results = []
+    # Ranked by relevance (FTS5 bm25 on SQLite; title and tag matches weigh most)
+    matches = search_posts(query, limit=SEARCH_RESULT_LIMIT)
     
-    for post in data['posts']:
-        if post.get('published', False):
-            # Search in title, excerpt, and content
-            searchable_text = f"{post['title']} {post['excerpt']} {post['content']}".lower()
-            if query.lower() in searchable_text:
-                results.append(post)
+    results = [post for post, snippet in matches]
+    snippets = {post.id: snippet for post, snippet in matches}
     
-    results.sort(key=lambda x: x['published_date'], reverse=True)
-    
-    return render_template('blog_search.html', posts=results, query=query, categories=BLOG_CATEGORIES)
+    return render_template('blog_search.html', posts=results, query=query, snippets=snippets,
+                         categories=BLOG_CATEGORIES)
 
 @blog_bp.route('/api/posts')
 def api_posts():
-    """API endpoint for blog posts"""
-    data = load_blog_data()
-    published_posts = [post for post in data['posts'] if post.get('published', False)]
+    """API endpoint for blog posts (paged: follow next_cursor until it is null)"""
+    try:
+        published_posts, next_cursor = listing_page(
+            published_posts_query(), request.args.get('cursor'), get_page_size()
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Remove content for API response (just metadata)
     api_posts = []
     for post in published_posts:
         api_post = {
-            'id': post['id'],
-            'title': post['title'],
-            'slug': post['slug'],
-            'excerpt': post['excerpt'],
-            'author': post['author'],
-            'published_date': post['published_date'],
-            'tags': post['tags'],
-            'read_time': post['read_time']
+            'id': post.id,
+            'title': post.title,
+            'slug': post.slug,
+            'excerpt': post.excerpt,
+            'author': post.author,
+            'published_date': post.published_date.isoformat(),
+            'tags': post.tags,
+            'read_time': post.read_time
         }
         api_posts.append(api_post)
     
-    return jsonify({'posts': api_posts})
+    return jsonify({'posts': api_posts, 'next_cursor': next_cursor})
 
 def get_feature_info():
     """Return information about this feature"""
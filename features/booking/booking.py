@@ -8,12 +8,24 @@ from flask import Blueprint, render_template, request, jsonify, current_app, fla
 from flask_mail import Message, Mail
 from db import db
 from db.models import Booking, Service, EmailTemplate
-from datetime import datetime
-import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 import pytz
-from routes.send_sms import send_booking_confirmation_sms, format_local_time as sms_format_local_time
+from routes.send_sms import booking_confirmation_sms_body, format_local_time as sms_format_local_time
+from utils.booking_utils import get_calendar_range, query_calendar_events, search_bookings_by_contact, \
+    booking_length_error
+from utils.booking_index import booking_index
+from utils.capacity import get_service_capacity, reserve_seats, release_seats
+from utils.availability import get_availability_window, conflict_availability, format_slot_minutes
+from utils.outbox import queue_email, queue_sms
+from utils.reminders import schedule_booking_reminders, cancel_booking_reminders, \
+    schedule_new_series_reminders, cancel_series_reminders
+from utils.local_time import LOCAL_TZ
+from utils.booking_events import record_booking_event, record_series_event, event_stream_response
+from utils.write_queue import run_write
+from utils.recurring import create_series, cancel_occurrence, end_series, expand_series
+from db.models import BookingArchive, BookingSeries
 
-LOCAL_TZ = pytz.timezone("America/New_York")  # change to your timezone
 
 def format_local_time(utc_time):
     """Convert UTC datetime to local timezone and format nicely"""
@@ -29,6 +41,9 @@ booking_bp = Blueprint(
     static_url_path='/booking/static'
 )
 
+# Bookable slot starts, in minutes after midnight (9 AM to 5 PM, every hour)
+SLOT_MINUTES = [hour * 60 for hour in range(9, 18)]
+
 # 📅 Calendar page (old version)
 @booking_bp.route("/calendar")
 def booking_calendar():
@@ -61,15 +76,20 @@ def get_services():
     ]
     return jsonify(services_data)
 
-# 📅 API: Get all bookings (for FullCalendar)
+# 📅 API: Get bookings in the visible range (for FullCalendar)
 @booking_bp.route("/events")
 def booking_events():
-    bookings = Booking.query.all()
+    try:
+        start, end = get_calendar_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {str(e)}"}), 400
+
+    rows = query_calendar_events(start, end)
     events = []
-    for booking in bookings:
+    for booking in rows:
         events.append({
             "id": booking.id,
-            "title": f"{booking.user_name} - {booking.service.name}",
+            "title": f"{booking.user_name} - {booking.service_name or 'Unknown Service'}",
             "start": booking.start_time.isoformat(),
             "end": booking.end_time.isoformat(),
             "backgroundColor": "#28a745" if booking.status == "confirmed" else "#ffc107",
@@ -77,12 +97,16 @@ def booking_events():
         })
     return jsonify(events)
 
+# 📅 API: Live booking deltas (Server-Sent Events), resumable with Last-Event-ID
+@booking_bp.route("/events/stream")
+def booking_event_stream():
+    return event_stream_response(request)
+
 # 📅 API: Create new booking
 @booking_bp.route("/events", methods=["POST"])
 def add_booking():
     try:
         data = request.json
-        print(f"Received booking data: {data}")
         
         # Validate required fields
         required_fields = ['user_name', 'user_email', 'phone', 'service_id', 'start_time', 'end_time']
@@ -93,44 +117,24 @@ def add_booking():
         # Parse datetime strings
         start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
         end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
+        length_error = booking_length_error(start_time, end_time)
+        if length_error:
+            return jsonify({"error": length_error}), 400
         
         # Get service
         service = Service.query.get(data['service_id'])
         if not service:
             return jsonify({"error": "Service not found"}), 400
         
-        # Get number of people (default to 1)
-        num_people = data.get('num_people', 1)
-        
-        # Create booking
-        booking = Booking(
-            user_name=data['user_name'],
-            user_email=data['user_email'],
-            phone=data['phone'],
-            service_id=data['service_id'],
-            start_time=start_time,
-            end_time=end_time,
-            status='confirmed',
-            num_people=num_people
-        )
-        
-        db.session.add(booking)
-        db.session.commit()
+        # Get number of people (default to 1, max is the service's slot capacity)
+        capacity = get_service_capacity(service)
+        num_people = max(1, min(int(data.get('num_people', 1)), capacity))
         
-        print(f"✅ Booking created successfully: ID {booking.id}")
+        # Commit through the group-commit writer when it is enabled
+        booking = run_write(_create_booking, data, service.id, start_time, end_time, num_people)
+        booking_index.add(booking)
         
-        # Send confirmation email and SMS in background
-        def send_notifications():
-            try:
-                send_booking_confirmation_email(booking, service)
-                send_booking_confirmation_sms(booking, service)
-            except Exception as e:
-                print(f"❌ Error sending notifications: {e}")
-        
-        # Start background thread for notifications
-        notification_thread = threading.Thread(target=send_notifications)
-        notification_thread.daemon = True
-        notification_thread.start()
+        print(f"✅ Booking created successfully: ID {booking.id} ({booking.status})")
         
         return jsonify({
             "id": booking.id,
@@ -138,20 +142,75 @@ def add_booking():
             "start_time": format_local_time(booking.start_time),
             "end_time": format_local_time(booking.end_time),
             "service": service.name,
-            "num_people": num_people
+            "num_people": num_people,
+            "status": booking.status,
+            "isFullyBooked": not booking.has_room,
+            "availableSpots": max(0, capacity - booking.booked_people)
         }), 201
         
     except Exception as e:
         print(f"❌ Error creating booking: {e}")
         return jsonify({"error": f"Failed to create booking: {str(e)}"}), 500
 
-def send_booking_confirmation_email(booking, service):
-    """Send booking confirmation email"""
-    try:
-        # Get email template
-        template = EmailTemplate.query.filter_by(name='booking_confirmation').first()
-        
-        if template:
+def _create_booking(data, service_id, start_time, end_time, num_people):
+    """
+    Write unit for add_booking: claim seats, add the booking and queue its
+    notifications (no commit)
+
+    Returns plain values, since the unit may run on the group-commit
+    writer's session.
+    """
+    service = Service.query.get(service_id)
+    capacity = get_service_capacity(service)
+    
+    # Claim seats in the capacity ledger (atomic, same transaction as the booking)
+    has_room, booked_people, _ = reserve_seats(service.id, start_time, num_people, capacity, end_time)
+    
+    # Create booking (waitlisted if the slot is already full)
+    booking = Booking(
+        user_name=data['user_name'],
+        email=data['user_email'],
+        phone_number=data['phone'],
+        service_id=service.id,
+        start_time=start_time,
+        end_time=end_time,
+        status='confirmed' if has_room else 'waitlisted',
+        num_people=num_people
+    )
+    
+    db.session.add(booking)
+    db.session.flush()  # Assigns booking.id for the notifications
+    
+    # Queue confirmation email and SMS in the same transaction as the
+    # booking; the outbox workers send them after the commit
+    queue_booking_confirmation_email(booking, service)
+    queue_sms(
+        'booking_confirmation',
+        booking.phone_e164 or booking.phone_number,
+        booking_confirmation_sms_body(booking.user_name, service.name, booking.start_time),
+        booking_id=booking.id
+    )
+    schedule_booking_reminders(booking)
+    record_booking_event('booking-created', booking)
+    
+    return SimpleNamespace(
+        id=booking.id,
+        service_id=booking.service_id,
+        start_time=booking.start_time,
+        end_time=booking.end_time,
+        status=booking.status,
+        has_room=has_room,
+        booked_people=booked_people
+    )
+
+def queue_booking_confirmation_email(booking, service):
+    """Queue the booking confirmation email (no commit)"""
+    # Get email template
+    template = EmailTemplate.query.filter_by(name='booking_confirmation').first()
+    
+    subject = body = None
+    if template:
+        try:
             subject = template.subject.format(
                 service_name=service.name,
                 user_name=booking.user_name
@@ -163,9 +222,14 @@ def send_booking_confirmation_email(booking, service):
                 start_time=format_local_time(booking.start_time),
                 end_time=format_local_time(booking.end_time)
             )
-        else:
-            subject = f"Booking Confirmation - {service.name}"
-            body = f"""
+        except (KeyError, IndexError, ValueError) as e:
+            # A bad placeholder in an admin-edited template must not fail the booking
+            print(f"⚠️ Email template error, using default text: {e}")
+            subject = body = None
+    
+    if body is None:
+        subject = f"Booking Confirmation - {service.name}"
+        body = f"""
 Dear {booking.user_name},
 
 Your booking has been confirmed!
@@ -176,18 +240,8 @@ Price: ${service.price}
 
 Thank you for choosing our services!
 """
-        
-        mail = current_app.mail
-        msg = Message(
-            subject=subject,
-            recipients=[booking.user_email],
-            body=body
-        )
-        mail.send(msg)
-        print(f"✅ Confirmation email sent to {booking.user_email}")
-        
-    except Exception as e:
-        print(f"❌ Failed to send confirmation email: {e}")
+    
+    queue_email('booking_confirmation', booking.email, subject, body, booking_id=booking.id)
 
 # 📅 API: Get available time slots
 @booking_bp.route("/available-slots")
@@ -207,27 +261,14 @@ def get_available_slots():
         if not service:
             return jsonify({"error": "Service not found"}), 400
         
-        # Get existing bookings for that date
-        existing_bookings = Booking.query.filter(
-            db.func.date(Booking.start_time) == selected_date,
-            Booking.status == 'confirmed'
-        ).all()
-        
         # Generate available slots (9 AM to 6 PM, every hour)
+        slot_length = timedelta(minutes=service.duration)
         available_slots = []
-        for hour in range(9, 18):  # 9 AM to 5 PM (last slot)
-            slot_time = datetime.combine(selected_date, datetime.min.time().replace(hour=hour))
+        for slot_minute in SLOT_MINUTES:
+            slot_time = datetime.combine(selected_date, datetime.min.time()) + timedelta(minutes=slot_minute)
             
-            # Check if this slot conflicts with existing bookings
-            conflict = False
-            for booking in existing_bookings:
-                booking_start = booking.start_time.replace(tzinfo=None)
-                booking_end = booking.end_time.replace(tzinfo=None)
-                slot_end = slot_time + timedelta(minutes=service.duration)
-                
-                if (slot_time < booking_end and slot_end > booking_start):
-                    conflict = True
-                    break
+            # Check if this slot conflicts with confirmed bookings (indexed per day)
+            conflict = booking_index.has_conflict(slot_time, slot_time + slot_length)
             
             if not conflict:
                 available_slots.append({
@@ -241,6 +282,31 @@ def get_available_slots():
         print(f"❌ Error getting available slots: {e}")
         return jsonify({"error": str(e)}), 500
 
+# 📅 API: Availability for every service and every day of a month (one round trip)
+@booking_bp.route("/availability")
+def get_month_availability():
+    try:
+        first_day, num_days = get_availability_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {str(e)}"}), 400
+    
+    service_id = request.args.get('service_id')
+    if service_id:
+        services = Service.query.filter_by(id=service_id).all()
+    else:
+        current_language = request.args.get('lang', 'ENG')
+        if current_language not in ['ENG', 'MON']:
+            current_language = 'ENG'
+        services = Service.query.filter_by(language=current_language).all()
+    
+    availability = conflict_availability(services, first_day, num_days, SLOT_MINUTES)
+    return jsonify({
+        "start": first_day.isoformat(),
+        "days": num_days,
+        "slots": format_slot_minutes(SLOT_MINUTES),
+        "services": {str(service_id): data for service_id, data in availability.items()}
+    })
+
 # 📅 New booking form page
 @booking_bp.route("/new")
 def create_booking():
@@ -251,8 +317,12 @@ def create_booking():
 def cancel_booking(booking_id):
     try:
         booking = Booking.query.get_or_404(booking_id)
-        booking.status = 'cancelled'
-        db.session.commit()
+        if booking.status == 'cancelled':
+            return jsonify({"error": "Booking is already cancelled"}), 400
+        
+        if not run_write(_cancel_booking, booking_id):
+            return jsonify({"error": "Booking is already cancelled"}), 400
+        booking_index.remove(booking)
         
         return jsonify({"message": "Booking cancelled successfully"}), 200
         
@@ -260,6 +330,220 @@ def cancel_booking(booking_id):
         print(f"❌ Error cancelling booking: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _cancel_booking(booking_id):
+    """Write unit for cancel_booking (no commit); False if it was cancelled meanwhile"""
+    booking = Booking.query.get(booking_id)
+    if booking is None or booking.status == 'cancelled':
+        return False
+    
+    # Release the booking's seats and mark it cancelled in one transaction
+    release_seats(booking)
+    booking.status = 'cancelled'
+    cancel_booking_reminders(booking)
+    record_booking_event('booking-cancelled', booking)
+    return True
+
+# 🔁 API: Create a recurring booking series (one rule, one capacity pass, one confirmation)
+@booking_bp.route("/series", methods=["POST"])
+def add_booking_series():
+    try:
+        data = request.json
+        
+        required_fields = ['user_name', 'user_email', 'phone', 'service_id', 'start_time', 'end_time']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({"error": f"Missing required field: {field}"}), 400
+        
+        service = Service.query.get(data['service_id'])
+        if not service:
+            return jsonify({"error": "Service not found"}), 400
+        
+        capacity = get_service_capacity(service)
+        num_people = max(1, min(int(data.get('num_people', 1)), capacity))
+        
+        # Repeat rule: {"frequency": "weekly", "interval": 1, "count": 10} or {"until": ...}
+        repeat = data.get('repeat') or {}
+        until = repeat.get('until')
+        rule = dict(
+            start_time=datetime.fromisoformat(data['start_time'].replace('Z', '+00:00')),
+            end_time=datetime.fromisoformat(data['end_time'].replace('Z', '+00:00')),
+            frequency=repeat.get('frequency', 'weekly'),
+            interval=repeat.get('interval', 1),
+            count=repeat.get('count'),
+            until=datetime.fromisoformat(until.replace('Z', '+00:00')) if until else None
+        )
+        
+        # Commit through the group-commit writer when it is enabled
+        series = run_write(_create_booking_series, data, service.id, num_people, rule)
+        booking_index.invalidate()
+        
+        print(f"✅ Booking series created: ID {series.id} ({series.checked} occurrences checked, "
+              f"{len(series.waitlisted)} waitlisted)")
+        
+        return jsonify({
+            "id": series.id,
+            "message": "Recurring booking created successfully!",
+            "service": service.name,
+            "num_people": num_people,
+            "repeat": series.repeat,
+            "first_start": format_local_time(series.start_time),
+            "occurrences_checked": series.checked,
+            "waitlisted": [start.isoformat() for start in series.waitlisted]
+        }), 201
+        
+    except (ValueError, KeyError) as e:
+        return jsonify({"error": f"Invalid series: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error creating booking series: {e}")
+        return jsonify({"error": f"Failed to create booking series: {str(e)}"}), 500
+
+def _create_booking_series(data, service_id, num_people, rule):
+    """
+    Write unit for add_booking_series: add the series, check its capacity and
+    queue its confirmation and reminders (no commit)
+
+    Raises:
+        ValueError: if the repeat rule is invalid
+    """
+    service = Service.query.get(service_id)
+    series, waitlisted, checked = create_series(
+        user_name=data['user_name'],
+        email=data['user_email'],
+        phone_number=data['phone'],
+        service=service,
+        num_people=num_people,
+        **rule
+    )
+    
+    # One confirmation for the whole series instead of one per occurrence
+    queue_series_confirmation_email(series, service, waitlisted)
+    queue_sms(
+        'booking_confirmation',
+        series.phone_e164 or series.phone_number,
+        booking_confirmation_sms_body(series.user_name, service.name, series.start_time)
+    )
+    schedule_new_series_reminders(series)
+    record_series_event('series-created', series)
+    
+    return SimpleNamespace(
+        id=series.id,
+        start_time=series.start_time,
+        repeat=describe_repeat(series),
+        waitlisted=waitlisted,
+        checked=checked
+    )
+
+def describe_repeat(series):
+    """Human-readable repeat rule, e.g. 'every 2 weeks, 10 times'"""
+    unit = 'day' if series.frequency == 'daily' else 'week'
+    text = f"every {unit}" if series.interval == 1 else f"every {series.interval} {unit}s"
+    if series.count:
+        text += f", {series.count} times"
+    if series.until:
+        text += f", until {format_local_time(series.until)}"
+    return text
+
+def queue_series_confirmation_email(series, service, waitlisted):
+    """Queue the confirmation email for a recurring booking (no commit)"""
+    end_time = series.start_time + timedelta(minutes=series.duration_minutes)
+    body = f"""
+Dear {series.user_name},
+
+Your recurring booking has been confirmed!
+
+Service: {service.name}
+First session: {format_local_time(series.start_time)} - {format_local_time(end_time)}
+Repeats: {describe_repeat(series)}
+Price per session: ${service.price}
+"""
+    if waitlisted:
+        body += "\nThese sessions are full, so you are on the waitlist for them:\n"
+        body += "".join(f"  - {format_local_time(start)}\n" for start in waitlisted)
+    body += "\nThank you for choosing our services!\n"
+    
+    queue_email('booking_confirmation', series.email, f"Recurring Booking Confirmation - {service.name}", body)
+
+# 🔁 API: Occurrences of a series in a date range (expanded on the fly)
+@booking_bp.route("/series/<int:series_id>/occurrences")
+def get_series_occurrences(series_id):
+    BookingSeries.query.get_or_404(series_id)
+    try:
+        start, end = get_calendar_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {str(e)}"}), 400
+    
+    occurrences = expand_series(start, end, series_ids=[series_id], include_cancelled=True)
+    return jsonify([
+        {
+            "id": occurrence.id,
+            "start": occurrence.start_time.isoformat(),
+            "end": occurrence.end_time.isoformat(),
+            "status": occurrence.status
+        }
+        for occurrence in occurrences
+    ])
+
+# 🔁 API: Cancel one occurrence of a series ({"start": "<occurrence start>"})
+@booking_bp.route("/series/<int:series_id>/occurrences/cancel", methods=["POST"])
+def cancel_series_occurrence(series_id):
+    try:
+        series = BookingSeries.query.get_or_404(series_id)
+        occurrence_start = datetime.fromisoformat((request.json or {}).get('start', '').replace('Z', '+00:00'))
+        if occurrence_start.tzinfo is not None:
+            occurrence_start = occurrence_start.astimezone(pytz.UTC).replace(tzinfo=None)
+        
+        if not run_write(_cancel_series_occurrence, series.id, occurrence_start):
+            return jsonify({"error": "No active occurrence at that time"}), 400
+        booking_index.invalidate_span(
+            occurrence_start, occurrence_start + timedelta(minutes=series.duration_minutes)
+        )
+        
+        return jsonify({"message": "Session cancelled successfully"}), 200
+        
+    except ValueError as e:
+        return jsonify({"error": f"Invalid occurrence start: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error cancelling series occurrence: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def _cancel_series_occurrence(series_id, occurrence_start):
+    """Write unit for cancel_series_occurrence (no commit); False if there is no active occurrence"""
+    series = BookingSeries.query.get(series_id)
+    if series is None or not cancel_occurrence(series, occurrence_start):
+        return False
+    cancel_series_reminders(series, occurrence_start=occurrence_start)
+    record_series_event('occurrence-cancelled', series, occurrence_start)
+    return True
+
+# 🔁 API: End a series (past sessions stay in the history)
+@booking_bp.route("/series/<int:series_id>/cancel", methods=["POST"])
+def cancel_booking_series(series_id):
+    try:
+        series = BookingSeries.query.get_or_404(series_id)
+        if series.status == 'cancelled':
+            return jsonify({"error": "Series is already cancelled"}), 400
+        
+        if not run_write(_end_booking_series, series.id):
+            return jsonify({"error": "Series is already cancelled"}), 400
+        booking_index.invalidate()
+        
+        return jsonify({"message": "Recurring booking cancelled successfully"}), 200
+        
+    except Exception as e:
+        print(f"❌ Error cancelling booking series: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def _end_booking_series(series_id):
+    """Write unit for cancel_booking_series (no commit); False if it was cancelled meanwhile"""
+    series = BookingSeries.query.get(series_id)
+    if series is None or series.status == 'cancelled':
+        return False
+    now = datetime.utcnow()
+    end_series(series, now)
+    cancel_series_reminders(series, after=now)
+    record_series_event('series-ended', series)
+    return True
+
 # 📅 My Bookings page
 @booking_bp.route("/my-bookings")
 def my_bookings():
@@ -275,31 +559,32 @@ def search_my_bookings():
         if not email and not phone:
             return jsonify({"error": "Email or phone number required"}), 400
         
-        # Build query
-        query = Booking.query
-        if email:
-            query = query.filter(Booking.user_email.ilike(f"%{email}%"))
-        if phone:
-            query = query.filter(Booking.phone.ilike(f"%{phone}%"))
-        
-        bookings = query.order_by(Booking.start_time.desc()).all()
+        # Exact indexed lookup on the normalized contact columns (no partial matches)
+        # ?history=1 also searches bookings moved to the archive
+        bookings = search_bookings_by_contact(
+            email=email, phone=phone, include_archive=request.args.get('history') in ('1', 'true')
+        )
         
         bookings_data = []
         for booking in bookings:
             bookings_data.append({
                 "id": booking.id,
                 "user_name": booking.user_name,
-                "user_email": booking.user_email,
-                "phone": booking.phone,
-                "service_name": booking.service.name,
+                "email": booking.email,
+                "phone_number": booking.phone_number,
+                "service_name": booking.service.name if booking.service else 'Unknown Service',
                 "start_time": format_local_time(booking.start_time),
                 "end_time": format_local_time(booking.end_time),
                 "status": booking.status,
-                "num_people": getattr(booking, 'num_people', 1)
+                "num_people": getattr(booking, 'num_people', 1),
+                "archived": isinstance(booking, BookingArchive)
             })
         
         return jsonify(bookings_data)
         
+    except ValueError as e:
+        # Partial email/phone: only exact matches are public
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Error searching bookings: {e}")
         return jsonify({"error": str(e)}), 500
@@ -332,9 +617,6 @@ def debug_schema():
             "message": str(e)
         }), 500
 
-# Helper function for time calculations
-from datetime import timedelta
-
 def get_feature_info():
     """Return information about this feature"""
     return {
@@ -349,7 +631,10 @@ def get_feature_info():
             "/booking/my-bookings",
             "/booking/services",
             "/booking/events",
-            "/booking/available-slots"
+            "/booking/events/stream",
+            "/booking/series",
+            "/booking/available-slots",
+            "/booking/availability"
         ],
         "templates": ["book.html", "booking.html", "create_booking.html", "my_bookings.html"],
         "static_files": ["book.css", "book.js", "book_new.js"]
@@ -10,6 +10,8 @@ from db import db
 from db.models import Testimonial
 from functools import wraps
 from datetime import datetime
+from types import SimpleNamespace
+from utils.write_queue import run_write
 
 # Create testimonial blueprint with custom template and static folders
 testimony_bp = Blueprint(
@@ -42,23 +44,16 @@ def submit_testimonial():
     """Public testimonial submission form"""
     if request.method == 'POST':
         try:
-            testimonial = Testimonial(
+            # Commit through the group-commit writer when it is enabled
+            testimonial = run_write(
+                _save_testimonial,
                 client_name=request.form.get('client_name'),
                 client_title=request.form.get('client_title'),
                 testimonial_text=request.form.get('testimonial_text'),
                 rating=int(request.form.get('rating', 5)),
-                email=request.form.get('email'),
-                is_approved=True,  # Publish immediately
-                is_featured=False
+                email=request.form.get('email')
             )
 
-            # Set approval metadata for immediate publish
-            testimonial.approved_at = datetime.utcnow()
-            testimonial.approved_by = None
-            
-            db.session.add(testimonial)
-            db.session.commit()
-
             # Notify admin by email (best-effort)
             try:
                 notify_admin_new_testimonial(testimonial)
@@ -74,6 +69,29 @@ def submit_testimonial():
 
     return render_template('testimony.html')
 
+def _save_testimonial(**fields):
+    """Write unit for submit_testimonial: add a published testimonial (no commit)"""
+    testimonial = Testimonial(
+        **fields,
+        is_approved=True,  # Publish immediately
+        is_featured=False
+    )
+
+    # Set approval metadata for immediate publish
+    testimonial.approved_at = datetime.utcnow()
+    testimonial.approved_by = None
+    
+    db.session.add(testimonial)
+    db.session.flush()
+
+    # Plain copy for the admin notification: the unit may run on the writer's session
+    return SimpleNamespace(
+        id=testimonial.id,
+        created_at=testimonial.created_at,
+        is_approved=testimonial.is_approved,
+        **fields
+    )
+
 # API: Get approved testimonials
 @testimony_bp.route('/api/approved')
 def get_approved_testimonials():
@@ -1,68 +1,64 @@
 #!/usr/bin/env python3
 """
 Manual database migration script to add num_people column
+Uses the online migration runner (utils/schema_migration.py), so it is safe
+to run while the app is serving
 """
 
-import sqlite3
 import os
+from sqlalchemy import create_engine, inspect
+
+from config import database_uri
+from db.models import Booking
+from utils.schema_migration import OnlineMigrator
 
 def add_num_people_column():
     """Add num_people column to booking table if it doesn't exist"""
     
-    db_path = os.path.join('instance', 'data.sqlite')
-    
-    if not os.path.exists(db_path):
-        print(f"❌ Database file not found: {db_path}")
+    # Same database as the app: SQLALCHEMY_DATABASE_URI / DATABASE_URL, or instance/data.sqlite
+    uri = database_uri('instance')
+    if uri.startswith('sqlite:///') and not os.path.exists(uri[len('sqlite:///'):]):
+        print(f"❌ Database file not found: {uri[len('sqlite:///'):]}")
         return False
     
+    engine = create_engine(uri)
     try:
-        print(f"📂 Connecting to database: {db_path}")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        print(f"📂 Connecting to database: {engine.url.render_as_string(hide_password=True)}")
+        migrator = OnlineMigrator(engine, Booking.metadata)
         
         # Check current table structure
         print("📋 Current table structure:")
-        cursor.execute('PRAGMA table_info(booking)')
-        columns = cursor.fetchall()
-        column_names = [col[1] for col in columns]
+        columns = inspect(engine).get_columns('booking')
+        column_names = [col['name'] for col in columns]
         
         for col in columns:
-            print(f"  - {col[1]} ({col[2]})")
+            print(f"  - {col['name']} ({col['type']})")
         
-        # Add num_people column if it doesn't exist
+        # Add num_people column if it doesn't exist (ADD COLUMN ... DEFAULT 1, no table rebuild)
         if 'num_people' not in column_names:
             print("\n🔧 Adding num_people column...")
-            cursor.execute('ALTER TABLE booking ADD COLUMN num_people INTEGER DEFAULT 1 NOT NULL')
-            conn.commit()
-            print("✅ Successfully added num_people column")
+            migrator.add_column('booking', 'num_people')
             
             # Verify the column was added
-            cursor.execute('PRAGMA table_info(booking)')
-            new_columns = cursor.fetchall()
+            new_columns = inspect(engine).get_columns('booking')
             print("\n📋 Updated table structure:")
             for col in new_columns:
-                print(f"  - {col[1]} ({col[2]})")
+                print(f"  - {col['name']} ({col['type']})")
                 
         else:
             print("\n✅ num_people column already exists")
         
-        # Update any existing bookings that have null num_people
-        cursor.execute('UPDATE booking SET num_people = 1 WHERE num_people IS NULL')
-        updated_count = cursor.rowcount
-        if updated_count > 0:
-            print(f"✅ Updated {updated_count} existing bookings to have num_people = 1")
-        
-        conn.commit()
-        conn.close()
+        # Update any existing bookings that have null num_people, in resumable batches
+        migrator.backfill('booking', 'num_people', 1)
         
         print("\n🎉 Database migration completed successfully!")
         return True
         
     except Exception as e:
         print(f"❌ Error during migration: {e}")
-        if 'conn' in locals():
-            conn.close()
         return False
+    finally:
+        engine.dispose()
 
 if __name__ == "__main__":
     print("🗄️ Database Migration Script")
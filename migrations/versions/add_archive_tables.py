@@ -0,0 +1,75 @@
+"""Add booking_archive and generated_content_archive tables
+
+Revision ID: add_archive_tables
+Revises: add_schema_migration_progress
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_archive_tables'
+down_revision = 'add_schema_migration_progress'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'booking_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('phone_number', sa.String(length=20), nullable=True),
+        sa.Column('email_normalized', sa.String(length=120), nullable=True),
+        sa.Column('phone_e164', sa.String(length=20), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('admin_notes', sa.String(length=255), nullable=True),
+        sa.Column('num_people', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('reminder_sent_at', sa.DateTime(), nullable=True),
+        sa.Column('service_id', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['service_id'], ['services.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_booking_archive_email_normalized', 'booking_archive', ['email_normalized'], unique=False)
+    op.create_index('ix_booking_archive_phone_e164', 'booking_archive', ['phone_e164'], unique=False)
+    op.create_index('ix_booking_archive_start_time', 'booking_archive', ['start_time'], unique=False)
+
+    op.create_table(
+        'generated_content_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('topic', sa.String(length=255), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('code', sa.Text(), nullable=True),
+        sa.Column('image_url', sa.String(length=512), nullable=True),
+        sa.Column('image_prompt', sa.Text(), nullable=True),
+        sa.Column('user_name', sa.Text(), nullable=True),
+        sa.Column('input_data', sa.Text(), nullable=True),
+        sa.Column('output_data', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('posted', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('posted_at', sa.DateTime(), nullable=True),
+        sa.Column('when_post', sa.Text(), nullable=True),
+        sa.Column('twitter_id', sa.String(length=255), nullable=True),
+        sa.Column('is_reposted', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('reposted_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_generated_content_archive_posted_at', 'generated_content_archive', ['posted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_generated_content_archive_posted_at', table_name='generated_content_archive')
+    op.drop_table('generated_content_archive')
+    op.drop_index('ix_booking_archive_start_time', table_name='booking_archive')
+    op.drop_index('ix_booking_archive_phone_e164', table_name='booking_archive')
+    op.drop_index('ix_booking_archive_email_normalized', table_name='booking_archive')
+    op.drop_table('booking_archive')
@@ -0,0 +1,54 @@
+"""Use AUTOINCREMENT ids for booking and generated_content
+
+Revision ID: add_autoincrement_booking_ids
+Revises: add_blog_related_posts
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_autoincrement_booking_ids'
+down_revision = 'add_blog_related_posts'
+branch_labels = None
+depends_on = None
+
+# Hot table -> archive table holding rows moved out with their ids
+TABLES = (
+    ('booking', 'booking_archive'),
+    ('generated_content', 'generated_content_archive'),
+)
+
+
+def upgrade():
+    # Without AUTOINCREMENT SQLite hands out max(id) + 1, which reuses the
+    # ids of archived rows; sequences on other databases never do
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table, archive in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+        # Start above every id already archived, not just the live ones
+        op.execute(sa.text(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', 0 "
+            f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = '{table}')"
+        ))
+        op.execute(sa.text(
+            f"UPDATE sqlite_sequence SET seq = MAX(seq, "
+            f"(SELECT COALESCE(MAX(id), 0) FROM {table}), "
+            f"(SELECT COALESCE(MAX(id), 0) FROM {archive})) "
+            f"WHERE name = '{table}'"
+        ))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table, _ in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
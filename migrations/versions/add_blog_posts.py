@@ -0,0 +1,121 @@
+"""Add blog_posts and blog_post_tags tables with an FTS5 index, imported from blog_data.json
+
+Revision ID: add_blog_posts
+Revises: add_archive_tables
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_blog_posts'
+down_revision = 'add_archive_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'blog_posts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('slug', sa.String(length=255), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('excerpt', sa.Text(), nullable=True),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('author', sa.String(length=100), nullable=True),
+        sa.Column('published_date', sa.Date(), nullable=False),
+        sa.Column('featured_image', sa.String(length=255), nullable=True),
+        sa.Column('read_time', sa.Integer(), nullable=False),
+        sa.Column('published', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+    )
+    op.create_index('ix_blog_posts_published_date', 'blog_posts', ['published', 'published_date', 'id'], unique=False)
+    op.create_index('ix_blog_posts_category_date', 'blog_posts', ['category', 'published', 'published_date', 'id'], unique=False)
+
+    op.create_table(
+        'blog_post_tags',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('tag', sa.String(length=50), nullable=False),
+        sa.Column('tag_normalized', sa.String(length=50), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['blog_posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_blog_post_tags_post_id', 'blog_post_tags', ['post_id'], unique=False)
+    op.create_index('ix_blog_post_tags_tag', 'blog_post_tags', ['tag_normalized', 'post_id'], unique=False)
+
+    bind = op.get_bind()
+    use_fts = False
+    if bind.dialect.name == 'sqlite':
+        from utils.blog_store import CREATE_FTS_SQL
+        try:
+            op.execute(CREATE_FTS_SQL)
+            use_fts = True
+        except sa.exc.OperationalError:
+            print("⚠️ SQLite was built without FTS5; blog search will use the in-process index")
+
+    # Import the posts the blueprint served so far: blog_data.json when
+    # present, else its built-in posts. HTML stripping for the FTS body uses
+    # the application's code, so this runs in Python.
+    from features.blog.blog import load_blog_data
+    from utils.blog_search import strip_html
+
+    posts = load_blog_data()['posts']
+    blog_posts = sa.table(
+        'blog_posts', *[sa.column(name) for name in (
+            'id', 'title', 'slug', 'category', 'excerpt', 'content', 'author', 'published_date',
+            'featured_image', 'read_time', 'published', 'created_at', 'updated_at'
+        )]
+    )
+    blog_post_tags = sa.table('blog_post_tags', *[sa.column(name) for name in (
+        'post_id', 'tag', 'tag_normalized', 'position'
+    )])
+
+    for post in posts:
+        bind.execute(blog_posts.insert().values(
+            id=post['id'],
+            title=post['title'],
+            slug=post['slug'],
+            category=post.get('category'),
+            excerpt=post.get('excerpt'),
+            content=post.get('content', ''),
+            author=post.get('author'),
+            published_date=date.fromisoformat(post['published_date']) if post.get('published_date') else date.today(),
+            featured_image=post.get('featured_image') or 'default-post.jpg',
+            read_time=post.get('read_time') or 5,
+            published=post.get('published', False),
+            created_at=sa.func.now(),
+            updated_at=sa.func.now()
+        ))
+        for position, tag in enumerate(post.get('tags', [])):
+            bind.execute(blog_post_tags.insert().values(
+                post_id=post['id'], tag=tag, tag_normalized=tag.strip().lower(), position=position
+            ))
+        if use_fts and post.get('published', False):
+            bind.execute(
+                sa.text("INSERT INTO blog_posts_fts (rowid, title, tags, excerpt, body) "
+                        "VALUES (:rowid, :title, :tags, :excerpt, :body)"),
+                {"rowid": post['id'], "title": post['title'], "tags": ' '.join(post.get('tags', [])),
+                 "excerpt": post.get('excerpt') or '', "body": strip_html(post.get('content', ''))}
+            )
+    print(f"✅ Imported {len(posts)} blog posts")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS blog_posts_fts")
+    op.drop_index('ix_blog_post_tags_tag', table_name='blog_post_tags')
+    op.drop_index('ix_blog_post_tags_post_id', table_name='blog_post_tags')
+    op.drop_table('blog_post_tags')
+    op.drop_index('ix_blog_posts_category_date', table_name='blog_posts')
+    op.drop_index('ix_blog_posts_published_date', table_name='blog_posts')
+    op.drop_table('blog_posts')
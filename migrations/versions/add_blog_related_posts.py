@@ -0,0 +1,36 @@
+"""Add blog_related_posts table of precomputed related posts
+
+Revision ID: add_blog_related_posts
+Revises: add_blog_posts
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_blog_related_posts'
+down_revision = 'add_blog_posts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled on the next app start (or with 'flask blog related')
+    op.create_table(
+        'blog_related_posts',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('related_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['blog_posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_id'], ['blog_posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id', 'rank')
+    )
+    op.create_index('ix_blog_related_posts_related_id', 'blog_related_posts', ['related_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_blog_related_posts_related_id', table_name='blog_related_posts')
+    op.drop_table('blog_related_posts')
@@ -0,0 +1,61 @@
+"""Add normalized email and E.164 phone lookup columns to bookings
+
+Revision ID: add_booking_contact_lookup
+Revises: add_booking_start_date_indexes
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.contact import normalize_phone
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_booking_contact_lookup'
+down_revision = 'add_booking_start_date_indexes'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_normalized', sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column('phone_e164', sa.String(length=20), nullable=True))
+
+    op.execute("UPDATE booking SET email_normalized = LOWER(TRIM(email)) WHERE email IS NOT NULL")
+
+    # Phone normalization needs the same rules as the application, so run it
+    # in Python, one batch of rows at a time
+    bind = op.get_bind()
+    booking = sa.table('booking', sa.column('id', sa.Integer), sa.column('phone_number', sa.String),
+                       sa.column('phone_e164', sa.String))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(booking.c.id, booking.c.phone_number)
+            .where(booking.c.id > last_id, booking.c.phone_number.isnot(None))
+            .order_by(booking.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for booking_id, phone_number in rows:
+            phone_e164 = normalize_phone(phone_number)
+            if phone_e164:
+                bind.execute(booking.update().where(booking.c.id == booking_id).values(phone_e164=phone_e164))
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_email_normalized', ['email_normalized'], unique=False)
+        batch_op.create_index('ix_booking_phone_e164', ['phone_e164'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_phone_e164')
+        batch_op.drop_index('ix_booking_email_normalized')
+        batch_op.drop_column('phone_e164')
+        batch_op.drop_column('email_normalized')
@@ -0,0 +1,26 @@
+"""Add reminder_sent_at marker to bookings
+
+Revision ID: add_booking_reminder_sent_at
+Revises: add_notification_outbox
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_booking_reminder_sent_at'
+down_revision = 'add_notification_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reminder_sent_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_column('reminder_sent_at')
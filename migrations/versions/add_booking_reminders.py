@@ -0,0 +1,66 @@
+"""Add booking_reminders table for scheduled SMS reminders
+
+Revision ID: add_booking_reminders
+Revises: add_booking_reminder_sent_at
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_booking_reminders'
+down_revision = 'add_booking_reminder_sent_at'
+branch_labels = None
+depends_on = None
+
+DEFAULT_OFFSETS = (1440, 30)
+
+
+def upgrade():
+    reminders = op.create_table(
+        'booking_reminders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('offset_minutes', sa.Integer(), nullable=False),
+        sa.Column('fire_at', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='scheduled'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('booking_id', 'offset_minutes', name='uq_booking_reminder_offset')
+    )
+    op.create_index('ix_booking_reminders_booking_id', 'booking_reminders', ['booking_id'], unique=False)
+    op.create_index('ix_booking_reminders_status_fire_at', 'booking_reminders', ['status', 'fire_at'], unique=False)
+
+    # Schedule reminders for upcoming active bookings that have a phone number
+    now = datetime.utcnow()
+    booking = sa.table('booking', sa.column('id', sa.Integer), sa.column('start_time', sa.DateTime),
+                       sa.column('status', sa.String), sa.column('phone_number', sa.String))
+    rows = op.get_bind().execute(
+        sa.select(booking.c.id, booking.c.start_time).where(
+            booking.c.start_time > now,
+            booking.c.status.in_(('pending', 'confirmed')),
+            booking.c.phone_number.isnot(None)
+        )
+    ).fetchall()
+
+    jobs = []
+    for booking_id, start_time in rows:
+        for offset in DEFAULT_OFFSETS:
+            fire_at = start_time - timedelta(minutes=offset)
+            if fire_at > now:
+                jobs.append({'booking_id': booking_id, 'offset_minutes': offset, 'fire_at': fire_at,
+                             'status': 'scheduled', 'attempts': 0})
+    if jobs:
+        op.bulk_insert(reminders, jobs)
+
+
+def downgrade():
+    op.drop_index('ix_booking_reminders_status_fire_at', table_name='booking_reminders')
+    op.drop_index('ix_booking_reminders_booking_id', table_name='booking_reminders')
+    op.drop_table('booking_reminders')
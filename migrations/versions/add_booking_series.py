@@ -0,0 +1,79 @@
+"""Add recurring booking series and series reminders
+
+Revision ID: add_booking_series
+Revises: add_booking_reminders
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_booking_series'
+down_revision = 'add_booking_reminders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'booking_series',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('phone_number', sa.String(length=20), nullable=True),
+        sa.Column('email_normalized', sa.String(length=120), nullable=True),
+        sa.Column('phone_e164', sa.String(length=20), nullable=True),
+        sa.Column('service_id', sa.Integer(), nullable=True),
+        sa.Column('num_people', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
+        sa.Column('frequency', sa.String(length=10), nullable=False, server_default='weekly'),
+        sa.Column('interval', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('count', sa.Integer(), nullable=True),
+        sa.Column('until', sa.DateTime(), nullable=True),
+        sa.Column('timezone', sa.String(length=50), nullable=False, server_default='America/New_York'),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='confirmed'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['service_id'], ['services.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_booking_series_email_normalized', 'booking_series', ['email_normalized'], unique=False)
+    op.create_index('ix_booking_series_service_id_start_time', 'booking_series', ['service_id', 'start_time'], unique=False)
+
+    op.create_table(
+        'booking_series_exceptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('series_id', sa.Integer(), nullable=False),
+        sa.Column('occurrence_start', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['series_id'], ['booking_series.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('series_id', 'occurrence_start', name='uq_series_exception_occurrence')
+    )
+
+    with op.batch_alter_table('booking_reminders', schema=None) as batch_op:
+        batch_op.alter_column('booking_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.add_column(sa.Column('series_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('occurrence_start', sa.DateTime(), nullable=True))
+        batch_op.create_foreign_key('fk_booking_reminders_series_id', 'booking_series', ['series_id'], ['id'])
+        batch_op.create_unique_constraint(
+            'uq_series_reminder_offset', ['series_id', 'occurrence_start', 'offset_minutes']
+        )
+
+
+def downgrade():
+    op.execute("DELETE FROM booking_reminders WHERE booking_id IS NULL")
+    with op.batch_alter_table('booking_reminders', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_series_reminder_offset', type_='unique')
+        batch_op.drop_constraint('fk_booking_reminders_series_id', type_='foreignkey')
+        batch_op.drop_column('occurrence_start')
+        batch_op.drop_column('series_id')
+        batch_op.alter_column('booking_id', existing_type=sa.Integer(), nullable=False)
+
+    op.drop_table('booking_series_exceptions')
+    op.drop_index('ix_booking_series_service_id_start_time', table_name='booking_series')
+    op.drop_index('ix_booking_series_email_normalized', table_name='booking_series')
+    op.drop_table('booking_series')
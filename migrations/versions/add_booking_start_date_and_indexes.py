@@ -0,0 +1,40 @@
+"""Add start_date day bucket and query indexes to bookings
+
+Revision ID: add_booking_start_date_indexes
+Revises: add_slot_capacity_ledger
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_booking_start_date_indexes'
+down_revision = 'add_slot_capacity_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('start_date', sa.Date(), nullable=True))
+
+    # Backfill the day bucket for existing bookings with the UTC day;
+    # use_local_booking_start_date moves the rows whose local day differs
+    op.execute("UPDATE booking SET start_date = DATE(start_time) WHERE start_date IS NULL")
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_start_date', ['start_date'], unique=False)
+        batch_op.create_index('ix_booking_start_time', ['start_time'], unique=False)
+        batch_op.create_index('ix_booking_status_start_time', ['status', 'start_time'], unique=False)
+        batch_op.create_index('ix_booking_service_id_start_time', ['service_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_service_id_start_time')
+        batch_op.drop_index('ix_booking_status_start_time')
+        batch_op.drop_index('ix_booking_start_time')
+        batch_op.drop_index('ix_booking_start_date')
+        batch_op.drop_column('start_date')
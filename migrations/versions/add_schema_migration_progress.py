@@ -0,0 +1,36 @@
+"""Add schema_migration_progress table for resumable online migrations
+
+Revision ID: add_schema_migration_progress
+Revises: add_booking_series
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_schema_migration_progress'
+down_revision = 'add_booking_series'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'schema_migration_progress',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task', sa.String(length=200), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('done_rows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='running'),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('task')
+    )
+
+
+def downgrade():
+    op.drop_table('schema_migration_progress')
@@ -0,0 +1,49 @@
+"""Add per-slot capacity ledger and service capacity
+
+Revision ID: add_slot_capacity_ledger
+Revises: 0eecf507f274
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_slot_capacity_ledger'
+down_revision = '0eecf507f274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('capacity', sa.Integer(), nullable=False, server_default='10'))
+
+    op.create_table(
+        'slot_capacity',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('slot_start', sa.DateTime(), nullable=False),
+        sa.Column('booked_people', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('booking_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('service_id', 'slot_start', name='uq_slot_capacity_service_slot')
+    )
+
+    # Backfill the ledger from bookings that currently hold seats
+    op.execute("""
+        INSERT INTO slot_capacity (service_id, slot_start, booked_people, booking_count, updated_at)
+        SELECT COALESCE(service_id, 0), start_time, SUM(num_people), COUNT(*), CURRENT_TIMESTAMP
+        FROM booking
+        WHERE status IS NULL OR status NOT IN ('cancelled', 'waitlisted')
+        GROUP BY COALESCE(service_id, 0), start_time
+    """)
+
+
+def downgrade():
+    op.drop_table('slot_capacity')
+
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.drop_column('capacity')
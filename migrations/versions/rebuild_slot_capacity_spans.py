@@ -0,0 +1,75 @@
+"""Rebuild the capacity ledger so bookings hold every slot they span
+
+Revision ID: rebuild_slot_capacity_spans
+Revises: use_local_booking_start_date
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.capacity import spanned_slots
+
+
+# revision identifiers, used by Alembic.
+revision = 'rebuild_slot_capacity_spans'
+down_revision = 'use_local_booking_start_date'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    # Ledger rows were keyed on each booking's start only; recount every
+    # booking that holds seats into all the 30-minute slots it spans
+    bind = op.get_bind()
+    booking = sa.table('booking', sa.column('id', sa.Integer), sa.column('service_id', sa.Integer),
+                       sa.column('start_time', sa.DateTime), sa.column('end_time', sa.DateTime),
+                       sa.column('num_people', sa.Integer), sa.column('status', sa.String))
+    slot_capacity = sa.table('slot_capacity', sa.column('service_id', sa.Integer),
+                             sa.column('slot_start', sa.DateTime), sa.column('booked_people', sa.Integer),
+                             sa.column('booking_count', sa.Integer), sa.column('updated_at', sa.DateTime))
+
+    usage = {}
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(booking.c.id, booking.c.service_id, booking.c.start_time, booking.c.end_time,
+                      booking.c.num_people)
+            .where(booking.c.id > last_id,
+                   sa.or_(booking.c.status.is_(None), booking.c.status.notin_(['cancelled', 'waitlisted'])))
+            .order_by(booking.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for _, service_id, start_time, end_time, num_people in rows:
+            for slot_start in spanned_slots(start_time, end_time):
+                key = (service_id or 0, slot_start)
+                people, count = usage.get(key, (0, 0))
+                usage[key] = (people + (num_people or 1), count + 1)
+        last_id = rows[-1][0]
+
+    op.execute(slot_capacity.delete())
+    now = datetime.utcnow()
+    params = [
+        {"service_id": service_id, "slot_start": slot_start, "booked_people": people,
+         "booking_count": count, "updated_at": now}
+        for (service_id, slot_start), (people, count) in usage.items()
+    ]
+    for first in range(0, len(params), BATCH_SIZE):
+        bind.execute(slot_capacity.insert(), params[first:first + BATCH_SIZE])
+
+
+def downgrade():
+    op.execute("DELETE FROM slot_capacity")
+    op.execute("""
+        INSERT INTO slot_capacity (service_id, slot_start, booked_people, booking_count, updated_at)
+        SELECT COALESCE(service_id, 0), start_time, SUM(num_people), COUNT(*), CURRENT_TIMESTAMP
+        FROM booking
+        WHERE status IS NULL OR status NOT IN ('cancelled', 'waitlisted')
+        GROUP BY COALESCE(service_id, 0), start_time
+    """)
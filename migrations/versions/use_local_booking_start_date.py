@@ -0,0 +1,70 @@
+"""Recompute booking start_date as the local day of start_time
+
+Revision ID: use_local_booking_start_date
+Revises: add_autoincrement_booking_ids
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import pytz
+
+
+# revision identifiers, used by Alembic.
+revision = 'use_local_booking_start_date'
+down_revision = 'add_autoincrement_booking_ids'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+# The business time zone when this revision was written (utils/local_time.py)
+LOCAL_TZ = pytz.timezone("America/New_York")
+
+# America/New_York is UTC-5 or UTC-4, so only a start before 05:00 UTC falls
+# on the previous local day; every other row keeps its UTC day
+EARLY_UTC_HOURS = 5
+
+
+def _local_date(start_time):
+    return pytz.UTC.localize(start_time).astimezone(LOCAL_TZ).date()
+
+
+def _backfill(table_name):
+    """Move the early-morning UTC starts to their local day, one batch at a time"""
+    bind = op.get_bind()
+    table = sa.table(table_name, sa.column('id', sa.Integer), sa.column('start_time', sa.DateTime),
+                     sa.column('start_date', sa.Date))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.start_time, table.c.start_date)
+            .where(table.c.id > last_id, table.c.start_time.isnot(None),
+                   sa.extract('hour', table.c.start_time) < EARLY_UTC_HOURS)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        changed = [
+            {"row_id": row_id, "day": _local_date(start_time)}
+            for row_id, start_time, start_date in rows
+            if start_date != _local_date(start_time)
+        ]
+        if changed:
+            bind.execute(
+                table.update().where(table.c.id == sa.bindparam('row_id')).values(start_date=sa.bindparam('day')),
+                changed
+            )
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    # start_date was the UTC day, which files evening bookings under the next day
+    for table_name in ('booking', 'booking_archive'):
+        _backfill(table_name)
+
+
+def downgrade():
+    for table_name in ('booking', 'booking_archive'):
+        op.execute(f"UPDATE {table_name} SET start_date = DATE(start_time)")
@@ -1,13 +1,22 @@
 from flask import Blueprint, render_template, request, jsonify, current_app, flash, redirect, url_for
 from flask_mail import Message, Mail
 from db import db
-from db.models import Booking, Service, EmailTemplate
-from datetime import datetime
-import threading
+from db.models import Booking, BookingArchive, Service, EmailTemplate
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 import pytz
-from .send_sms import send_booking_confirmation_sms, format_local_time as sms_format_local_time
+from .send_sms import booking_confirmation_sms_body, format_local_time as sms_format_local_time
+from utils.booking_utils import get_calendar_range, query_calendar_events, search_bookings_by_contact, \
+    booking_length_error
+from utils.booking_index import booking_index
+from utils.capacity import get_service_capacity, get_day_usage, reserve_seats, release_seats
+from utils.availability import get_availability_window, capacity_availability, format_slot_minutes
+from utils.outbox import queue_email, queue_sms
+from utils.reminders import schedule_booking_reminders, cancel_booking_reminders
+from utils.local_time import LOCAL_TZ
+from utils.booking_events import record_booking_event, event_stream_response
+from utils.write_queue import run_write
 
-LOCAL_TZ = pytz.timezone("America/New_York")  # change to your timezone
 
 def format_local_time(utc_time):
     """Convert UTC datetime to local timezone and format nicely"""
@@ -15,6 +24,9 @@ def format_local_time(utc_time):
 
 booking_bp = Blueprint("booking_bp", __name__, url_prefix="/booking")
 
+# Bookable slot starts, in minutes after midnight (8:30 AM to 2:00 PM, every 30 minutes)
+SLOT_MINUTES = [hour * 60 + minutes for hour in range(8, 15) for minutes in (0, 30)][1:-1]
+
 # 📅 Calendar page (old version)
 @booking_bp.route("/calendar")
 def booking_calendar():
@@ -47,10 +59,15 @@ def get_services():
     ]
     return jsonify(services_data)
 
-# 📅 API: Get all bookings (for FullCalendar)
+# 📅 API: Get bookings in the visible range (for FullCalendar)
 @booking_bp.route("/events")
 def booking_events():
-    bookings = Booking.query.all()
+    try:
+        start, end = get_calendar_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {str(e)}"}), 400
+
+    rows = query_calendar_events(start, end)
     events = [
         {
             "id": b.id,
@@ -58,10 +75,15 @@ def booking_events():
             "start": b.start_time.isoformat(),
             "end": b.end_time.isoformat(),
         }
-        for b in bookings
+        for b in rows
     ]
     return jsonify(events)
 
+# 📅 API: Live booking deltas (Server-Sent Events), resumable with Last-Event-ID
+@booking_bp.route("/events/stream")
+def booking_event_stream():
+    return event_stream_response(request)
+
 # 📅 API: Add new booking (enhanced with email confirmation)
 @booking_bp.route("/events", methods=["POST"])
 def add_booking():
@@ -88,97 +110,137 @@ def add_booking():
             end_time = datetime.fromisoformat(data["end_time"])
         except ValueError as e:
             return jsonify({"success": False, "error": f"Invalid date format: {str(e)}"}), 400
+        length_error = booking_length_error(start_time, end_time)
+        if length_error:
+            return jsonify({"success": False, "error": length_error}), 400
         
-        # Get number of people (default to 1, max 10)
+        # Get the service's per-slot capacity (defaults to 10 people)
+        service_id = data.get("service_id")
+        service = Service.query.get(service_id) if service_id else None
+        capacity = get_service_capacity(service)
+        
+        # Get number of people (default to 1, max is the slot capacity)
         num_people = int(data.get("num_people", 1))
         if num_people < 1:
             num_people = 1
-        elif num_people > 10:
-            num_people = 10
-        
-        # Check current capacity for this time slot
-        existing_bookings = Booking.query.filter(
-            Booking.start_time <= start_time,
-            Booking.end_time > start_time,
-            Booking.status != 'cancelled'
-        ).all()
+        elif num_people > capacity:
+            num_people = capacity
         
-        # Calculate total people already booked
-        total_existing_people = sum(booking.num_people for booking in existing_bookings)
+        # Commit through the group-commit writer when it is enabled
+        booking = run_write(_add_booking, data, service_id, start_time, end_time, num_people, capacity)
+        booked_people = booking.booked_people
+        is_fully_booked = not booking.has_room
+        new_total = booked_people if booking.has_room else booked_people + num_people
+
+        return jsonify({
+            "success": True, 
+            "id": booking.id,
+            "num_people": num_people,
+            "status": booking.status,
+            "isFullyBooked": is_fully_booked,
+            "totalPeople": new_total,
+            "bookingCount": booking.booking_count,
+            "capacity": capacity,
+            "availableSpots": max(0, capacity - booked_people),
+            "message": f"Booking created successfully for {num_people} {'person' if num_people == 1 else 'people'}! Confirmation email and SMS being sent." + 
+                      (f" Note: This time slot is full ({booked_people}/{capacity} people), you have been added to the waitlist." if is_fully_booked else f" ({booked_people}/{capacity} spots filled)")
+        }), 201
         
-        # Check if adding this booking would exceed capacity
-        new_total = total_existing_people + num_people
-        is_fully_booked = new_total > 10
+    except ValueError as ve:
+        error_msg = f"Invalid input data: {str(ve)}"
+        print(f"❌ Validation error: {error_msg}")
+        return jsonify({"success": False, "error": error_msg}), 400
         
-        # Allow booking but warn if over capacity
-        booking = Booking(
-            user_name=data["user_name"],
-            email=data["email"],
-            phone_number=data.get("phone"),  # Added phone number support
-            service_id=data.get("service_id"),
-            num_people=num_people,  # Add number of people
-            start_time=start_time,
-            end_time=end_time,
-            status="pending"
-        )
-        db.session.add(booking)
-        db.session.commit()
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        print(f"❌ Error creating booking: {error_msg}")
+        print(f"❌ Error type: {type(e).__name__}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": error_msg}), 500
 
-        # Send confirmation email (non-blocking)
-        if current_app.config.get("MAIL_USERNAME") and current_app.config.get("MAIL_PASSWORD"):
-            service = Service.query.get(booking.service_id) if booking.service_id else None
-            
-            # Capture the app instance for use in the background thread
-            app = current_app._get_current_object()
-            
-            def send_email_async():
-                """Send email in background thread to avoid blocking the request"""
-                try:
-                    with app.app_context():
-                        # Get the mail instance from the app
-                        mail = app.mail
-                        
-                        # Send confirmation email to customer
-                        print(f"📧 [Background] Sending confirmation email to {booking.email}")
-                        print(f"📧 [Background] SMTP Config: {app.config['MAIL_SERVER']}:{app.config['MAIL_PORT']}")
-                        print(f"📧 [Background] From: {app.config.get('MAIL_DEFAULT_SENDER')}")
-                        
-                        # Get email template
-                        email_template = EmailTemplate.query.filter_by(name='booking_confirmation').first()
-                        
-                        if email_template:
-                            # Use custom template
-                            subject = email_template.subject
-                            body = email_template.body
-                            
-                            # Replace variables in template
-                            variables = {
-                                '{user_name}': booking.user_name,
-                                '{email}': booking.email,
-                                '{service_name}': service.name if service else 'Unknown',
-                                '{service_price}': str(service.price) if service else 'N/A',
-                                '{num_people}': str(booking.num_people),
-                                '{people_text}': 'person' if booking.num_people == 1 else 'people',
-                                '{start_time}': format_local_time(booking.start_time.replace(tzinfo=pytz.UTC)),
-                                '{end_time}': format_local_time(booking.end_time.replace(tzinfo=pytz.UTC))
-                            }
-                            
-                            for variable, value in variables.items():
-                                subject = subject.replace(variable, value)
-                                body = body.replace(variable, value)
-                        else:
-                            # Fallback to default template
-                            people_text = "person" if booking.num_people == 1 else "people"
-                            subject = f"🌟 Booking Confirmation - {service.name if service else 'HolisticWeb'}"
-                            body = f"""Hello {booking.user_name},
+def _add_booking(data, service_id, start_time, end_time, num_people, capacity):
+    """
+    Write unit for add_booking: claim seats, add the booking and queue its
+    notifications (no commit)
+
+    Returns plain values, since the unit may run on the group-commit
+    writer's session.
+    """
+    service = Service.query.get(service_id) if service_id else None
+    
+    # Claim seats in the capacity ledger (atomic, same transaction as the booking)
+    has_room, booked_people, booking_count = reserve_seats(service_id, start_time, num_people, capacity, end_time)
+    
+    # Allow booking but put it on the waitlist if the slot is full
+    booking = Booking(
+        user_name=data["user_name"],
+        email=data["email"],
+        phone_number=data.get("phone"),  # Added phone number support
+        service_id=service_id,
+        num_people=num_people,  # Add number of people
+        start_time=start_time,
+        end_time=end_time,
+        status="pending" if has_room else "waitlisted"
+    )
+    db.session.add(booking)
+    db.session.flush()  # Assigns booking.id for the notifications
+    
+    # Queue confirmation email/SMS in the same transaction as the booking;
+    # the outbox workers send them after the commit
+    queue_booking_notifications(booking, service)
+    schedule_booking_reminders(booking)
+    record_booking_event('booking-created', booking)
+    
+    return SimpleNamespace(
+        id=booking.id,
+        status=booking.status,
+        has_room=has_room,
+        booked_people=booked_people,
+        booking_count=booking_count
+    )
+
+def queue_booking_notifications(booking, service):
+    """Queue the customer confirmation email, admin alert and SMS for a new booking (no commit)"""
+    people_text = "person" if booking.num_people == 1 else "people"
+    start_text = format_local_time(booking.start_time.replace(tzinfo=pytz.UTC))
+    end_text = format_local_time(booking.end_time.replace(tzinfo=pytz.UTC))
+    
+    # Get email template
+    email_template = EmailTemplate.query.filter_by(name='booking_confirmation').first()
+    
+    if email_template:
+        # Use custom template
+        subject = email_template.subject
+        body = email_template.body
+        
+        # Replace variables in template
+        variables = {
+            '{user_name}': booking.user_name,
+            '{email}': booking.email,
+            '{service_name}': service.name if service else 'Unknown',
+            '{service_price}': str(service.price) if service else 'N/A',
+            '{num_people}': str(booking.num_people),
+            '{people_text}': people_text,
+            '{start_time}': start_text,
+            '{end_time}': end_text
+        }
+        
+        for variable, value in variables.items():
+            subject = subject.replace(variable, value)
+            body = body.replace(variable, value)
+    else:
+        # Fallback to default template
+        subject = f"🌟 Booking Confirmation - {service.name if service else 'HolisticWeb'}"
+        body = f"""Hello {booking.user_name},
 
 Thank you for booking with HolisticWeb! ✨
 
 📌 Service: {service.name if service else "Unknown"}
-� Number of People: {booking.num_people} {people_text}
-�💰 Price: ${service.price if service else "N/A"}
-🕒 Start: {format_local_time(booking.start_time.replace(tzinfo=pytz.UTC))}
-🕒 End:   {format_local_time(booking.end_time.replace(tzinfo=pytz.UTC))}
+👥 Number of People: {booking.num_people} {people_text}
+💰 Price: ${service.price if service else "N/A"}
+🕒 Start: {start_text}
+🕒 End:   {end_text}
 
 {service.description if service else ""}
 
@@ -189,28 +251,18 @@ Best regards,
 
 If you need to reschedule or have any questions, please contact us.
 """
-                        
-                        msg = Message(
-                            subject=subject,
-                            recipients=[booking.email],
-                            sender=app.config.get('MAIL_DEFAULT_SENDER'),
-                            body=body
-                        )
-                        
-                        mail.send(msg)
-                        print(f"✅ [Background] Confirmation email sent successfully to {booking.email}")
-                        
-                        # Send notification email to admin
-                        try:
-                            people_text = "person" if booking.num_people == 1 else "people"
-                            admin_msg = Message(
-                                subject="📩 New Booking Received",
-                                recipients=["dambazolbayar@gmail.com"],   # replace with your admin email
-                                sender=app.config.get('MAIL_DEFAULT_SENDER'),
-                                body=f"""A new booking was created!
+    
+    queue_email('booking_confirmation', booking.email, subject, body, booking_id=booking.id)
+    
+    # Notification email to admin
+    queue_email(
+        'booking_admin_alert',
+        ["dambazolbayar@gmail.com"],   # replace with your admin email
+        "📩 New Booking Received",
+        f"""A new booking was created!
 
 📌 Service: {service.name if service else "Unknown"} (ID: {booking.service_id})
-📅 Date: {format_local_time(booking.start_time.replace(tzinfo=pytz.UTC))} - {format_local_time(booking.end_time.replace(tzinfo=pytz.UTC))}
+📅 Date: {start_text} - {end_text}
 👤 Customer: {booking.user_name}
 📧 Email: {booking.email}
 👥 Number of People: {booking.num_people} {people_text}
@@ -219,90 +271,44 @@ If you need to reschedule or have any questions, please contact us.
 Booking ID: {booking.id}
 
 Login to admin panel to manage this booking.
-"""
-                            )
-                            mail.send(admin_msg)
-                            print("✅ [Background] Admin notification sent successfully")
-                        except Exception as admin_email_error:
-                            print(f"❌ [Background] Admin email failed: {admin_email_error}")
-                        
-                except Exception as email_error:
-                    print(f"❌ [Background] Failed to send customer email: {email_error}")
-                    print(f"❌ Error type: {type(email_error).__name__}")
-                    print(f"❌ Error details: {str(email_error)}")
-                    if "authentication" in str(email_error).lower():
-                        print("❌ Authentication failed - check Gmail app password")
-                    elif "timeout" in str(email_error).lower():
-                        print("❌ Connection timeout - check network/firewall")
-                    # Print full traceback for debugging
-                    import traceback
-                    traceback.print_exc()
-            
-            # Start email sending in background
-            email_thread = threading.Thread(target=send_email_async, daemon=True)
-            email_thread.start()
-            
-            print(f"📧 Email confirmation being sent to {booking.email}")
-        else:
-            print("📧 Email credentials not configured")
-            print(f"📧 MAIL_USERNAME: {current_app.config.get('MAIL_USERNAME')}")
-            print(f"📧 MAIL_PASSWORD: {'***' if current_app.config.get('MAIL_PASSWORD') else 'Not set'}")
+""",
+        booking_id=booking.id
+    )
+    
+    # SMS confirmation
+    if booking.phone_number:
+        queue_sms(
+            'booking_confirmation',
+            booking.phone_e164 or booking.phone_number,
+            booking_confirmation_sms_body(
+                booking.user_name,
+                service.name if service else 'HolisticWeb Service',
+                booking.start_time
+            ),
+            booking_id=booking.id
+        )
+    else:
+        print("📱 No phone number provided for SMS confirmation")
 
-        # Send SMS confirmation (non-blocking)
-        if hasattr(booking, 'phone_number') and booking.phone_number:
-            service = Service.query.get(booking.service_id) if booking.service_id else None
-            
-            def send_sms_async():
-                """Send SMS in background thread to avoid blocking the request"""
-                try:
-                    print(f"📱 [Background] Sending SMS confirmation to {booking.phone_number}")
-                    
-                    success = send_booking_confirmation_sms(
-                        booking.phone_number,
-                        booking.user_name,
-                        service.name if service else 'HolisticWeb Service',
-                        booking.start_time
-                    )
-                    
-                    if success:
-                        print(f"✅ [Background] SMS confirmation sent successfully to {booking.phone_number}")
-                    else:
-                        print(f"❌ [Background] Failed to send SMS confirmation to {booking.phone_number}")
-                        
-                except Exception as sms_error:
-                    print(f"❌ [Background] SMS sending error: {sms_error}")
-            
-            # Start SMS sending in background
-            sms_thread = threading.Thread(target=send_sms_async, daemon=True)
-            sms_thread.start()
-            
-            print(f"📱 SMS confirmation being sent to {booking.phone_number}")
-        else:
-            print("📱 No phone number provided for SMS confirmation")
+def queue_cancellation_email(booking, service):
+    """Queue the cancellation email for a booking (no commit)"""
+    people_text = "person" if booking.num_people == 1 else "people"
+    subject = f"🚫 Booking Cancellation - {service.name if service else 'HolisticWeb'}"
+    body = f"""Hello {booking.user_name},
 
-        return jsonify({
-            "success": True, 
-            "id": booking.id,
-            "num_people": num_people,
-            "isFullyBooked": is_fully_booked,
-            "totalPeople": new_total,
-            "availableSpots": max(0, 10 - new_total),
-            "message": f"Booking created successfully for {num_people} {'person' if num_people == 1 else 'people'}! Confirmation email and SMS being sent." + 
-                      (f" Note: This time slot now has {new_total}/10 people." if new_total > 10 else f" ({new_total}/10 spots filled)")
-        }), 201
-        
-    except ValueError as ve:
-        error_msg = f"Invalid input data: {str(ve)}"
-        print(f"❌ Validation error: {error_msg}")
-        return jsonify({"success": False, "error": error_msg}), 400
-        
-    except Exception as e:
-        error_msg = f"Server error: {str(e)}"
-        print(f"❌ Error creating booking: {error_msg}")
-        print(f"❌ Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"success": False, "error": error_msg}), 500
+Your booking has been cancelled.
+
+📌 Service: {service.name if service else "Unknown"}
+👥 Number of People: {booking.num_people} {people_text}
+🕒 Original Time: {format_local_time(booking.start_time.replace(tzinfo=pytz.UTC))} - {format_local_time(booking.end_time.replace(tzinfo=pytz.UTC))}
+🆔 Booking ID: {booking.id}
+
+If you did not request this cancellation or have any questions, please contact us immediately.
+
+Best regards,
+- Serenity Wellness Studio
+"""
+    queue_email('booking_cancellation', booking.email, subject, body, booking_id=booking.id)
 
 # 📅 API: Get available time slots for a specific date
 @booking_bp.route("/available-slots")
@@ -317,47 +323,33 @@ def get_available_slots():
         # Parse the date
         selected_date = datetime.fromisoformat(date_str).date()
         
+        # Load the whole day's ledger rows for this service in one query
+        service = Service.query.get(service_id) if service_id else None
+        capacity = get_service_capacity(service)
+        slot_usage = get_day_usage(service_id, selected_date)
+        
         # Generate time slots (8:30 AM to 2:00 PM, 30-minute intervals)
         slots = []
-        start_hour = 8
-        end_hour = 15  # Set to 15 to include 2:00 PM (14:00)
-        
-        for hour in range(start_hour, end_hour):
-            for minutes in [0, 30]:
-                # Skip 8:00 AM slot, start from 8:30 AM
-                if hour == 8 and minutes == 0:
-                    continue
-                # Stop after 2:00 PM (don't include 2:30 PM)
-                if hour == 14 and minutes == 30:
-                    break
-                    break  # Don't go past 2:00 PM
-                
-                # Create datetime for this slot
-                slot_datetime = datetime.combine(selected_date, datetime.min.time().replace(hour=hour, minute=minutes))
-                
-                # Get existing bookings for this time slot (overlapping bookings)
-                existing_bookings = Booking.query.filter(
-                    Booking.start_time <= slot_datetime,
-                    Booking.end_time > slot_datetime,
-                    Booking.status != 'cancelled'
-                ).all()
-                
-                # Calculate total people booked for this slot
-                total_people = sum(booking.num_people for booking in existing_bookings)
-                available_spots = max(0, 10 - total_people)
-                
-                # Format time string
-                time_str = slot_datetime.strftime("%I:%M %p").lstrip('0')
-                
-                slots.append({
-                    "time": slot_datetime.isoformat(),
-                    "timeString": time_str,
-                    "totalPeople": total_people,
-                    "availableSpots": available_spots,
-                    "isFullyBooked": total_people >= 10,
-                    "bookingCount": len(existing_bookings),  # Number of individual bookings
-                    "available": True  # Always true - we still allow overbooking
-                })
+        for slot_minute in SLOT_MINUTES:
+            # Create datetime for this slot
+            slot_datetime = datetime.combine(selected_date, datetime.min.time()) + timedelta(minutes=slot_minute)
+            
+            # Get people booked for this slot from the capacity ledger
+            total_people, booking_count = slot_usage.get(slot_datetime, (0, 0))
+            available_spots = max(0, capacity - total_people)
+            
+            # Format time string
+            time_str = slot_datetime.strftime("%I:%M %p").lstrip('0')
+            
+            slots.append({
+                "time": slot_datetime.isoformat(),
+                "timeString": time_str,
+                "totalPeople": total_people,
+                "availableSpots": available_spots,
+                "isFullyBooked": total_people >= capacity,
+                "bookingCount": booking_count,  # Number of individual bookings
+                "available": True  # Always true - we still allow overbooking
+            })
         
         return jsonify(slots)
         
@@ -365,38 +357,70 @@ def get_available_slots():
         print(f"❌ Error getting available slots: {e}")
         return jsonify({"error": str(e)}), 400
 
+# 📅 API: Availability for every service and every day of a month (one round trip)
+@booking_bp.route("/availability")
+def get_month_availability():
+    try:
+        first_day, num_days = get_availability_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {str(e)}"}), 400
+    
+    service_id = request.args.get('service_id')
+    if service_id:
+        services = Service.query.filter_by(id=service_id).all()
+    else:
+        current_language = request.args.get('lang', 'ENG')
+        if current_language not in ['ENG', 'MON']:
+            current_language = 'ENG'
+        services = Service.query.filter_by(language=current_language).all()
+    
+    availability = capacity_availability(services, first_day, num_days, SLOT_MINUTES)
+    return jsonify({
+        "start": first_day.isoformat(),
+        "days": num_days,
+        "slots": format_slot_minutes(SLOT_MINUTES),
+        "services": {str(service_id): data for service_id, data in availability.items()}
+    })
+
 # 📅 Form-based booking (for backwards compatibility)
 @booking_bp.route("/new", methods=["GET", "POST"])
 def create_booking():
     if request.method == "POST":
         try:
-            # Get number of people (default to 1, max 10)
+            service_id = request.form["service_id"]
+            capacity = get_service_capacity(Service.query.get(service_id))
+            
+            # Get number of people (default to 1, max is the slot capacity)
             num_people = int(request.form.get("num_people", 1))
             if num_people < 1:
                 num_people = 1
-            elif num_people > 10:
-                num_people = 10
-                
-            new_booking = Booking(
-                user_name=request.form["user_name"],
-                email=request.form["email"],
-                phone_number=request.form.get("phone_number"),  # Added phone number support
-                service_id=request.form["service_id"],
-                num_people=num_people,  # Add number of people
-                start_time=datetime.fromisoformat(request.form["start_time"]),
-                end_time=datetime.fromisoformat(request.form["end_time"]),
+            elif num_people > capacity:
+                num_people = capacity
+            
+            start_time = datetime.fromisoformat(request.form["start_time"])
+            end_time = datetime.fromisoformat(request.form["end_time"])
+            length_error = booking_length_error(start_time, end_time)
+            if length_error:
+                flash(f"Error creating booking: {length_error}", "error")
+                return render_new_booking_form(), 400
+            
+            has_room = run_write(
+                _create_form_booking, request.form.to_dict(), service_id, start_time, end_time, num_people, capacity
             )
-            db.session.add(new_booking)
-            db.session.commit()
 
             # Redirect to the new booking page
-            flash(f"Booking created successfully for {num_people} {'person' if num_people == 1 else 'people'}!", "success")
+            flash(f"Booking created successfully for {num_people} {'person' if num_people == 1 else 'people'}!" +
+                  ("" if has_room else " This time slot is full, so you have been added to the waitlist."), "success")
             return redirect(url_for("booking.booking_page"))
 
         except Exception as e:
             flash(f"Error creating booking: {e}", "error")
             return redirect(url_for("booking.create_booking"))
 
+    return render_new_booking_form()
+
+def render_new_booking_form():
+    """The booking form with the services of the requested language"""
     # Get language from query parameter or default to 'ENG'
     current_language = request.args.get('lang', 'ENG')
     if current_language not in ['ENG', 'MON']:
@@ -406,6 +430,26 @@ def create_booking():
     services = Service.query.filter_by(language=current_language).all()
     return render_template("new_booking.html", services=services, current_language=current_language)
 
+def _create_form_booking(form, service_id, start_time, end_time, num_people, capacity):
+    """Write unit for the create_booking form (no commit); returns whether the slot had room"""
+    has_room, _, _ = reserve_seats(service_id, start_time, num_people, capacity, end_time)
+        
+    new_booking = Booking(
+        user_name=form["user_name"],
+        email=form["email"],
+        phone_number=form.get("phone_number"),  # Added phone number support
+        service_id=service_id,
+        num_people=num_people,  # Add number of people
+        start_time=start_time,
+        end_time=end_time,
+        status="pending" if has_room else "waitlisted"
+    )
+    db.session.add(new_booking)
+    db.session.flush()
+    schedule_booking_reminders(new_booking)
+    record_booking_event('booking-created', new_booking)
+    return has_room
+
 # 📅 API: Cancel a booking
 @booking_bp.route("/events/<int:booking_id>/cancel", methods=["POST"])
 def cancel_booking(booking_id):
@@ -416,58 +460,9 @@ def cancel_booking(booking_id):
         if booking.status == 'cancelled':
             return jsonify({"success": False, "error": "Booking is already cancelled"}), 400
         
-        # Update booking status to cancelled
-        booking.status = 'cancelled'
-        db.session.commit()
-        
-        # Send cancellation email notification
-        if current_app.config.get("MAIL_USERNAME") and current_app.config.get("MAIL_PASSWORD"):
-            service = Service.query.get(booking.service_id) if booking.service_id else None
-            
-            # Capture the app instance for use in the background thread
-            app = current_app._get_current_object()
-            
-            def send_cancellation_email_async():
-                """Send cancellation email in background thread"""
-                try:
-                    with app.app_context():
-                        mail = app.mail
-                        
-                        # Send cancellation email to customer
-                        people_text = "person" if booking.num_people == 1 else "people"
-                        subject = f"🚫 Booking Cancellation - {service.name if service else 'HolisticWeb'}"
-                        body = f"""Hello {booking.user_name},
-
-Your booking has been cancelled.
-
-📌 Service: {service.name if service else "Unknown"}
-👥 Number of People: {booking.num_people} {people_text}
-🕒 Original Time: {format_local_time(booking.start_time.replace(tzinfo=pytz.UTC))} - {format_local_time(booking.end_time.replace(tzinfo=pytz.UTC))}
-🆔 Booking ID: {booking.id}
-
-If you did not request this cancellation or have any questions, please contact us immediately.
-
-Best regards,
-- Serenity Wellness Studio
-"""
-                        
-                        from flask_mail import Message
-                        msg = Message(
-                            subject=subject,
-                            recipients=[booking.email],
-                            sender=app.config.get('MAIL_DEFAULT_SENDER'),
-                            body=body
-                        )
-                        
-                        mail.send(msg)
-                        print(f"✅ [Background] Cancellation email sent to {booking.email}")
-                        
-                except Exception as email_error:
-                    print(f"❌ [Background] Failed to send cancellation email: {email_error}")
-            
-            # Start email sending in background
-            email_thread = threading.Thread(target=send_cancellation_email_async, daemon=True)
-            email_thread.start()
+        if not run_write(_cancel_booking, booking_id):
+            return jsonify({"success": False, "error": "Booking is already cancelled"}), 400
+        booking_index.remove(booking)
         
         return jsonify({
             "success": True,
@@ -479,6 +474,21 @@ Best regards,
         print(f"❌ Error cancelling booking: {e}")
         return jsonify({"success": False, "error": str(e)}), 400
 
+def _cancel_booking(booking_id):
+    """Write unit for cancel_booking (no commit); False if it was cancelled meanwhile"""
+    booking = Booking.query.get(booking_id)
+    if booking is None or booking.status == 'cancelled':
+        return False
+    
+    # Release the booking's seats, mark it cancelled and queue the
+    # cancellation email in one transaction
+    release_seats(booking)
+    booking.status = 'cancelled'
+    queue_cancellation_email(booking, booking.service)
+    cancel_booking_reminders(booking)
+    record_booking_event('booking-cancelled', booking)
+    return True
+
 # 📅 Customer booking management page
 @booking_bp.route("/my-bookings")
 def my_bookings():
@@ -488,17 +498,21 @@ def my_bookings():
 @booking_bp.route("/my-bookings/search")
 def search_my_bookings():
     email = request.args.get('email')
+    phone = request.args.get('phone')
     
-    if not email:
-        return jsonify({"error": "Email parameter is required"}), 400
+    if not email and not phone:
+        return jsonify({"error": "Email or phone number is required"}), 400
     
     try:
-        # Get all bookings for this email
-        bookings = Booking.query.filter_by(email=email).order_by(Booking.start_time.desc()).all()
+        # Exact indexed lookup on the normalized contact columns (no partial matches); services load in the same query
+        # ?history=1 also searches bookings moved to the archive
+        bookings = search_bookings_by_contact(
+            email=email, phone=phone, include_archive=request.args.get('history') in ('1', 'true')
+        )
         
         bookings_data = []
         for booking in bookings:
-            service = Service.query.get(booking.service_id) if booking.service_id else None
+            service = booking.service
             
             bookings_data.append({
                 "id": booking.id,
@@ -510,15 +524,19 @@ def search_my_bookings():
                 "end_time": booking.end_time.isoformat(),
                 "status": booking.status,
                 "service": {
-                    "name": service.name if service else "Unknown",
-                    "price": service.price if service else 0,
-                    "duration": service.duration if service else 0
+                    "name": service.name,
+                    "price": service.price,
+                    "duration": service.duration
                 } if service else None,
-                "created_at": booking.created_at.isoformat() if booking.created_at else None
+                "created_at": booking.created_at.isoformat() if booking.created_at else None,
+                "archived": isinstance(booking, BookingArchive)
             })
         
         return jsonify(bookings_data)
         
+    except ValueError as e:
+        # Partial email/phone: only exact matches are public
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Error searching bookings: {e}")
         return jsonify({"error": str(e)}), 400
@@ -531,28 +549,23 @@ def debug_schema():
         from db.models import Booking
         columns = Booking.__table__.columns.keys()
         
-        # Also check actual database
-        import sqlite3
-        import os
+        # Also check actual database (any backend)
+        from sqlalchemy import inspect
+        inspector = inspect(db.engine)
         
-        db_path = os.path.join('instance', 'data.sqlite')
-        if os.path.exists(db_path):
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute('PRAGMA table_info(booking)')
-            db_columns = cursor.fetchall()
-            conn.close()
+        if 'booking' in inspector.get_table_names():
+            db_columns = inspector.get_columns('booking')
             
             return jsonify({
                 "model_columns": list(columns),
-                "database_columns": [{"name": col[1], "type": col[2]} for col in db_columns],
-                "database_path": db_path
+                "database_columns": [{"name": col['name'], "type": str(col['type'])} for col in db_columns],
+                "database_url": db.engine.url.render_as_string(hide_password=True)
             })
         else:
             return jsonify({
                 "model_columns": list(columns),
-                "error": "Database file not found",
-                "database_path": db_path
+                "error": "Booking table not found",
+                "database_url": db.engine.url.render_as_string(hide_password=True)
             })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
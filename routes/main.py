@@ -12,6 +12,8 @@ from db.models import Service, SiteSetting, AboutImage
 from routes.testimony import get_approved_testimonials
 from routes.send_sms import get_sms_status, test_sms_connection, check_and_send_reminders
 from utils.site_settings import get_site_settings
+from utils.outbox import get_outbox_status
+from utils.write_queue import get_write_queue_status
 
 # Facebook integration - try to import, set availability flag
 FACEBOOK_AVAILABLE = False
@@ -183,6 +185,17 @@ def sms_status():
     }, 200
 
 
+@main_bp.route('/notification-status')
+def notification_status():
+    """Outbox message counts and worker pool metrics"""
+    return {
+        'outbox': get_outbox_status(),
+        'smtp_pool': current_app.mail.pool.stats(),
+        'group_commit': get_write_queue_status(),
+        'message': 'Notification outbox status'
+    }, 200
+
+
 @main_bp.route('/test-sms')
 def test_sms():
     """Test SMS connection and configuration"""
@@ -2,8 +2,14 @@
 import os
 import json
 from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pytz
 
+from utils.contact import normalize_phone
+from utils.local_time import LOCAL_TZ
+
 try:
     from twilio.rest import Client
     TWILIO_AVAILABLE = True
@@ -49,8 +55,11 @@ if TWILIO_AVAILABLE and TWILIO_SID and TWILIO_AUTH_TOKEN:
 else:
     print("⚠️ Twilio client not configured. SMS functionality disabled.")
 
-# Timezone configuration
-LOCAL_TZ = pytz.timezone("America/New_York")  # change to your timezone
+# Reminder sending limits (overridable with SMS_MAX_CONCURRENCY / SMS_RATE_PER_SECOND)
+DEFAULT_SMS_CONCURRENCY = 4
+DEFAULT_SMS_RATE_PER_SECOND = 1.0  # Twilio's default throughput for a long code number
+
+# Timezone configuration (LOCAL_TZ): utils/local_time.py
 
 def format_local_time(utc_time):
     """Convert UTC datetime to local timezone and format nicely"""
@@ -68,19 +77,11 @@ def send_sms_reminder(to_number, message):
             print("❌ No phone number provided")
             return False
             
-        # Format phone number properly (add +1 if not present)
-        formatted_phone = str(to_number).strip()
-        if not formatted_phone.startswith('+'):
-            # Remove any non-digit characters first
-            import re
-            digits_only = re.sub(r'\D', '', formatted_phone)
-            if len(digits_only) == 10:
-                formatted_phone = '+1' + digits_only
-            elif len(digits_only) == 11 and digits_only.startswith('1'):
-                formatted_phone = '+' + digits_only
-            else:
-                print(f"❌ Invalid phone number format: {to_number}")
-                return False
+        # Bookings store phone_e164 already; anything else is normalized here
+        formatted_phone = normalize_phone(to_number)
+        if not formatted_phone:
+            print(f"❌ Invalid phone number format: {to_number}")
+            return False
         
         # Send SMS using Twilio
         sms_message = client.messages.create(
@@ -96,17 +97,12 @@ def send_sms_reminder(to_number, message):
         print(f"❌ Error sending SMS: {e}")
         return False
 
-def send_booking_confirmation_sms(to_number, user_name, service_name, start_time):
-    """Send booking confirmation SMS"""
-    if not client:
-        print("Twilio client not configured. SMS not sent.")
-        return False
+def booking_confirmation_sms_body(user_name, service_name, start_time):
+    """Text of the booking confirmation SMS"""
+    # Format appointment time in local timezone
+    local_time = format_local_time(start_time.replace(tzinfo=pytz.UTC))
     
-    try:
-        # Format appointment time in local timezone
-        local_time = format_local_time(start_time.replace(tzinfo=pytz.UTC))
-        
-        message = f"""Hello {user_name}! 
+    return f"""Hello {user_name}! 
 
 Your booking has been confirmed:
 📅 Service: {service_name}
@@ -115,7 +111,28 @@ Your booking has been confirmed:
 We look forward to seeing you!
 
 - Serenity Wellness Studio"""
-        
+
+def booking_reminder_sms_body(user_name, start_time):
+    """Text of the booking reminder SMS"""
+    # Format appointment time in local timezone
+    local_time = format_local_time(start_time.replace(tzinfo=pytz.UTC))
+    
+    return f"""Hello {user_name}, 
+
+This is a reminder: your appointment is at {local_time}.
+
+See you soon!
+
+- Serenity Wellness Studio"""
+
+def send_booking_confirmation_sms(to_number, user_name, service_name, start_time):
+    """Send booking confirmation SMS"""
+    if not client:
+        print("Twilio client not configured. SMS not sent.")
+        return False
+    
+    try:
+        message = booking_confirmation_sms_body(user_name, service_name, start_time)
         return send_sms_reminder(to_number, message)
         
     except Exception as e:
@@ -129,64 +146,90 @@ def send_booking_reminder_sms(to_number, user_name, start_time, minutes_before=3
         return False
     
     try:
-        # Format appointment time in local timezone
-        local_time = format_local_time(start_time.replace(tzinfo=pytz.UTC))
-        
-        message = f"""Hello {user_name}, 
-
-This is a reminder: your appointment is at {local_time}.
-
-See you soon!
-
-- Serenity Wellness Studio"""
-        
+        message = booking_reminder_sms_body(user_name, start_time)
         return send_sms_reminder(to_number, message)
         
     except Exception as e:
         print(f"❌ Error sending booking reminder SMS: {e}")
         return False
 
+class RateLimiter:
+    """Token bucket shared by the reminder sender threads"""
+    
+    def __init__(self, rate_per_second, burst=1):
+        self.rate = float(rate_per_second)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until the caller may send one message"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Take a token even if it is not there yet; the deficit is how long to wait
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def send_reminders_concurrently(reminders, max_workers=DEFAULT_SMS_CONCURRENCY,
+                                rate_per_second=DEFAULT_SMS_RATE_PER_SECOND):
+    """Send reminder SMS from a bounded thread pool, rate limited across threads
+    
+    Args:
+        reminders: list of (reminder_id, phone_number, user_name, start_time)
+    
+    Returns:
+        list: reminder ids whose SMS failed
+    """
+    limiter = RateLimiter(rate_per_second)
+    
+    def send_one(reminder):
+        reminder_id, phone_number, user_name, start_time = reminder
+        limiter.acquire()
+        print(f"📱 Sending reminder to {user_name} at {phone_number}")
+        try:
+            return send_booking_reminder_sms(phone_number, user_name, start_time)
+        except Exception as e:
+            print(f"❌ Error sending reminder {reminder_id}: {e}")
+            return False
+    
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for reminder, success in zip(reminders, executor.map(send_one, reminders)):
+            if success:
+                print(f"✅ Reminder sent successfully to {reminder[2]}")
+            else:
+                print(f"❌ Failed to send reminder to {reminder[2]}")
+                failed.append(reminder[0])
+    return failed
+
 def check_and_send_reminders(app, Booking):
-    """Check for bookings that need reminders and send SMS
+    """Send every reminder that is due now
+    
+    Reminders are normally fired on time by the reminder scheduler
+    (utils/reminders.py); this runs the same claim-and-send step on demand,
+    e.g. from /send-reminders. Claims make it safe to run alongside the
+    scheduler.
     
     Args:
         app: Flask application instance
-        Booking: Booking model class
+        Booking: Booking model class (kept for existing callers)
     """
     if not client:
         print("Twilio client not configured. Skipping reminder check.")
         return
     
-    with app.app_context():
-        now = datetime.utcnow()
-        reminder_time = now + timedelta(minutes=30)  # Send reminders 30 minutes before
-
-        # Get bookings 30 minutes from now (within 5-minute window for more flexibility)
-        bookings = Booking.query.filter(
-            Booking.start_time.between(reminder_time, reminder_time + timedelta(minutes=5))
-        ).all()
-
-        print(f"🔍 Checking for reminders at {now}")
-        print(f"📅 Looking for bookings between {reminder_time} and {reminder_time + timedelta(minutes=5)}")
-        print(f"📋 Found {len(bookings)} bookings needing reminders")
-
-        for booking in bookings:
-            # Check if booking has a phone number field
-            phone_number = getattr(booking, 'phone_number', None)
-            if phone_number:
-                print(f"📱 Sending reminder to {booking.user_name} at {phone_number}")
-                success = send_booking_reminder_sms(
-                    phone_number, 
-                    booking.user_name, 
-                    booking.start_time
-                )
-                
-                if success:
-                    print(f"✅ Reminder sent successfully to {booking.user_name}")
-                else:
-                    print(f"❌ Failed to send reminder to {booking.user_name}")
-            else:
-                print(f"⚠️ No phone number for booking {booking.id} - {booking.user_name}")
+    from utils.reminders import send_due_reminders
+    
+    print(f"🔍 Checking for due reminders at {datetime.utcnow()}")
+    sent = send_due_reminders(app)
+    print(f"📋 Sent {sent} due reminders")
 
 def get_sms_status():
     """Get SMS service status"""
@@ -1,14 +1,22 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from db import db
 from db.models import Service, SiteSetting, EmailTemplate, User, Testimonial, AboutImage
 from werkzeug.utils import secure_filename
-from utils.site_settings import get_settings_by_language
+from utils.site_settings import get_settings_by_language, save_settings
+from utils.booking_index import booking_index
+from utils.capacity import release_seats, DEFAULT_CAPACITY
+from utils.reminders import cancel_booking_reminders
+from utils.booking_events import record_booking_event
+from utils.booking_transfer import generate_export, import_bookings, FORMATS, MIMETYPES, IMPORT_BATCH_SIZE
+from utils.write_queue import run_write
+import click
+import io
 import os
 from functools import wraps
 from datetime import datetime
 
-web_admin_bp = Blueprint('web_admin_panel', __name__, url_prefix='/web_admin')
+web_admin_bp = Blueprint('web_admin_panel', __name__, url_prefix='/web_admin', cli_group='web_admin')
 
 def admin_required(f):
     @wraps(f)
@@ -45,6 +53,7 @@ def edit_service(service_id):
             service.description = request.form.get('description')
             service.price = float(request.form.get('price'))
             service.duration = int(request.form.get('duration'))
+            service.capacity = int(request.form.get('capacity') or DEFAULT_CAPACITY)
             service.language = request.form.get('language', 'ENG')  # Add language support
             
             # Handle image upload
@@ -82,6 +91,7 @@ def create_service():
                 description=request.form.get('description'),
                 price=float(request.form.get('price')),
                 duration=int(request.form.get('duration')),
+                capacity=int(request.form.get('capacity') or DEFAULT_CAPACITY),
                 language=request.form.get('language', 'ENG')  # Add language support
             )
             
@@ -233,17 +243,11 @@ def update_settings():
             selected_language = 'ENG'
         
         # Get all form data
-        for key, value in request.form.items():
-            if key.startswith('setting_'):
-                setting_key = key.replace('setting_', '')
-                
-                # Find or create setting for the selected language
-                setting = SiteSetting.query.filter_by(key=setting_key, language=selected_language).first()
-                if not setting:
-                    setting = SiteSetting(key=setting_key, language=selected_language)
-                    db.session.add(setting)
-                
-                setting.value = value
+        values = {
+            key.replace('setting_', ''): value
+            for key, value in request.form.items()
+            if key.startswith('setting_')
+        }
         
         # Handle home page image upload
         if 'home_image' in request.files:
@@ -281,30 +285,23 @@ def update_settings():
                     except OSError as e:
                         current_app.logger.warning(f"Could not set file permissions: {e}")
                     
-                    # Update or create home_image setting for the selected language
-                    setting = SiteSetting.query.filter_by(key='home_image', language=selected_language).first()
-                    if not setting:
-                        setting = SiteSetting(key='home_image', language=selected_language)
-                        db.session.add(setting)
-                    
                     # Store relative path for Flask's url_for function
                     relative_path = f"uploads/home/{filename}"
-                    setting.value = relative_path
+                    values['home_image'] = relative_path
                     
                     current_app.logger.info(f"Successfully uploaded home image: {relative_path} for language: {selected_language}")
                     
                 except Exception as upload_error:
                     current_app.logger.error(f"Home image upload failed: {upload_error}")
                     flash(f'Failed to upload home image: {str(upload_error)}', 'error')
-                    db.session.rollback()
                     return redirect(url_for('web_admin_panel.admin_settings'))
         
-        db.session.commit()
+        # Write every setting of the selected language in one transaction
+        run_write(save_settings, values, selected_language)
         flash(f'Settings updated successfully for {selected_language}!', 'success')
         
     except Exception as e:
         flash(f'Error updating settings: {str(e)}', 'error')
-        db.session.rollback()
     
     return redirect(url_for('web_admin_panel.admin_settings'))
 
@@ -620,6 +617,115 @@ def admin_bookings():
     bookings = Booking.query.order_by(Booking.start_time.desc()).all()
     return render_template('admin/bookings.html', bookings=bookings)
 
+@web_admin_bp.route('/bookings/search')
+@admin_required
+def search_bookings():
+    """Bookings by email/phone, partial input allowed (?email=&phone=&history=1)"""
+    from db.models import BookingArchive
+    from utils.booking_utils import search_bookings_by_contact
+    email = request.args.get('email')
+    phone = request.args.get('phone')
+    if not email and not phone:
+        return jsonify({"error": "Email or phone number is required"}), 400
+
+    bookings = search_bookings_by_contact(
+        email=email, phone=phone, include_archive=request.args.get('history') in ('1', 'true'), allow_prefix=True
+    )
+    return jsonify([{
+        "id": booking.id,
+        "user_name": booking.user_name,
+        "email": booking.email,
+        "phone_number": booking.phone_number,
+        "start_time": booking.start_time.isoformat(),
+        "end_time": booking.end_time.isoformat(),
+        "status": booking.status,
+        "service": booking.service.name if booking.service else None,
+        "archived": isinstance(booking, BookingArchive)
+    } for booking in bookings])
+
+def _export_filters(start, end, status):
+    """Turn export options (YYYY-MM-DD dates, status) into iter_bookings filters"""
+    return {
+        "start": datetime.fromisoformat(start) if start else None,
+        "end": datetime.fromisoformat(end) if end else None,
+        "status": status or None
+    }
+
+@web_admin_bp.route('/bookings/export')
+@admin_required
+def export_bookings():
+    """Stream bookings as CSV or JSON Lines (?format=csv|jsonl&start=&end=&status=)"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    try:
+        filters = _export_filters(request.args.get('start'), request.args.get('end'), request.args.get('status'))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date: {str(e)}"}), 400
+
+    filename = f"bookings-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    return Response(
+        stream_with_context(generate_export(fmt, **filters)),
+        mimetype=MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@web_admin_bp.route('/bookings/import', methods=['POST'])
+@admin_required
+def import_bookings_upload():
+    """Bulk import bookings from an uploaded CSV or JSON Lines file"""
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV or JSON Lines file to import.', 'error')
+        return redirect(url_for('web_admin_panel.admin_bookings'))
+
+    fmt = 'jsonl' if upload.filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        stats, errors = import_bookings(stream, fmt)
+    except Exception as e:
+        flash(f'Error importing bookings: {str(e)}', 'error')
+        return redirect(url_for('web_admin_panel.admin_bookings'))
+
+    flash(f"Imported {stats['imported']} bookings ({stats['skipped']} already present, {stats['failed']} failed).",
+          'success' if not errors else 'warning')
+    for line_number, message in errors[:10]:
+        flash(f"Line {line_number}: {message}" if line_number else message, 'error')
+    return redirect(url_for('web_admin_panel.admin_bookings'))
+
+@web_admin_bp.cli.command('export-bookings')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default='-', help='File to write (default: stdout)')
+@click.option('--start', help='Only bookings starting on/after this date (YYYY-MM-DD)')
+@click.option('--end', help='Only bookings starting before this date (YYYY-MM-DD)')
+@click.option('--status', type=click.Choice(['pending', 'confirmed', 'waitlisted', 'cancelled']))
+def export_bookings_command(fmt, output, start, end, status):
+    """Export bookings as CSV or JSON Lines"""
+    lines = 0
+    with click.open_file(output, 'w', encoding='utf-8', lazy=False) as out:
+        for line in generate_export(fmt, **_export_filters(start, end, status)):
+            out.write(line)
+            lines += 1
+    rows = lines - 1 if fmt == 'csv' else lines  # CSV starts with a header line
+    click.echo(f"✅ Exported {rows} bookings", err=True)
+
+@web_admin_bp.cli.command('import-bookings')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Rows per transaction')
+@click.option('--status', 'default_status', default='confirmed', show_default=True,
+              help='Status for rows that do not have one')
+def import_bookings_command(path, fmt, batch_size, default_status):
+    """Bulk import bookings from a CSV or JSON Lines file"""
+    fmt = fmt or ('jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        stats, errors = import_bookings(stream, fmt, batch_size=batch_size, default_status=default_status)
+
+    for line_number, message in errors:
+        click.echo(f"❌ Line {line_number}: {message}" if line_number else f"❌ {message}", err=True)
+    click.echo(f"✅ Imported {stats['imported']} bookings in {stats['batches']} batches "
+               f"({stats['skipped']} already present, {stats['failed']} failed)")
+
 @web_admin_bp.route('/bookings/<int:booking_id>/cancel', methods=['POST'])
 @admin_required
 def admin_cancel_booking(booking_id):
@@ -628,11 +734,10 @@ def admin_cancel_booking(booking_id):
         from db.models import Booking
         booking = Booking.query.get_or_404(booking_id)
         
-        if booking.status == 'cancelled':
+        if booking.status == 'cancelled' or not run_write(_cancel_booking, booking_id):
             flash('Booking is already cancelled.', 'warning')
         else:
-            booking.status = 'cancelled'
-            db.session.commit()
+            booking_index.remove(booking)
             flash(f'Booking for {booking.user_name} has been cancelled successfully.', 'success')
         
         return redirect(url_for('web_admin_panel.admin_bookings'))
@@ -641,6 +746,19 @@ def admin_cancel_booking(booking_id):
         flash(f'Error cancelling booking: {str(e)}', 'error')
         return redirect(url_for('web_admin_panel.admin_bookings'))
 
+def _cancel_booking(booking_id):
+    """Write unit for admin_cancel_booking (no commit); False if it was cancelled meanwhile"""
+    from db.models import Booking
+    booking = Booking.query.get(booking_id)
+    if booking is None or booking.status == 'cancelled':
+        return False
+    
+    release_seats(booking)
+    booking.status = 'cancelled'
+    cancel_booking_reminders(booking)
+    record_booking_event('booking-cancelled', booking)
+    return True
+
 @web_admin_bp.route('/debug/file-system')
 @admin_required
 def debug_file_system():
@@ -760,16 +878,9 @@ def upload_home_image():
         
         # Update database
         try:
-            setting = SiteSetting.query.filter_by(key='home_image', language=language).first()
-            if not setting:
-                setting = SiteSetting(key='home_image', language=language)
-                db.session.add(setting)
-            
             # Store relative path
             relative_path = f"uploads/home/{unique_filename}"
-            setting.value = relative_path
-            
-            db.session.commit()
+            run_write(save_settings, {'home_image': relative_path}, language)
             current_app.logger.info(f"Database updated with home image: {relative_path} for {language}")
             
             return jsonify({
@@ -781,7 +892,6 @@ def upload_home_image():
             
         except Exception as e:
             current_app.logger.error(f"Database update failed: {e}")
-            db.session.rollback()
             # Clean up uploaded file on database error
             try:
                 os.remove(file_path)
@@ -16,6 +16,8 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from flask import Flask
 from db import db
+from config import get_config, database_uri
+from utils.sqlite_engine import init_sqlite_engine
 from db.models import GeneratedContent
 from openai import OpenAI
 
@@ -245,12 +247,14 @@ class ContentGenerator:
 def setup_app():
     """Setup Flask app context for database access."""
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(
-        os.path.dirname(__file__), '..', 'instance', 'data.sqlite'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(
+        os.path.join(os.path.dirname(__file__), '..', 'instance')
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PRAGMAS'] = get_config().SQLITE_PRAGMAS  # Same tuning as the web app
     
     db.init_app(app)
+    init_sqlite_engine(app)
     return app
 
 def main():
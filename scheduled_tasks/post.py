@@ -11,7 +11,9 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from flask import Flask
 from db import db
-from db.models import GeneratedContent
+from config import get_config, database_uri
+from utils.sqlite_engine import init_sqlite_engine
+from db.models import GeneratedContent, GeneratedContentArchive
 
 class XPoster:
     def __init__(self, creds_file='creds.json'):
@@ -486,12 +488,14 @@ class XPoster:
 def setup_app():
     """Setup Flask app context for database access."""
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(
-        os.path.dirname(__file__), '..', 'instance', 'data.sqlite'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(
+        os.path.join(os.path.dirname(__file__), '..', 'instance')
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PRAGMAS'] = get_config().SQLITE_PRAGMAS  # Same tuning as the web app
 
     db.init_app(app)
+    init_sqlite_engine(app)
     return app
 
 def get_latest_unposted_content():
@@ -518,6 +522,15 @@ def get_last_posted_content():
             GeneratedContent.posted_at.desc()
         ).first()
 
+        if content is None:
+            # Nothing posted recently enough to still be in the hot table
+            content = db.session.query(GeneratedContentArchive).filter(
+                GeneratedContentArchive.posted == True,
+                GeneratedContentArchive.twitter_id.isnot(None)
+            ).order_by(
+                GeneratedContentArchive.posted_at.desc()
+            ).first()
+
         return content
     except Exception as e:
         print(f"Error querying last posted content: {e}")
@@ -543,7 +556,7 @@ def mark_as_posted(content_id, twitter_id=None):
 def mark_as_reposted(content_id):
     """Mark content as reposted in the database."""
     try:
-        content = db.session.get(GeneratedContent, content_id)
+        content = db.session.get(GeneratedContent, content_id) or db.session.get(GeneratedContentArchive, content_id)
         if content:
             content.is_reposted = True
             content.reposted_at = datetime.utcnow()
@@ -558,7 +571,7 @@ def mark_as_reposted(content_id):
 def mark_as_unreposted(content_id):
     """Mark content as unreposted in the database."""
     try:
-        content = db.session.get(GeneratedContent, content_id)
+        content = db.session.get(GeneratedContent, content_id) or db.session.get(GeneratedContentArchive, content_id)
         if content:
             content.is_reposted = False
             content.reposted_at = None
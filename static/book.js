@@ -8,6 +8,7 @@ class BookingApp {
         this.selectedTime = null;
         this.services = [];
         this.availableSlots = [];
+        this.monthAvailability = {};  // "YYYY-MM" -> /booking/availability response
         
         this.init();
     }
@@ -16,6 +17,60 @@ class BookingApp {
         this.loadServices();
         this.setupEventListeners();
         this.initCalendar();
+        this.connectBookingStream();
+    }
+
+    // Live booking updates: instead of re-fetching everything, drop the
+    // cached month a change falls in and reload it only if it is on screen
+    connectBookingStream() {
+        if (!window.EventSource) {
+            return;
+        }
+        
+        const source = new EventSource('/booking/events/stream');
+        const onChange = (event) => {
+            const data = JSON.parse(event.data);
+            const value = data.start || data.slot_start;
+            const start = new Date(/Z$|[+-]\d\d:\d\d$/.test(value) ? value : `${value}Z`);  // Server times are UTC
+            this.refreshMonthAvailability(start.getFullYear(), start.getMonth());
+        };
+        
+        ['booking-created', 'booking-cancelled', 'capacity-changed', 'occurrence-cancelled'].forEach(type => {
+            source.addEventListener(type, onChange);
+        });
+        
+        // A series touches many months, and after a reset the server could not
+        // replay everything we missed: reload what is cached
+        const reloadAll = () => {
+            this.monthAvailability = {};
+            const calendarMonth = document.querySelector('.calendar-grid');
+            if (calendarMonth) {
+                const [year, month] = calendarMonth.dataset.month.split('-').map(Number);
+                this.refreshMonthAvailability(year, month - 1);
+            }
+        };
+        ['series-created', 'series-ended', 'reset'].forEach(type => {
+            source.addEventListener(type, reloadAll);
+        });
+    }
+
+    refreshMonthAvailability(year, month) {
+        const monthKey = this.monthKey(year, month);
+        delete this.monthAvailability[monthKey];
+        
+        const calendarMonth = document.querySelector('.calendar-grid');
+        if (!calendarMonth || calendarMonth.dataset.month !== monthKey) {
+            return;  // Loaded again when the month is shown
+        }
+        
+        // Coalesce the deltas of one booking into a single reload
+        clearTimeout(this.refreshTimer);
+        this.refreshTimer = setTimeout(async () => {
+            await this.loadMonthAvailability(year, month);
+            if (this.selectedDate && this.monthKey(this.selectedDate.getFullYear(), this.selectedDate.getMonth()) === monthKey) {
+                this.loadAvailableSlots(this.selectedDate);
+            }
+        }, 250);
     }
 
     // Load services from the backend
@@ -173,6 +228,9 @@ class BookingApp {
         
         this.selectedService = service;
         document.getElementById('next-to-datetime').disabled = false;
+        
+        // Refresh fully booked markers for the newly selected service
+        Object.keys(this.monthAvailability).forEach(monthKey => this.markFullyBookedDays(monthKey));
     }
 
     initCalendar() {
@@ -219,6 +277,7 @@ class BookingApp {
         `;
         
         const calendarGrid = calendar.querySelector('.calendar-grid');
+        calendarGrid.dataset.month = this.monthKey(year, month);
         
         // Add empty cells for days before the first day of the month
         for (let i = 0; i < firstDayOfWeek; i++) {
@@ -233,6 +292,7 @@ class BookingApp {
             const dayElement = document.createElement('div');
             dayElement.className = 'calendar-day';
             dayElement.textContent = day;
+            dayElement.dataset.day = day;
             
             const currentDay = new Date(year, month, day);
             
@@ -261,6 +321,84 @@ class BookingApp {
             const nextMonth = new Date(year, month + 1, 1);
             this.renderCalendar(nextMonth);
         });
+        
+        // Fetch the whole month's availability in one request
+        this.loadMonthAvailability(year, month);
+    }
+
+    monthKey(year, month) {
+        return `${year}-${String(month + 1).padStart(2, '0')}`;
+    }
+
+    // Load availability for every service and every day of a month
+    async loadMonthAvailability(year, month) {
+        const monthKey = this.monthKey(year, month);
+        
+        try {
+            if (!this.monthAvailability[monthKey]) {
+                const urlParams = new URLSearchParams(window.location.search);
+                const language = urlParams.get('lang') || 'ENG';
+                
+                const response = await fetch(`/booking/availability?month=${monthKey}&lang=${language}`);
+                if (!response.ok) {
+                    return;  // Per-day slot requests still work without it
+                }
+                this.monthAvailability[monthKey] = await response.json();
+            }
+            
+            this.markFullyBookedDays(monthKey);
+        } catch (error) {
+            console.error('Error loading month availability:', error);
+        }
+    }
+
+    // Flag days with no free slot for the selected service
+    markFullyBookedDays(monthKey) {
+        const availability = this.monthAvailability[monthKey];
+        const calendarMonth = document.querySelector('.calendar-grid');
+        if (!availability || !calendarMonth || calendarMonth.dataset.month !== monthKey) {
+            return;
+        }
+        
+        const service = this.selectedService ? availability.services[this.selectedService.id] : null;
+        calendarMonth.querySelectorAll('.calendar-day[data-day]').forEach(dayElement => {
+            const mask = service ? service.masks[dayElement.dataset.day - 1] : null;
+            dayElement.classList.toggle('fully-booked-day', mask === 0);
+        });
+    }
+
+    // Build a day's time slots from the cached month availability (null if not loaded)
+    slotsFromMonthAvailability(date) {
+        const availability = this.monthAvailability[this.monthKey(date.getFullYear(), date.getMonth())];
+        if (!availability || !this.selectedService) {
+            return null;
+        }
+        
+        const service = availability.services[this.selectedService.id];
+        if (!service) {
+            return null;
+        }
+        
+        const dayIndex = date.getDate() - 1;
+        const mask = service.masks[dayIndex];
+        const booked = (service.booked && service.booked[dayIndex]) || [];
+        
+        return availability.slots.map((slot, index) => {
+            const [hours, minutes] = slot.split(':').map(Number);
+            const time = new Date(date);
+            time.setHours(hours, minutes, 0, 0);
+            
+            // Bit `index` of the day's mask is set when the slot is free
+            const isFullyBooked = Math.floor(mask / 2 ** index) % 2 === 0;
+            
+            return {
+                time: time.toISOString(),
+                timeString: this.formatTime(time),
+                isFullyBooked: isFullyBooked,
+                bookingCount: booked[index] || 0,
+                available: true
+            };
+        });
     }
 
     selectDate(date) {
@@ -290,6 +428,14 @@ class BookingApp {
 
     async loadAvailableSlots(date) {
         try {
+            // Use the month's availability when it has already been loaded
+            const cachedSlots = this.slotsFromMonthAvailability(date);
+            if (cachedSlots) {
+                this.availableSlots = cachedSlots;
+                this.renderTimeSlots();
+                return;
+            }
+            
             // Fetch available slots from the backend API
             const formattedDate = date.toISOString().split('T')[0]; // YYYY-MM-DD format
             const serviceId = this.selectedService ? this.selectedService.id : '';
@@ -364,6 +510,11 @@ class BookingApp {
                 isFullyBooked: slot.isFullyBooked,
                 bookingCount: slot.bookingCount
             }, slotElement));
+            
+            // Keep the chosen slot highlighted when live updates re-render the list
+            if (this.selectedTime && new Date(this.selectedTime.time).getTime() === slotTime.getTime()) {
+                slotElement.classList.add('selected');
+            }
 
             timeSlotsContainer.appendChild(slotElement);
         });
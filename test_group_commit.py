@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Quick test of the group-commit writer on a SQLite file
+Runs one group of three write units and checks that no unit's row is
+visible to another connection before the group commits, that the unit
+which raises rolls back only itself, that the running writer thread
+commits units submitted through run_write(), and that request sessions
+which still commit directly can read, then write, while it runs
+
+Usage: python test_group_commit.py
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import Future
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import text
+
+from db import db
+from db.models import Testimonial
+from utils.sqlite_engine import init_sqlite_engine
+from utils.write_queue import GroupCommitWriter, run_write, init_write_queue, stop_write_queue
+
+
+def make_app(db_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_path}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 2000},
+        SQLITE_GROUP_COMMIT=True
+    )
+    db.init_app(app)
+    init_sqlite_engine(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def committed_names(db_path):
+    """Testimonials another connection can see"""
+    connection = sqlite3.connect(db_path)
+    try:
+        return sorted(name for (name,) in connection.execute("SELECT client_name FROM testimonials"))
+    finally:
+        connection.close()
+
+
+def test_group_commit():
+    print("🧪 Testing group commit...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "group_commit.sqlite")
+        app = make_app(db_path)
+        seen_during_group = []
+
+        def add(name, fail=False):
+            db.session.add(Testimonial(client_name=name, testimonial_text="Group commit test", rating=5))
+            db.session.flush()
+            seen_during_group.append(committed_names(db_path))
+            if fail:
+                raise ValueError(f"Rejected {name}")
+            return name
+
+        writer = GroupCommitWriter(app)
+        with app.app_context():
+            group = [(Future(), add, ("first",), {}),
+                     (Future(), add, ("second",), {"fail": True}),
+                     (Future(), add, ("third",), {})]
+            writer._commit_group(group)
+            db.session.remove()
+
+        assert seen_during_group == [[], [], []], f"rows visible before the group committed: {seen_during_group}"
+        print("✅ No row was visible before the group committed")
+
+        first, second, third = (future for future, *_ in group)
+        assert first.result() == "first" and third.result() == "third"
+        assert isinstance(second.exception(), ValueError)
+        assert committed_names(db_path) == ["first", "third"], committed_names(db_path)
+        assert writer.stats()["commits"] == 1
+        writer.engine.dispose()
+        print("✅ The failing unit rolled back only itself")
+
+        init_write_queue(app)
+        try:
+            with app.app_context():
+                assert run_write(add, "queued") == "queued"
+
+                # Two direct-commit writers that read first: only the writer's
+                # engine opens transactions on reads, so neither is left
+                # holding a stale snapshot
+                with db.engine.connect() as first, db.engine.connect() as second:
+                    for connection in (first, second):
+                        connection.execute(text("SELECT COUNT(*) FROM testimonials")).scalar()
+                    for connection in (first, second):
+                        connection.execute(text("UPDATE testimonials SET rating = rating + 1"))
+                        connection.commit()
+        finally:
+            stop_write_queue()
+        assert committed_names(db_path) == ["first", "queued", "third"]
+        print("✅ Writer thread committed a queued unit; direct commits read, then wrote")
+
+    print("🎉 Group commit test passed!")
+
+
+if __name__ == "__main__":
+    test_group_commit()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Quick test of the pooled SMTP transport against a local aiosmtpd server
+Compares plain Flask-Mail (one connection per email) with PooledMail and
+checks that a dropped session is reconnected transparently
+
+Usage: python test_mail_pool.py [number_of_emails]
+"""
+import sys
+import os
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiosmtpd.controller import Controller
+from flask import Flask
+from flask_mail import Mail, Message
+
+from utils.mail_pool import PooledMail
+
+
+class CountingHandler:
+    """aiosmtpd handler that counts sessions and accepted messages"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay  # Simulated handshake cost per new session
+        self.sessions = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self.lock:
+            self.sessions += 1
+        if self.delay:
+            time.sleep(self.delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.messages += 1
+        return '250 Message accepted'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_app(mail_class, port):
+    app = Flask(__name__)
+    app.config.update(
+        MAIL_SERVER='127.0.0.1',
+        MAIL_PORT=port,
+        MAIL_USE_TLS=False,
+        MAIL_DEFAULT_SENDER='noreply@holisticweb.com',
+        MAIL_POOL_SIZE=3
+    )
+    app.mail = mail_class(app)
+    return app
+
+
+def send_many(app, count, threads):
+    def send_one(number):
+        with app.app_context():
+            app.mail.send(Message(
+                subject=f"Test {number}",
+                recipients=[f"customer{number}@example.com"],
+                body="Pooled SMTP transport test"
+            ))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(send_one, range(count)))
+    return time.perf_counter() - started
+
+
+def test_mail_pool(count=200, handshake_delay=0.005):
+    print("🧪 Testing pooled SMTP transport...")
+
+    handler = CountingHandler(delay=handshake_delay)
+    port = free_port()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+
+    try:
+        for label, mail_class in (("Flask-Mail", Mail), ("PooledMail", PooledMail)):
+            handler.sessions = handler.messages = 0
+            app = make_app(mail_class, port)
+            elapsed = send_many(app, count, threads=3)
+            print(f"   {label:<11} {count} emails in {elapsed:.2f}s "
+                  f"({count / elapsed:.0f} emails/s, {handler.sessions} SMTP sessions)")
+            assert handler.messages == count, f"{label}: server accepted {handler.messages}/{count} emails"
+
+        # Restart the server so every pooled session is dropped, then send again
+        pool = app.mail.pool
+        controller.stop()
+        controller = Controller(handler, hostname='127.0.0.1', port=port)
+        controller.start()
+        handler.messages = 0
+        send_many(app, 3, threads=1)
+        stats = pool.stats()
+        assert handler.messages == 3, f"{handler.messages}/3 sent after the server restart"
+        assert stats["reconnected"] >= 1, f"no reconnect recorded: {stats}"
+        print(f"✅ Dropped session reconnected transparently ({stats['reconnected']} reconnects)")
+
+        print(f"📊 Pool stats: {stats}")
+        pool.close()
+    finally:
+        controller.stop()
+
+    print("🎉 Mail pool test passed!")
+
+
+if __name__ == "__main__":
+    number_of_emails = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    test_mail_pool(number_of_emails)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Quick test of SMS reminder dispatch with a stub Twilio client
+Runs two reminder checks at the same time and verifies every booking is
+texted exactly once, sends respect the rate limit, and failed sends are
+rescheduled; then checks the reminder scheduler fires a reminder on time
+and skips cancelled bookings
+
+Usage: python test_sms_reminders.py
+"""
+import sys
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from db import db
+from db.models import Booking, BookingReminder
+import routes.send_sms as send_sms
+from utils.reminders import schedule_booking_reminders, cancel_booking_reminders, ReminderScheduler
+
+
+class StubTwilioClient:
+    """Stands in for twilio.rest.Client: records messages instead of sending them"""
+
+    def __init__(self, delay=0.02, failing_numbers=()):
+        self.messages = self  # client.messages.create(...)
+        self.delay = delay
+        self.failing_numbers = set(failing_numbers)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def create(self, body, from_, to):
+        time.sleep(self.delay)  # Simulated API latency
+        if to in self.failing_numbers:
+            raise RuntimeError(f"Stub refused {to}")
+        with self.lock:
+            self.sent.append((to, time.monotonic()))
+            return SimpleNamespace(sid=f"SM{len(self.sent):032d}")
+
+
+def make_app(db_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_path}",
+        SMS_MAX_CONCURRENCY=4,
+        SMS_RATE_PER_SECOND=20,
+        REMINDER_OFFSETS_MINUTES=[1440, 30]
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_sms_reminders(count=12):
+    print("🧪 Testing SMS reminder dispatch...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "reminders.sqlite"))
+        start_time = datetime.utcnow() + timedelta(minutes=32)
+
+        with app.app_context():
+            for number in range(count):
+                booking = Booking(
+                    user_name=f"Client {number}",
+                    email=f"client{number}@example.com",
+                    phone_number=f"312555{number:04d}",
+                    start_time=start_time,
+                    end_time=start_time + timedelta(hours=1),
+                    status='confirmed'
+                )
+                db.session.add(booking)
+                db.session.flush()
+                schedule_booking_reminders(booking)
+            db.session.commit()
+
+            # Fast-forward: make the 30-minute reminders due now
+            BookingReminder.query.filter_by(offset_minutes=30).update(
+                {"fire_at": datetime.utcnow() - timedelta(seconds=1)}
+            )
+            db.session.commit()
+
+        failing = "+13125550000"
+        stub = StubTwilioClient(failing_numbers=[failing])
+        original_client = send_sms.client
+        send_sms.client = stub
+
+        try:
+            # Two overlapping runs, like the scheduler and a manual /send-reminders hit
+            runs = [threading.Thread(target=send_sms.check_and_send_reminders, args=(app, Booking)) for _ in range(2)]
+            started = time.monotonic()
+            for run in runs:
+                run.start()
+            for run in runs:
+                run.join()
+            elapsed = time.monotonic() - started
+
+            numbers = [to for to, _ in stub.sent]
+            assert len(numbers) == count - 1, f"expected {count - 1} reminders, got {len(numbers)}"
+            assert len(set(numbers)) == len(numbers), f"duplicate reminders: {sorted(numbers)}"
+            print(f"✅ {len(numbers)} reminders sent, no duplicates ({elapsed:.2f}s)")
+
+            # 20/s with a burst of 1: n sends need at least (n - 1) / 20 seconds
+            times = sorted(sent_at for _, sent_at in stub.sent)
+            min_span = (len(times) - 1) / 20 * 0.9
+            assert times and times[-1] - times[0] >= min_span, "sends were not rate limited"
+            print(f"✅ Rate limit respected ({times[-1] - times[0]:.2f}s for {len(times)} sends)")
+
+            with app.app_context():
+                retrying = BookingReminder.query.filter_by(offset_minutes=30, status='scheduled').all()
+                assert len(retrying) == 1 and retrying[0].attempts == 1, f"unexpected reminders left to send: {retrying}"
+                print("✅ Failed reminder rescheduled for a retry")
+
+            # Scheduler: a reminder due in one second fires without polling,
+            # a cancelled booking's reminder does not
+            stub.sent.clear()
+            with app.app_context():
+                soon = datetime.utcnow() + timedelta(minutes=30, seconds=1)
+                bookings = [
+                    Booking(user_name=name, email=f"{name}@example.com", phone_number=phone,
+                            start_time=soon, end_time=soon + timedelta(hours=1), status='confirmed')
+                    for name, phone in (("kept", "3125559001"), ("cancelled", "3125559002"))
+                ]
+                db.session.add_all(bookings)
+                db.session.flush()
+                for booking in bookings:
+                    schedule_booking_reminders(booking)
+                cancel_booking_reminders(bookings[1])
+                db.session.commit()
+
+            scheduler = ReminderScheduler(app).start()
+            fire_at = time.monotonic() + 1
+            deadline = fire_at + 3
+            while not stub.sent and time.monotonic() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.2)
+            scheduler.stop()
+
+            numbers = [to for to, _ in stub.sent]
+            assert numbers == ["+13125559001"], f"scheduler sent {numbers}"
+            print(f"✅ Scheduler fired the reminder {stub.sent[0][1] - fire_at:+.2f}s from its fire time")
+        finally:
+            send_sms.client = original_client
+
+    print("🎉 SMS reminder test passed!")
+
+
+if __name__ == "__main__":
+    test_sms_reminders()
@@ -0,0 +1,225 @@
+"""
+Archive tier for past bookings and posted content
+Bookings that ended more than BOOKING_ARCHIVE_DAYS ago (completed,
+cancelled, or waitlist entries that never got a seat) and content posted
+more than CONTENT_ARCHIVE_DAYS ago are moved, with their ids, into
+booking_archive and generated_content_archive in batches, so the hot tables
+only hold what the booking and posting paths still work with. Both hot
+tables use AUTOINCREMENT on SQLite, so an archived id is never handed out
+again and a later batch cannot collide with it in the archive.
+
+Read paths union the archive back in only for an explicit historical
+range: a window that starts before the newest archived booking, an export
+without a start date, or a contact search with history requested.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import click
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+
+from db import db
+from db.models import Booking, BookingArchive, BookingReminder, GeneratedContent, GeneratedContentArchive, SlotCapacity
+from utils.booking_utils import MAX_BOOKING_LENGTH
+
+DEFAULT_BOOKING_DAYS = 90
+DEFAULT_CONTENT_DAYS = 30
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_INTERVAL_HOURS = 24
+
+# Archiver thread running in this process (None when disabled)
+_archiver = None
+
+
+def _config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def newest_archived_end():
+    """Latest time an archived booking can end (None while the archive is empty)"""
+    newest_start = db.session.query(sa.func.max(BookingArchive.start_time)).scalar()  # Index lookup
+    return newest_start + MAX_BOOKING_LENGTH if newest_start is not None else None
+
+
+def range_needs_archive(start):
+    """Whether a window starting at `start` (None = unbounded) can contain archived bookings"""
+    newest_end = newest_archived_end()
+    return newest_end is not None and (start is None or start < newest_end)
+
+
+def _copy_rows(source, archive, ids, now):
+    """INSERT INTO archive SELECT ... FROM source WHERE id IN ids"""
+    columns = [column.name for column in archive.__table__.columns if column.name in source.__table__.columns]
+    select = sa.select(*[source.__table__.c[name] for name in columns], sa.literal(now)).where(
+        source.__table__.c.id.in_(ids)
+    )
+    db.session.execute(sa.insert(archive.__table__).from_select(columns + ['archived_at'], select))
+
+
+def archive_bookings(days=None, batch_size=None, now=None):
+    """
+    Move bookings that ended more than `days` ago into booking_archive
+
+    One transaction per batch: copy the rows, delete their reminders and the
+    rows themselves. Capacity ledger rows for slots that old are dropped too;
+    no booking can claim or release seats there any more.
+
+    Returns:
+        int: number of bookings archived
+    """
+    days = days if days is not None else _config('BOOKING_ARCHIVE_DAYS', DEFAULT_BOOKING_DAYS)
+    batch_size = batch_size or _config('ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=days)
+
+    moved = 0
+    while True:
+        try:
+            # start_time bound first so the start_time index does the work
+            ids = [row.id for row in db.session.query(Booking.id).filter(
+                Booking.start_time < cutoff,
+                Booking.end_time < cutoff
+            ).order_by(Booking.id).limit(batch_size)]
+            if not ids:
+                break
+
+            _copy_rows(Booking, BookingArchive, ids, now)
+            db.session.execute(
+                sa.delete(BookingReminder).where(BookingReminder.booking_id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                sa.delete(Booking).where(Booking.id.in_(ids)).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += len(ids)
+
+    # Ledger rows of slots no live booking can still occupy
+    db.session.execute(
+        sa.delete(SlotCapacity).where(SlotCapacity.slot_start < cutoff - MAX_BOOKING_LENGTH)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    if moved:
+        from utils.booking_index import booking_index
+        booking_index.invalidate()
+    return moved
+
+
+def archive_content(days=None, batch_size=None, now=None):
+    """
+    Move content posted more than `days` ago into generated_content_archive
+
+    Returns:
+        int: number of items archived
+    """
+    days = days if days is not None else _config('CONTENT_ARCHIVE_DAYS', DEFAULT_CONTENT_DAYS)
+    batch_size = batch_size or _config('ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=days)
+
+    moved = 0
+    while True:
+        try:
+            ids = [row.id for row in db.session.query(GeneratedContent.id).filter(
+                GeneratedContent.posted == True,
+                GeneratedContent.posted_at < cutoff
+            ).order_by(GeneratedContent.id).limit(batch_size)]
+            if not ids:
+                break
+
+            _copy_rows(GeneratedContent, GeneratedContentArchive, ids, now)
+            db.session.execute(
+                sa.delete(GeneratedContent).where(GeneratedContent.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += len(ids)
+    return moved
+
+
+def run_archive(now=None):
+    """
+    Archive past bookings and posted content
+
+    Returns:
+        dict: {"bookings": n, "content": n}
+    """
+    stats = {"bookings": archive_bookings(now=now), "content": archive_content(now=now)}
+    print(f"🗄️ Archive run: {stats['bookings']} bookings, {stats['content']} posted content items moved")
+    return stats
+
+
+class Archiver:
+    """Daemon thread that runs the archive every `interval_hours`"""
+
+    def __init__(self, app, interval_hours=DEFAULT_INTERVAL_HOURS):
+        self.app = app
+        self.interval = interval_hours * 3600
+        self.last_run = None
+        self.last_stats = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval if self.last_run else 60):
+            with self.app.app_context():
+                try:
+                    self.last_stats = run_archive()
+                except Exception as e:
+                    print(f"❌ Archive run failed: {e}")
+                finally:
+                    self.last_run = datetime.utcnow()
+                    db.session.remove()
+
+
+def init_archiver(app):
+    """Start the archive thread unless ARCHIVE_INTERVAL_HOURS is 0"""
+    global _archiver
+
+    interval_hours = float(app.config.get('ARCHIVE_INTERVAL_HOURS', DEFAULT_INTERVAL_HOURS))
+    if interval_hours <= 0:
+        return None
+
+    if _archiver is None:
+        _archiver = Archiver(app, interval_hours).start()
+        print(f"🗄️ Archiver started (every {interval_hours:g}h: bookings after "
+              f"{app.config.get('BOOKING_ARCHIVE_DAYS', DEFAULT_BOOKING_DAYS)} days, posted content after "
+              f"{app.config.get('CONTENT_ARCHIVE_DAYS', DEFAULT_CONTENT_DAYS)} days)")
+    return _archiver
+
+
+archive_cli = AppGroup('archive', help='Move past bookings and posted content to the archive tables.')
+
+
+@archive_cli.command('run')
+@click.option('--booking-days', type=int, help='Archive bookings that ended more than this many days ago')
+@click.option('--content-days', type=int, help='Archive content posted more than this many days ago')
+@click.option('--batch-size', type=int, help='Rows per transaction')
+def archive_run(booking_days, content_days, batch_size):
+    """Archive now instead of waiting for the archiver thread."""
+    bookings = archive_bookings(days=booking_days, batch_size=batch_size)
+    content = archive_content(days=content_days, batch_size=batch_size)
+    click.echo(f"✅ Archived {bookings} bookings and {content} posted content items")
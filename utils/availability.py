@@ -0,0 +1,177 @@
+"""
+Month-view availability
+Computes free slots for every service and every day of a window in one
+vectorized pass over a (service x day x slot) grid, and encodes each day's
+free slots as a bitmask (bit k set = slot k is free)
+"""
+
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+import numpy as np
+
+from db import db
+from db.models import Booking, SlotCapacity
+from utils.capacity import get_service_capacity
+from utils.booking_utils import MAX_BOOKING_LENGTH
+from utils.recurring import expand_series, series_usage
+
+MAX_WEEKS = 26
+
+
+def get_availability_window(args):
+    """
+    Get the (first_day, num_days) window requested by the client
+
+    Accepts either ?month=YYYY-MM or ?start=YYYY-MM-DD&weeks=N.
+    Defaults to the current month.
+
+    Raises:
+        ValueError: if a parameter is malformed
+    """
+    month = args.get('month')
+    start = args.get('start')
+
+    if start:
+        first_day = date.fromisoformat(start[:10])
+        weeks = min(max(int(args.get('weeks', 4)), 1), MAX_WEEKS)
+        return first_day, weeks * 7
+
+    if month:
+        year, month_number = (int(part) for part in month.split('-')[:2])
+        first_day = date(year, month_number, 1)
+    else:
+        today = date.today()
+        first_day = date(today.year, today.month, 1)
+
+    next_month = date(first_day.year + first_day.month // 12, first_day.month % 12 + 1, 1)
+    return first_day, (next_month - first_day).days
+
+
+def _minutes_since(window_start, values):
+    """Convert datetimes to integer minutes since window_start"""
+    return np.array(
+        [int((value.replace(tzinfo=None) - window_start).total_seconds() // 60) for value in values],
+        dtype=np.int64
+    )
+
+
+def _slot_starts(num_days, slot_minutes):
+    """Grid of slot start minutes since the window start, shape (days, slots)"""
+    day_offsets = np.arange(num_days, dtype=np.int64)[:, None] * 1440
+    return day_offsets + np.asarray(slot_minutes, dtype=np.int64)[None, :]
+
+
+def encode_day_masks(free):
+    """Pack a boolean (..., slots) array into one integer per day"""
+    weights = np.left_shift(np.int64(1), np.arange(free.shape[-1], dtype=np.int64))
+    return (free.astype(np.int64) * weights).sum(axis=-1)
+
+
+def capacity_availability(services, first_day, num_days, slot_minutes):
+    """
+    Availability from the capacity ledger: a slot is free while
+    booked people < the service's capacity (recurring series included)
+
+    Returns:
+        dict: service_id -> {"capacity", "masks", "booked"}, where "booked"
+              holds people per slot only for days that have bookings
+    """
+    if not services:
+        return {}
+
+    window_start = datetime.combine(first_day, datetime.min.time())
+    window_end = window_start + timedelta(days=num_days)
+    service_ids = [service.id for service in services]
+    service_index = {service_id: i for i, service_id in enumerate(service_ids)}
+
+    rows = db.session.query(
+        SlotCapacity.service_id, SlotCapacity.slot_start, SlotCapacity.booked_people
+    ).filter(
+        SlotCapacity.service_id.in_(service_ids),
+        SlotCapacity.slot_start >= window_start,
+        SlotCapacity.slot_start < window_end,
+        SlotCapacity.booked_people > 0
+    ).all()
+    rows += [
+        SimpleNamespace(service_id=service_key, slot_start=slot_start, booked_people=people)
+        for (service_key, slot_start), (people, _) in series_usage(window_start, window_end, service_ids).items()
+    ]
+
+    slot_minutes = np.asarray(slot_minutes, dtype=np.int64)
+    booked = np.zeros((len(service_ids), num_days, len(slot_minutes)), dtype=np.int64)
+
+    if rows:
+        minutes = _minutes_since(window_start, [row.slot_start for row in rows])
+        day_idx, minute_of_day = np.divmod(minutes, 1440)
+        slot_idx = np.searchsorted(slot_minutes, minute_of_day)
+        on_grid = (slot_idx < len(slot_minutes)) & \
+            (slot_minutes[np.minimum(slot_idx, len(slot_minutes) - 1)] == minute_of_day)
+        svc_idx = np.array([service_index[row.service_id] for row in rows], dtype=np.int64)
+        np.add.at(booked, (svc_idx[on_grid], day_idx[on_grid], slot_idx[on_grid]),
+                  np.array([row.booked_people for row in rows], dtype=np.int64)[on_grid])
+
+    capacities = np.array([get_service_capacity(service) for service in services], dtype=np.int64)
+    free = booked < capacities[:, None, None]
+    masks = encode_day_masks(free)
+
+    result = {}
+    for i, service in enumerate(services):
+        busy_days = np.flatnonzero(booked[i].any(axis=1))
+        result[service.id] = {
+            "capacity": int(capacities[i]),
+            "masks": masks[i].tolist(),
+            "booked": {int(day): booked[i, day].tolist() for day in busy_days}
+        }
+    return result
+
+
+def conflict_availability(services, first_day, num_days, slot_minutes):
+    """
+    Availability from confirmed bookings: a slot [start, start + duration)
+    is free when it overlaps no confirmed booking or series occurrence
+    (of any service)
+
+    Returns:
+        dict: service_id -> {"masks"}
+    """
+    window_start = datetime.combine(first_day, datetime.min.time())
+    window_end = window_start + timedelta(days=num_days + 1)  # slots may run past midnight
+
+    rows = db.session.query(Booking.start_time, Booking.end_time).filter(
+        Booking.start_time >= window_start - MAX_BOOKING_LENGTH,
+        Booking.start_time < window_end,
+        Booking.end_time > window_start,
+        Booking.status == 'confirmed'
+    ).order_by(Booking.start_time).all()
+    rows += [
+        occurrence for occurrence in expand_series(window_start - MAX_BOOKING_LENGTH, window_end)
+        if occurrence.status == 'confirmed' and occurrence.end_time > window_start
+    ]
+
+    starts = _slot_starts(num_days, slot_minutes)
+    result = {}
+
+    if rows:
+        booking_starts = _minutes_since(window_start, [row.start_time for row in rows])
+        booking_ends = _minutes_since(window_start, [row.end_time for row in rows])
+        order = np.argsort(booking_starts, kind='stable')
+        booking_starts = booking_starts[order]
+        max_ends = np.maximum.accumulate(booking_ends[order])
+
+    for service in services:
+        ends = starts + int(service.duration or 0)
+        if rows:
+            # Bookings starting before the slot ends are [:count]; the slot
+            # conflicts iff the furthest end among them is past its start
+            count = np.searchsorted(booking_starts, ends, side='left')
+            furthest_end = np.where(count > 0, max_ends[np.maximum(count - 1, 0)], np.iinfo(np.int64).min)
+            free = ~(furthest_end > starts)
+        else:
+            free = np.ones(starts.shape, dtype=bool)
+        result[service.id] = {"masks": encode_day_masks(free).tolist()}
+    return result
+
+
+def format_slot_minutes(slot_minutes):
+    """Render slot offsets as 'HH:MM' strings"""
+    return [f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in slot_minutes]
@@ -0,0 +1,311 @@
+"""
+Online SQLite backups
+Backups are taken with SQLite's online backup API, BACKUP_PAGES_PER_STEP
+pages at a time with a BACKUP_STEP_SLEEP_MS pause between steps. Each step
+only holds a read lock briefly (and in WAL mode readers never block
+writers), so the app keeps writing while the copy runs. Copying the file
+instead can capture a half-written page or miss the -wal file.
+
+Each backup is written to a .partial file and renamed when complete, the
+oldest beyond BACKUP_KEEP are deleted, and its duration and size are
+appended to backup_log.jsonl in the backup directory.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+
+from db import db
+
+DEFAULT_PAGES_PER_STEP = 1024
+DEFAULT_STEP_SLEEP_MS = 50
+DEFAULT_KEEP = 7
+DEFAULT_INTERVAL_HOURS = 24
+
+# A backup restarts whenever another connection writes to the source; after
+# this many restarts the rest is copied in one step (safe in WAL mode, where
+# the read transaction does not block writers)
+MAX_RESTARTS = 3
+
+LOG_FILE = 'backup_log.jsonl'
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+
+# Backup thread running in this process (None when disabled)
+_backup_scheduler = None
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def database_path(engine=None):
+    """File path of the app's SQLite database (None for other databases or in-memory SQLite)"""
+    engine = engine or db.engine
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return None
+    return os.path.abspath(engine.url.database)
+
+
+def backup_dir(app=None):
+    app = app or current_app
+    return app.config.get('BACKUP_DIR') or os.path.join(app.instance_path, 'backups')
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA busy_timeout=30000")
+    return connection
+
+
+def copy_database(source_path, target_path, pages=DEFAULT_PAGES_PER_STEP, sleep_ms=DEFAULT_STEP_SLEEP_MS):
+    """
+    Copy a live SQLite database with the online backup API
+
+    Returns:
+        dict: pages copied and the number of restarts caused by concurrent writes
+    """
+    source = _connect(source_path)
+    target = sqlite3.connect(target_path)
+    progress_state = {"restarts": 0, "remaining": None, "pages": 0}
+
+    def progress(status, remaining, total):
+        if progress_state["remaining"] is not None and remaining > progress_state["remaining"]:
+            progress_state["restarts"] += 1
+            if progress_state["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        progress_state["remaining"] = remaining
+        progress_state["pages"] = total
+        if remaining:
+            time.sleep(sleep_ms / 1000.0)
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            source.backup(target)  # Remaining pages in one step
+        return progress_state
+    finally:
+        target.close()
+        source.close()
+
+
+def _log_backup(directory, entry):
+    with open(os.path.join(directory, LOG_FILE), 'a') as log:
+        log.write(json.dumps(entry) + '\n')
+
+
+def read_backup_log(directory=None, limit=None):
+    """Backup log entries, oldest first"""
+    path = os.path.join(directory or backup_dir(), LOG_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as log:
+        entries = [json.loads(line) for line in log if line.strip()]
+    return entries[-limit:] if limit else entries
+
+
+def list_backups(directory=None, source_path=None):
+    """Completed backup files of the app database, newest first"""
+    directory = directory or backup_dir()
+    prefix = os.path.basename(source_path or database_path() or 'data.sqlite') + '.backup_'
+    if not os.path.isdir(directory):
+        return []
+    names = [name for name in os.listdir(directory) if name.startswith(prefix) and not name.endswith('.partial')]
+    return [os.path.join(directory, name) for name in sorted(names, reverse=True)]
+
+
+def prune_backups(keep=None, directory=None, source_path=None):
+    """Delete all but the newest `keep` backups; returns the deleted paths"""
+    keep = keep if keep is not None else _config('BACKUP_KEEP', DEFAULT_KEEP)
+    removed = list_backups(directory, source_path)[keep:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def backup_database(engine=None, directory=None, pages=None, sleep_ms=None, keep=None):
+    """
+    Take an online backup of the app's SQLite database
+
+    Returns:
+        dict: the log entry (path, bytes, duration_seconds, ...), or None
+        when the database is not a SQLite file
+    """
+    source_path = database_path(engine)
+    if source_path is None:
+        return None
+
+    directory = directory or backup_dir()
+    pages = pages or _config('BACKUP_PAGES_PER_STEP', DEFAULT_PAGES_PER_STEP)
+    sleep_ms = sleep_ms if sleep_ms is not None else _config('BACKUP_STEP_SLEEP_MS', DEFAULT_STEP_SLEEP_MS)
+    os.makedirs(directory, exist_ok=True)
+
+    started = datetime.utcnow()
+    target_path = os.path.join(directory, f"{os.path.basename(source_path)}.backup_{started.strftime(TIMESTAMP_FORMAT)}")
+    partial_path = target_path + '.partial'
+
+    began = time.monotonic()
+    try:
+        state = copy_database(source_path, partial_path, pages=pages, sleep_ms=sleep_ms)
+        os.replace(partial_path, target_path)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    entry = {
+        "path": target_path,
+        "started_at": started.isoformat(),
+        "duration_seconds": round(time.monotonic() - began, 3),
+        "bytes": os.path.getsize(target_path),
+        "pages": state["pages"],
+        "restarts": state["restarts"],
+    }
+    _log_backup(directory, entry)
+    entry["pruned"] = prune_backups(keep, directory, source_path)
+    print(f"💾 Backup {os.path.basename(target_path)}: {entry['bytes'] / 1024 / 1024:.1f} MB "
+          f"in {entry['duration_seconds']:.2f}s")
+    return entry
+
+
+def restore_database(backup_path, engine=None):
+    """
+    Replace the app database's contents with a backup
+
+    The backup is copied into the live database through the backup API, so
+    open connections see the restored data instead of a swapped-out file.
+    Stop the app (or at least its writers) first.
+    """
+    target_path = database_path(engine)
+    if target_path is None:
+        raise ValueError("Restore is only supported for SQLite file databases")
+    if not os.path.exists(backup_path):
+        raise FileNotFoundError(backup_path)
+
+    (engine or db.engine).dispose()
+    source = sqlite3.connect(backup_path)
+    target = _connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+class BackupScheduler:
+    """Daemon thread that takes a backup every `interval_hours`"""
+
+    def __init__(self, app, interval_hours=DEFAULT_INTERVAL_HOURS):
+        self.app = app
+        self.interval = interval_hours * 3600
+        self.last_backup = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_delay(self):
+        with self.app.app_context():
+            entries = read_backup_log(limit=1)
+        if not entries:
+            return 60
+        last = datetime.fromisoformat(entries[-1]["started_at"])
+        return max(60, self.interval - (datetime.utcnow() - last).total_seconds())
+
+    def _run(self):
+        while not self._stop.wait(self._next_delay()):
+            with self.app.app_context():
+                try:
+                    self.last_backup = backup_database()
+                except Exception as e:
+                    print(f"❌ Backup failed: {e}")
+
+
+def init_backups(app):
+    """Start the backup thread for SQLite databases unless BACKUP_INTERVAL_HOURS is 0"""
+    global _backup_scheduler
+
+    interval_hours = float(app.config.get('BACKUP_INTERVAL_HOURS', DEFAULT_INTERVAL_HOURS))
+    if interval_hours <= 0:
+        return None
+    with app.app_context():
+        if database_path() is None:
+            return None
+
+    if _backup_scheduler is None:
+        _backup_scheduler = BackupScheduler(app, interval_hours).start()
+        print(f"💾 Backups every {interval_hours:g}h to {backup_dir(app)} "
+              f"(keeping {app.config.get('BACKUP_KEEP', DEFAULT_KEEP)})")
+    return _backup_scheduler
+
+
+backup_cli = AppGroup('backup', help='Online SQLite backups.')
+
+
+@backup_cli.command('create')
+@click.option('--pages', type=int, help='Pages copied per step')
+@click.option('--sleep-ms', type=int, help='Pause between steps')
+def backup_create(pages, sleep_ms):
+    """Take a backup now."""
+    entry = backup_database(pages=pages, sleep_ms=sleep_ms)
+    if entry is None:
+        click.echo("❌ Not a SQLite file database; use the database's own tools (e.g. pg_dump)")
+        return
+    click.echo(f"✅ {entry['path']}")
+    for path in entry["pruned"]:
+        click.echo(f"🗑️ Removed old backup {os.path.basename(path)}")
+
+
+@backup_cli.command('list')
+def backup_list():
+    """Show backups on disk and the cost of recent runs."""
+    for path in list_backups():
+        click.echo(f"{os.path.basename(path)}  {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+    for entry in read_backup_log(limit=10):
+        click.echo(f"{entry['started_at']}: {entry['bytes']} bytes in {entry['duration_seconds']}s "
+                   f"({entry['restarts']} restarts)")
+
+
+@backup_cli.command('prune')
+@click.option('--keep', type=int, help='Backups to keep (default BACKUP_KEEP)')
+def backup_prune(keep):
+    """Delete old backups beyond the retention count."""
+    for path in prune_backups(keep):
+        click.echo(f"🗑️ Removed {os.path.basename(path)}")
+
+
+@backup_cli.command('restore')
+@click.argument('backup_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation')
+def backup_restore(backup_path, yes):
+    """Restore the database from BACKUP_PATH (stop the app first)."""
+    if not yes:
+        click.confirm(f"Replace {database_path()} with {backup_path}?", abort=True)
+    # Keep what is being replaced, in case the wrong file was picked (no
+    # pruning here: it could delete the backup about to be restored)
+    safety = backup_database(keep=len(list_backups()) + 1)
+    if safety:
+        click.echo(f"💾 Current database saved as {safety['path']}")
+    restore_database(backup_path)
+    click.echo(f"✅ Restored {backup_path}")
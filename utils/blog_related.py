@@ -0,0 +1,299 @@
+"""
+Precomputed related posts
+Each published post's BLOG_RELATED_TOP_K most similar posts are stored in
+blog_related_posts, so the post page reads its related posts with one
+primary-key lookup instead of comparing tags with every other post.
+
+Similarity is the cosine of TF-IDF vectors with two parts: the post's words
+(title, tags, excerpt and body, boosted like search fields) and its tags,
+each normalized on its own and weighted TAG_SHARE for tags, 1 - TAG_SHARE
+for words. Vectors are sparse; the similarity matrix is computed in row
+blocks with NumPy (gathering, for a block of posts, every other post that
+shares one of their terms), so memory stays bounded for large archives.
+
+The table is rebuilt after any commit that changes a blog post: by the
+background worker when the app started one, otherwise at commit time.
+"""
+
+import math
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+
+from db import db
+from db.models import BlogPost, BlogPostTag, BlogRelatedPost
+from utils.blog_search import FIELD_WEIGHTS, strip_html, tokenize
+
+DEFAULT_TOP_K = 6
+DEFAULT_REBUILD_DELAY_SECONDS = 5
+
+TAG_SHARE = 0.4
+# Only a post's heaviest terms take part; its vector norm still counts
+# all of them, so scores are not inflated by the pruning
+MAX_TERMS_PER_POST = 64
+# Terms in more than this share of posts say little about relatedness
+MAX_DOCUMENT_FREQUENCY = 0.5
+MIN_SCORE = 0.01
+
+# Similarity cells computed at once (rows in a block x posts)
+BLOCK_CELLS = 2_000_000
+
+# Background rebuild worker in this process (None when not started)
+_worker = None
+
+
+def _config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def _load_posts(connection):
+    """(ids, {post_id: Counter of weighted words}, {post_id: tags}) of published posts"""
+    words = {}
+    for post_id, title, excerpt, content in connection.execute(
+        sa.select(BlogPost.id, BlogPost.title, BlogPost.excerpt, BlogPost.content)
+        .where(BlogPost.published == True).order_by(BlogPost.id)
+    ):
+        counts = Counter()
+        for field, text in (('title', title), ('excerpt', excerpt), ('content', strip_html(content))):
+            for token, count in Counter(tokenize(text or '')).items():
+                counts[token] += FIELD_WEIGHTS[field] * count
+        words[post_id] = counts
+
+    tags = {post_id: Counter() for post_id in words}
+    for post_id, tag in connection.execute(sa.select(BlogPostTag.post_id, BlogPostTag.tag_normalized)):
+        if post_id in tags:
+            tags[post_id][tag] += 1
+            for token in tokenize(tag):
+                words[post_id][token] += FIELD_WEIGHTS['tags']
+    return list(words), words, tags
+
+
+def _tfidf(post_ids, term_counts, share):
+    """
+    Weighted TF-IDF entries of every post: (post_index, term_id, weight) arrays and the term count
+
+    Each post's weights are scaled to norm sqrt(share), so the dot product
+    of two posts' entries is share * their cosine.
+    """
+    count = len(post_ids)
+    vocabulary = {}
+    rows, terms, frequencies = [], [], []
+    for index, post_id in enumerate(post_ids):
+        counts = term_counts[post_id]
+        rows.extend([index] * len(counts))
+        terms.extend(vocabulary.setdefault(term, len(vocabulary)) for term in counts)
+        frequencies.extend(counts.values())
+    rows = np.array(rows, dtype=np.int64)
+    terms = np.array(terms, dtype=np.int64)
+
+    document_frequency = np.bincount(terms, minlength=len(vocabulary))[terms]
+    weights = (1 + np.log(np.array(frequencies, dtype=np.float64))) * (
+        np.log((1 + count) / (1 + document_frequency)) + 1
+    )
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=count))
+    weights *= math.sqrt(share) / norms[rows]
+
+    # Terms found in one post cannot match another
+    keep = (document_frequency > 1) & (document_frequency <= max(2, MAX_DOCUMENT_FREQUENCY * count))
+    rows, terms, weights = rows[keep], terms[keep], weights[keep]
+
+    # Each post's heaviest terms, grouped by post
+    order = np.lexsort((-weights, rows))
+    rows, terms, weights = rows[order], terms[order], weights[order]
+    starts = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=count))))
+    keep = np.arange(len(rows)) - starts[rows] < MAX_TERMS_PER_POST
+    return rows[keep], terms[keep], weights[keep], len(vocabulary)
+
+
+def _sparse_vectors(post_ids, words, tags):
+    """Post vectors by row (CSR) and by term (CSC), as NumPy arrays"""
+    word_rows, word_terms, word_weights, word_count = _tfidf(post_ids, words, 1 - TAG_SHARE)
+    tag_rows, tag_terms, tag_weights, tag_count = _tfidf(post_ids, tags, TAG_SHARE)
+
+    rows = np.concatenate((word_rows, tag_rows))
+    terms = np.concatenate((word_terms, tag_terms + word_count))
+    weights = np.concatenate((word_weights, tag_weights))
+    term_count = word_count + tag_count
+
+    order = np.argsort(rows, kind='stable')
+    csr = (
+        np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(post_ids))))),
+        terms[order], weights[order],
+    )
+    order = np.argsort(terms, kind='stable')
+    csc = (
+        np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=term_count)))),
+        rows[order], weights[order],
+    )
+    return csr, csc
+
+
+def _block_similarities(csr, csc, first, last, count):
+    """Cosine similarities of posts first..last-1 with every post, as a dense block"""
+    row_ptr, row_terms, row_weights = csr
+    term_ptr, term_rows, term_weights = csc
+
+    start, end = row_ptr[first], row_ptr[last]
+    terms = row_terms[start:end]
+    weights = row_weights[start:end]
+    local_rows = np.repeat(np.arange(last - first), np.diff(row_ptr[first:last + 1]))
+
+    # Pair each entry of the block with every post sharing its term
+    lengths = term_ptr[terms + 1] - term_ptr[terms]
+    positions = np.repeat(term_ptr[terms] - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+    cells = np.repeat(local_rows, lengths) * count + term_rows[positions]
+    values = np.repeat(weights, lengths) * term_weights[positions]
+    return np.bincount(cells, weights=values, minlength=(last - first) * count).reshape(last - first, count)
+
+
+def compute_related_posts(post_ids, words, tags, top_k=DEFAULT_TOP_K):
+    """
+    Top-k most similar posts of each post
+
+    Returns:
+        dict: post_id -> [(related_id, score), ...], best first
+    """
+    count = len(post_ids)
+    related = {post_id: [] for post_id in post_ids}
+    if count < 2:
+        return related
+
+    csr, csc = _sparse_vectors(post_ids, words, tags)
+    ids = np.array(post_ids)
+    k = min(top_k, count - 1)
+    block_rows = max(1, BLOCK_CELLS // count)
+
+    for first in range(0, count, block_rows):
+        last = min(first + block_rows, count)
+        scores = _block_similarities(csr, csc, first, last, count)
+        scores[np.arange(last - first), np.arange(first, last)] = 0  # Not related to itself
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for local, columns in enumerate(best):
+            row_scores = scores[local, columns]
+            # Best first; ties go to the lower post id
+            order = np.lexsort((ids[columns], -row_scores))
+            related[post_ids[first + local]] = [
+                (int(ids[columns[i]]), round(float(row_scores[i]), 6))
+                for i in order if row_scores[i] >= MIN_SCORE
+            ]
+    return related
+
+
+def rebuild_related_posts(engine=None, top_k=None):
+    """
+    Recompute blog_related_posts for all published posts
+
+    Uses its own connection, so it can run outside the request's session.
+
+    Returns:
+        dict: {"posts": n, "rows": n, "seconds": s}
+    """
+    engine = engine or db.engine
+    top_k = top_k or _config('BLOG_RELATED_TOP_K', DEFAULT_TOP_K)
+    began = time.monotonic()
+
+    with engine.connect() as connection:
+        post_ids, words, tags = _load_posts(connection)
+    related = compute_related_posts(post_ids, words, tags, top_k)
+    rows = [
+        {"post_id": post_id, "rank": rank, "related_id": related_id, "score": score}
+        for post_id, neighbours in related.items()
+        for rank, (related_id, score) in enumerate(neighbours)
+    ]
+
+    table = BlogRelatedPost.__table__
+    with engine.begin() as connection:
+        connection.execute(table.delete())
+        if rows:
+            connection.execute(table.insert(), rows)
+    return {"posts": len(post_ids), "rows": len(rows), "seconds": round(time.monotonic() - began, 3)}
+
+
+def ensure_related_posts():
+    """Build blog_related_posts if it is empty while there are published posts"""
+    if db.session.query(BlogRelatedPost.post_id).first() is not None:
+        return None
+    if BlogPost.query.filter(BlogPost.published == True).first() is None:
+        return None
+    return rebuild_related_posts()
+
+
+class RelatedPostsWorker:
+    """Daemon thread that rebuilds related posts once edits pause for `delay` seconds"""
+
+    def __init__(self, app, delay=DEFAULT_REBUILD_DELAY_SECONDS):
+        self.app = app
+        self.delay = delay
+        self.last_rebuild = None
+        self._requested = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="blog-related-posts", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._requested.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def request(self):
+        self._requested.set()
+
+    def _run(self):
+        while self._requested.wait() and not self._stop.is_set():
+            # Let a burst of edits settle into one rebuild
+            while self._requested.is_set() and not self._stop.is_set():
+                self._requested.clear()
+                self._stop.wait(self.delay)
+            if self._stop.is_set():
+                return
+            with self.app.app_context():
+                try:
+                    self.last_rebuild = rebuild_related_posts()
+                except Exception as e:
+                    print(f"❌ Related posts rebuild failed: {e}")
+
+
+def init_related_posts(app):
+    """Start the rebuild worker unless BLOG_RELATED_REBUILD_DELAY_SECONDS is negative"""
+    global _worker
+
+    delay = float(app.config.get('BLOG_RELATED_REBUILD_DELAY_SECONDS', DEFAULT_REBUILD_DELAY_SECONDS))
+    if delay < 0:
+        return None
+    if _worker is None:
+        _worker = RelatedPostsWorker(app, delay).start()
+    return _worker
+
+
+@sa.event.listens_for(sa.orm.Session, 'after_flush')
+def _note_blog_changes(session, flush_context):
+    if any(isinstance(obj, (BlogPost, BlogPostTag))
+           for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['blog_posts_changed'] = True
+
+
+@sa.event.listens_for(sa.orm.Session, 'after_rollback')
+def _forget_blog_changes(session):
+    session.info.pop('blog_posts_changed', None)
+
+
+@sa.event.listens_for(sa.orm.Session, 'after_commit')
+def _rebuild_after_commit(session):
+    if not session.info.pop('blog_posts_changed', False):
+        return
+    if _worker is not None:
+        _worker.request()
+    elif has_app_context():
+        rebuild_related_posts()
+
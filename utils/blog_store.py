@@ -0,0 +1,358 @@
+"""
+Blog post storage
+Posts live in the blog_posts table (tags in blog_post_tags) and listings
+read them through its (published, published_date) and category indexes.
+
+On SQLite, text search uses blog_posts_fts, an FTS5 table holding each
+published post's title, tags, excerpt and HTML-stripped body under the
+post's id. ORM mapper events keep it in step with every insert, update and
+delete of a BlogPost, and it is ranked with bm25() using the same field
+boosts as the in-process index in utils/blog_search.py, which remains the
+search backend for databases without FTS5 (PostgreSQL).
+
+Related posts are precomputed by utils/blog_related.py.
+
+blog_data.json is only an import/export format now: flask blog import|export.
+"""
+
+import base64
+import binascii
+import json
+import os
+from datetime import date
+
+import click
+import sqlalchemy as sa
+from sqlalchemy.orm import defer
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+
+from db import db
+from db.models import BlogPost, BlogPostTag, BlogRelatedPost
+from utils.blog_related import rebuild_related_posts
+from utils.blog_search import FIELD_WEIGHTS, blog_search_index, strip_html, tokenize
+
+FTS_TABLE = 'blog_posts_fts'
+CREATE_FTS_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(title, tags, excerpt, body, tokenize='unicode61 remove_diacritics 2')"
+)
+FTS_WEIGHTS = ', '.join(str(FIELD_WEIGHTS[field]) for field in ('title', 'tags', 'excerpt', 'content'))
+
+# Snippet match markers, swapped for <mark> after the snippet is escaped
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+SNIPPET_TOKENS = 30
+
+# Engines (by URL) whose FTS table is known to exist
+_fts_ready = set()
+
+# (post count, last update) the in-process search index was synced at
+_memory_index_version = None
+
+
+def fts_available(connection):
+    """Whether this connection's database has the FTS table (SQLite with FTS5)"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    key = str(connection.engine.url)
+    if key not in _fts_ready:
+        exists = connection.execute(
+            sa.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        if not exists:
+            return False
+        _fts_ready.add(key)
+    return True
+
+
+def _fts_values(post):
+    return {
+        "rowid": post.id,
+        "title": post.title or '',
+        "tags": ' '.join(post.tags),
+        "excerpt": post.excerpt or '',
+        "body": strip_html(post.content),
+    }
+
+
+def write_fts_row(connection, post):
+    """Replace a post's FTS row (published posts only)"""
+    connection.execute(sa.text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": post.id})
+    if post.published:
+        connection.execute(
+            sa.text(f"INSERT INTO {FTS_TABLE} (rowid, title, tags, excerpt, body) "
+                    "VALUES (:rowid, :title, :tags, :excerpt, :body)"),
+            _fts_values(post)
+        )
+
+
+@sa.event.listens_for(BlogPost, 'after_insert')
+@sa.event.listens_for(BlogPost, 'after_update')
+def _index_blog_post(mapper, connection, post):
+    if fts_available(connection):
+        write_fts_row(connection, post)
+
+
+@sa.event.listens_for(BlogPost, 'after_delete')
+def _unindex_blog_post(mapper, connection, post):
+    if fts_available(connection):
+        connection.execute(sa.text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": post.id})
+
+
+def ensure_fts_index():
+    """
+    Create the FTS table when missing (e.g. tables made by create_all) and fill it
+
+    Returns:
+        bool: False when the database cannot have one
+    """
+    connection = db.session.connection()
+    if fts_available(connection):
+        return True
+    if connection.dialect.name != 'sqlite':
+        return False
+
+    try:
+        connection.exec_driver_sql(CREATE_FTS_SQL)
+    except sa.exc.OperationalError:
+        db.session.rollback()
+        print("⚠️ SQLite was built without FTS5; blog search uses the in-process index")
+        return False
+    _fts_ready.add(str(connection.engine.url))
+    rebuild_fts_index()
+    return True
+
+
+def rebuild_fts_index():
+    """Re-create every FTS row from blog_posts; returns the number of posts indexed"""
+    connection = db.session.connection()
+    connection.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+    posts = BlogPost.query.filter(BlogPost.published == True).all()
+    for post in posts:
+        write_fts_row(connection, post)
+    db.session.commit()
+    return len(posts)
+
+
+def published_posts_query():
+    """Published posts, newest first (ties keep id order)"""
+    return BlogPost.query.filter(BlogPost.published == True).order_by(
+        BlogPost.published_date.desc(), BlogPost.id.asc()
+    )
+
+
+def encode_cursor(post):
+    """Opaque listing cursor pointing just after `post`"""
+    key = f"{post.published_date.isoformat()}|{post.id}".encode()
+    return base64.urlsafe_b64encode(key).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (published_date, id) of a listing cursor
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        key = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        published_date, post_id = key.split('|')
+        return date.fromisoformat(published_date), int(post_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def listing_page(query, cursor=None, page_size=12):
+    """
+    One page of a published_posts_query() listing, without post bodies
+
+    Pages continue after the cursor's (published_date, id) key instead of
+    skipping an offset, so they read straight from the listing indexes and
+    stay stable while posts are published.
+
+    Returns:
+        tuple: (posts, next_cursor); next_cursor is None on the last page
+    """
+    query = query.options(defer(BlogPost.content))
+    if cursor:
+        published_date, post_id = decode_cursor(cursor)
+        query = query.filter(sa.or_(
+            BlogPost.published_date < published_date,
+            sa.and_(BlogPost.published_date == published_date, BlogPost.id > post_id)
+        ))
+    posts = query.limit(page_size + 1).all()
+    if len(posts) > page_size:
+        return posts[:page_size], encode_cursor(posts[page_size - 1])
+    return posts, None
+
+
+def get_published_post(slug):
+    return BlogPost.query.filter_by(slug=slug, published=True).first()
+
+
+def posts_in_category(category):
+    return published_posts_query().filter(BlogPost.category == category)
+
+
+def posts_with_tag(tag):
+    """Published posts tagged `tag` (case-insensitive), newest first"""
+    tagged = db.session.query(BlogPostTag.post_id).filter(BlogPostTag.tag_normalized == tag.strip().lower())
+    return published_posts_query().filter(BlogPost.id.in_(tagged))
+
+
+def related_posts(post, limit=3):
+    """Published posts most similar to `post`, from the precomputed blog_related_posts"""
+    related = BlogPost.query.join(BlogRelatedPost, BlogRelatedPost.related_id == BlogPost.id).filter(
+        BlogRelatedPost.post_id == post.id,
+        BlogPost.published == True
+    ).order_by(BlogRelatedPost.rank).limit(limit).all()
+    if related:
+        return related
+
+    # Not computed yet (e.g. published moments ago): posts sharing a tag
+    tags = [tag.strip().lower() for tag in post.tags]
+    if not tags:
+        return []
+    tagged = db.session.query(BlogPostTag.post_id).filter(BlogPostTag.tag_normalized.in_(tags))
+    return BlogPost.query.filter(
+        BlogPost.published == True,
+        BlogPost.id != post.id,
+        BlogPost.id.in_(tagged)
+    ).order_by(BlogPost.id).limit(limit).all()
+
+
+def _fts_match_query(text):
+    """User input as an FTS5 query: any of its words, each also as a prefix"""
+    return ' OR '.join(f'"{token}"*' for token in dict.fromkeys(tokenize(text)))
+
+
+def _snippet_markup(snippet):
+    return Markup(str(escape(snippet)).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>'))
+
+
+def _search_fts(text, limit):
+    match = _fts_match_query(text)
+    if not match:
+        return []
+    rows = db.session.execute(
+        sa.text(f"SELECT rowid, snippet({FTS_TABLE}, 3, :open, :close, '…', :tokens) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH :match ORDER BY bm25({FTS_TABLE}, {FTS_WEIGHTS}) LIMIT :limit"),
+        {"open": _MARK_OPEN, "close": _MARK_CLOSE, "tokens": SNIPPET_TOKENS, "match": match, "limit": limit}
+    ).all()
+    return [(post_id, _snippet_markup(snippet)) for post_id, snippet in rows]
+
+
+def sync_memory_index():
+    """Bring the in-process search index up to date with blog_posts (non-FTS databases)"""
+    global _memory_index_version
+
+    version = tuple(db.session.query(sa.func.count(BlogPost.id), sa.func.max(BlogPost.updated_at)).one())
+    if version != _memory_index_version:
+        blog_search_index.sync([post.to_dict() for post in BlogPost.query.filter(BlogPost.published == True)])
+        _memory_index_version = version
+
+
+def _search_memory(text, limit):
+    sync_memory_index()
+    return [
+        (post_id, blog_search_index.snippet(post_id, text))
+        for post_id, score in blog_search_index.search(text, limit=limit)
+    ]
+
+
+def search_posts(text, limit=50):
+    """
+    Published posts matching `text`, most relevant first
+
+    Returns:
+        list: (BlogPost, snippet) pairs; snippets are Markup with matches in <mark>
+    """
+    if fts_available(db.session.connection()):
+        ranked = _search_fts(text, limit)
+    else:
+        ranked = _search_memory(text, limit)
+
+    posts = {post.id: post for post in BlogPost.query.filter(
+        BlogPost.id.in_([post_id for post_id, _ in ranked]),
+        BlogPost.published == True
+    )}
+    return [(posts[post_id], snippet) for post_id, snippet in ranked if post_id in posts]
+
+
+def import_posts(posts):
+    """
+    Insert or update posts from blog_data.json-format dicts, matched by id
+
+    Returns:
+        dict: {"created": n, "updated": n}
+    """
+    stats = {"created": 0, "updated": 0}
+    for data in posts:
+        post = db.session.get(BlogPost, data['id']) if data.get('id') else None
+        if post is None:
+            post = BlogPost(id=data.get('id'))
+            db.session.add(post)
+            stats["created"] += 1
+        else:
+            stats["updated"] += 1
+
+        post.title = data['title']
+        post.slug = data['slug']
+        post.category = data.get('category')
+        post.excerpt = data.get('excerpt')
+        post.content = data.get('content', '')
+        post.author = data.get('author')
+        published_date = data.get('published_date')
+        post.published_date = date.fromisoformat(published_date) if published_date else date.today()
+        post.featured_image = data.get('featured_image') or 'default-post.jpg'
+        post.read_time = data.get('read_time') or 5
+        post.published = data.get('published', False)
+        post.tags = data.get('tags', [])
+    db.session.commit()
+    return stats
+
+
+def export_posts(path):
+    """Write every post to `path` in blog_data.json format; returns the number written"""
+    posts = [post.to_dict() for post in BlogPost.query.order_by(BlogPost.id)]
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({"posts": posts}, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return len(posts)
+
+
+blog_cli = AppGroup('blog', help='Blog posts: JSON import/export, search index and related posts.')
+
+
+@blog_cli.command('import')
+@click.argument('path', default='blog_data.json')
+def blog_import(path):
+    """Load posts from a blog_data.json file (matched by id)."""
+    with open(path) as f:
+        stats = import_posts(json.load(f)['posts'])
+    click.echo(f"✅ Imported {path}: {stats['created']} created, {stats['updated']} updated")
+
+
+@blog_cli.command('export')
+@click.argument('path', default='blog_data.json')
+def blog_export(path):
+    """Write all posts to a blog_data.json file."""
+    click.echo(f"✅ Exported {export_posts(path)} posts to {path}")
+
+
+@blog_cli.command('reindex')
+def blog_reindex():
+    """Rebuild the FTS5 search table from blog_posts."""
+    if not ensure_fts_index():
+        click.echo("❌ No FTS5 support on this database; search uses the in-process index")
+        return
+    click.echo(f"✅ Indexed {rebuild_fts_index()} published posts")
+
+
+@blog_cli.command('related')
+@click.option('--top-k', type=int, help='Related posts stored per post (default BLOG_RELATED_TOP_K)')
+def blog_related(top_k):
+    """Recompute the related posts of every published post."""
+    stats = rebuild_related_posts(top_k=top_k)
+    click.echo(f"✅ {stats['rows']} related posts for {stats['posts']} posts in {stats['seconds']:.2f}s")
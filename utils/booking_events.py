@@ -0,0 +1,289 @@
+"""
+Live booking updates over Server-Sent Events
+The booking write paths record booking-created, booking-cancelled and
+capacity-changed deltas (series-created, series-ended and
+occurrence-cancelled for recurring series) on the session; after the commit
+they are published to an in-process broker, which keeps the most recent
+events in a ring buffer so a reconnecting client can resume from its
+Last-Event-ID.
+
+The broker lives in one process: with several server processes, each stream
+only sees bookings written by the process serving it.
+
+Each open stream holds a server thread, so the server must run threaded
+(or on gevent) with more threads than BOOKING_STREAM_MAX_CLIENTS. Streams
+past that cap get a 'busy' message and retry later. The server also closes
+a stream after BOOKING_STREAM_MAX_SECONDS, or after BOOKING_STREAM_IDLE_SECONDS
+without a booking event. EventSource then reconnects and resumes from its
+Last-Event-ID, which frees the thread in the meantime.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from flask import Response, current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.capacity import get_service_capacity, get_slot_usage, ledger_key, spanned_slots
+
+BUFFER_SIZE = 1000             # Events kept for Last-Event-ID resumes
+SUBSCRIBER_QUEUE_SIZE = 256    # A client further behind than this is told to reload
+HEARTBEAT_SECONDS = 15         # Comment line that keeps proxies from closing idle streams
+RETRY_MILLISECONDS = 3000      # Reconnect delay suggested to EventSource
+BUSY_RETRY_MILLISECONDS = 30000  # Reconnect delay when every stream slot is taken
+MAX_STREAMS = 20               # Open streams per process (each holds a server thread)
+MAX_STREAM_SECONDS = 300       # A stream is closed (and reconnects) after this long
+IDLE_STREAM_SECONDS = 60       # ... or after this long without a booking event
+
+
+def _config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+class BookingEventBroker:
+    """
+    In-process pub/sub with a replay buffer
+
+    Event ids start at the broker's start time in milliseconds and go up by
+    one, so ids from before a restart are older than anything buffered and
+    the client gets a reset instead of a silent gap.
+    """
+
+    def __init__(self, buffer_size=BUFFER_SIZE, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._last_id = int(time.time() * 1000)
+
+    def publish(self, event_type, data):
+        """Append an event to the buffer and hand it to every subscriber"""
+        with self._lock:
+            self._last_id += 1
+            item = (self._last_id, event_type, data)
+            self._buffer.append(item)
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(item)
+                except queue.Full:
+                    # Too slow to keep up: end its stream with a reset
+                    self._subscribers.discard(subscriber)
+                    subscriber.overflowed = True
+        return self._last_id
+
+    def subscribe(self, last_event_id=None, max_subscribers=None):
+        """
+        Register a subscriber
+
+        Returns:
+            tuple: (subscriber queue, events to replay, whether the client
+                   must reload because events since last_event_id are gone,
+                   id of the newest event so far), or None when
+                   max_subscribers are already registered
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        subscriber.overflowed = False
+
+        with self._lock:
+            if max_subscribers is not None and len(self._subscribers) >= max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+            if last_event_id is None:
+                return subscriber, [], False, self._last_id
+
+            oldest = self._buffer[0][0] if self._buffer else self._last_id + 1
+            if last_event_id < oldest - 1 or last_event_id > self._last_id:
+                return subscriber, [], True, self._last_id
+            backlog = [item for item in self._buffer if item[0] > last_event_id]
+            return subscriber, backlog, False, self._last_id
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "buffered": len(self._buffer),
+                "last_event_id": self._last_id
+            }
+
+
+broker = BookingEventBroker()
+
+
+def _booking_data(booking):
+    service = booking.service
+    return {
+        "id": booking.id,
+        "title": f"{booking.user_name} - {service.name if service else 'Unknown Service'}",
+        "service_id": booking.service_id,
+        "start": booking.start_time.isoformat(),
+        "end": booking.end_time.isoformat(),
+        "status": booking.status,
+        "num_people": booking.num_people
+    }
+
+
+def _capacity_data(booking):
+    """One capacity payload per ledger slot the booking spans"""
+    service_key = ledger_key(booking.service_id, booking.start_time)[0]
+    capacity = get_service_capacity(booking.service)
+    payloads = []
+    for slot_start in spanned_slots(booking.start_time, booking.end_time):
+        booked_people, booking_count = get_slot_usage(service_key, slot_start)
+        payloads.append({
+            "service_id": booking.service_id,
+            "slot_start": slot_start.isoformat(),
+            "booked_people": booked_people,
+            "booking_count": booking_count,
+            "capacity": capacity,
+            "available_spots": max(0, capacity - booked_people)
+        })
+    return payloads
+
+
+def record_booking_event(event_type, booking, session=None):
+    """
+    Queue a booking delta and the new capacity of every slot it spans for
+    publishing after the commit (call after the ledger update, before
+    committing)
+
+    Args:
+        event_type: 'booking-created' or 'booking-cancelled'
+        booking: the flushed Booking
+        session: SQLAlchemy session (defaults to db.session)
+    """
+    if session is None:
+        from db import db
+        session = db.session
+
+    events = session.info.setdefault('booking_events', [])
+    events.append((event_type, _booking_data(booking)))
+    events.extend(('capacity-changed', data) for data in _capacity_data(booking))
+
+
+def record_series_event(event_type, series, occurrence_start=None, session=None):
+    """
+    Queue a recurring series delta for publishing after the commit
+
+    Args:
+        event_type: 'series-created', 'series-ended' or 'occurrence-cancelled'
+        series: the flushed BookingSeries
+        occurrence_start: the cancelled occurrence, for 'occurrence-cancelled'
+    """
+    if session is None:
+        from db import db
+        session = db.session
+
+    start = occurrence_start or series.start_time
+    session.info.setdefault('booking_events', []).append((event_type, {
+        "series_id": series.id,
+        "service_id": series.service_id,
+        "start": start.isoformat(),
+        "end": (start + timedelta(minutes=series.duration_minutes)).isoformat(),
+        "frequency": series.frequency,
+        "interval": series.interval,
+        "until": series.until.isoformat() if series.until else None,
+        "status": series.status
+    }))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_events(session):
+    for event_type, data in session.info.pop('booking_events', ()):
+        broker.publish(event_type, data)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rolled_back_events(session):
+    session.info.pop('booking_events', None)
+
+
+def format_sse(data, event_type=None, event_id=None, retry=None):
+    """Serialize one message in the text/event-stream format"""
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event_type:
+        lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_last_event_id(request):
+    """Last-Event-ID header (sent by EventSource on reconnect) or ?lastEventId= for the first connect"""
+    value = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def event_stream(last_event_id=None, heartbeat_seconds=HEARTBEAT_SECONDS, max_streams=MAX_STREAMS,
+                 max_seconds=MAX_STREAM_SECONDS, idle_seconds=IDLE_STREAM_SECONDS):
+    """
+    Generator of SSE messages for one client: replayed events, then live ones
+
+    Ends after max_seconds, or idle_seconds without an event, so the client
+    reconnects (resuming from its Last-Event-ID) instead of holding a server
+    thread for good. When max_streams are open it only tells the client to
+    come back after BUSY_RETRY_MILLISECONDS.
+    """
+    subscription = broker.subscribe(last_event_id, max_streams)
+    if subscription is None:
+        resume_id = last_event_id if last_event_id is not None else broker.stats()["last_event_id"]
+        yield format_sse({"reason": "too many streams"}, "busy", resume_id, retry=BUSY_RETRY_MILLISECONDS)
+        return
+
+    subscriber, backlog, reset, newest_id = subscription
+    try:
+        # The id makes a reconnect resume from here even if no event arrives
+        ready_id = newest_id if last_event_id is None or reset else last_event_id
+        yield format_sse({"last_event_id": newest_id}, "ready", ready_id, retry=RETRY_MILLISECONDS)
+        if reset:
+            yield format_sse({"reason": "history unavailable"}, "reset")
+        for event_id, event_type, data in backlog:
+            yield format_sse(data, event_type, event_id)
+
+        closes_at = time.monotonic() + max_seconds
+        idle_until = time.monotonic() + idle_seconds
+        while True:
+            if subscriber.overflowed and subscriber.empty():
+                yield format_sse({"reason": "client too slow"}, "reset")
+                return
+            remaining = min(closes_at, idle_until) - time.monotonic()
+            if remaining <= 0:
+                return  # EventSource reconnects after RETRY_MILLISECONDS
+            try:
+                event_id, event_type, data = subscriber.get(timeout=min(heartbeat_seconds, remaining))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            idle_until = time.monotonic() + idle_seconds
+            yield format_sse(data, event_type, event_id)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def event_stream_response(request):
+    """Streaming text/event-stream response for a booking stream route"""
+    stream = event_stream(
+        parse_last_event_id(request),
+        max_streams=int(_config('BOOKING_STREAM_MAX_CLIENTS', MAX_STREAMS)),
+        max_seconds=float(_config('BOOKING_STREAM_MAX_SECONDS', MAX_STREAM_SECONDS)),
+        idle_seconds=float(_config('BOOKING_STREAM_IDLE_SECONDS', IDLE_STREAM_SECONDS))
+    )
+    return Response(
+        stream,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
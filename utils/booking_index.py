@@ -0,0 +1,201 @@
+"""
+In-process interval index of confirmed bookings
+Answers "does this slot overlap a confirmed booking?" with a bisect
+instead of scanning every booking of the day for every slot
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from db.routing import read_from_primary
+
+
+class DayIntervals:
+    """Sorted intervals for one (day, service) bucket"""
+
+    def __init__(self):
+        self.entries = []    # (start, end, booking_id), sorted by start
+        self.starts = []     # entry starts, for bisect
+        self.max_ends = []   # running max of entry ends
+
+    def _rebuild_max_ends(self, from_index=0):
+        max_end = self.max_ends[from_index - 1] if from_index > 0 else None
+        del self.max_ends[from_index:]
+        for _, end, _ in self.entries[from_index:]:
+            max_end = end if max_end is None or end > max_end else max_end
+            self.max_ends.append(max_end)
+
+    def add(self, start, end, booking_id):
+        entry = (start, end, booking_id)
+        if entry in self.entries:
+            return
+        insort(self.entries, entry)
+        position = self.entries.index(entry)
+        self.starts.insert(position, start)
+        self._rebuild_max_ends(position)
+
+    def remove(self, booking_id):
+        for position, entry in enumerate(self.entries):
+            if entry[2] == booking_id:
+                del self.entries[position]
+                del self.starts[position]
+                self._rebuild_max_ends(position)
+                return True
+        return False
+
+    def overlaps(self, start, end):
+        """True if any stored interval intersects [start, end)"""
+        # Intervals starting before `end` are entries[:count]; one of them
+        # overlaps iff the furthest end among them is past `start`
+        count = bisect_left(self.starts, end)
+        return count > 0 and self.max_ends[count - 1] > start
+
+
+class BookingIntervalIndex:
+    """
+    Confirmed bookings grouped by day and service
+
+    Each day is loaded from the database on first use and cached. The booking
+    write paths call add()/remove() so the cache stays current in this process;
+    entries older than `max_age` seconds are reloaded so other worker
+    processes' writes are picked up too. At most `max_days` days are kept:
+    loading a day drops expired ones, then the least recently used.
+    """
+
+    ALL_SERVICES = None
+
+    def __init__(self, max_age=300, max_days=366):
+        self.max_age = max_age
+        self.max_days = max_days
+        self._days = OrderedDict()  # date -> {service_id: DayIntervals}, least recently used first
+        self._loaded_at = {}        # date -> monotonic load time
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _days_spanned(start, end):
+        day = start.date()
+        last_day = (end - timedelta(microseconds=1)).date() if end > start else day
+        while day <= last_day:
+            yield day
+            day += timedelta(days=1)
+
+    @staticmethod
+    def _naive(value):
+        return value.replace(tzinfo=None) if value.tzinfo else value
+
+    def _insert(self, buckets, start, end, booking_id, service_id):
+        for key in (self.ALL_SERVICES, service_id):
+            buckets.setdefault(key, DayIntervals()).add(start, end, booking_id)
+            if service_id is None:
+                break
+
+    def _load_day(self, day):
+        from db.models import Booking
+        from utils.recurring import expand_series
+
+        day_start = datetime.combine(day, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+
+        # Bookings overlapping the (UTC) day start on it or the day before;
+        # start_date is the local day, up to a day either side of the UTC
+        # one, so the bucket range is widened by a day each way and still
+        # keeps this an indexed lookup
+        rows = Booking.query.with_entities(
+            Booking.id, Booking.service_id, Booking.start_time, Booking.end_time
+        ).filter(
+            Booking.start_date.between(day - timedelta(days=2), day + timedelta(days=1)),
+            Booking.start_time < day_end,
+            Booking.end_time > day_start,
+            Booking.status == 'confirmed'
+        ).all()
+
+        buckets = {}
+        for booking_id, service_id, start, end in rows:
+            self._insert(buckets, self._naive(start), self._naive(end), booking_id, service_id)
+
+        # Series occurrences are keyed by the negated series id
+        for occurrence in expand_series(day_start, day_end):
+            if occurrence.status == 'confirmed':
+                self._insert(buckets, occurrence.start_time, occurrence.end_time,
+                             -occurrence.series_id, occurrence.service_id)
+        return buckets
+
+    def _get_day(self, day):
+        with self._lock:
+            loaded_at = self._loaded_at.get(day)
+            if loaded_at is not None and time.monotonic() - loaded_at < self.max_age:
+                self._days.move_to_end(day)
+                return self._days[day]
+
+        # Read the primary: a day loaded from a lagging replica would stay
+        # stale for everyone until max_age
+        with read_from_primary():
+            buckets = self._load_day(day)
+        with self._lock:
+            now = time.monotonic()
+            self._days[day] = buckets
+            self._days.move_to_end(day)
+            self._loaded_at[day] = now
+            self._evict(now)
+        return buckets
+
+    def _evict(self, now):
+        """Drop expired days, then the least recently used beyond max_days (lock held)"""
+        for day in [day for day, loaded_at in self._loaded_at.items() if now - loaded_at >= self.max_age]:
+            del self._days[day]
+            del self._loaded_at[day]
+        while len(self._days) > self.max_days:
+            day, _ = self._days.popitem(last=False)
+            del self._loaded_at[day]
+
+    def has_conflict(self, start, end, service_id=ALL_SERVICES):
+        """Check whether [start, end) overlaps a confirmed booking"""
+        start, end = self._naive(start), self._naive(end)
+        for day in self._days_spanned(start, end):
+            intervals = self._get_day(day).get(service_id)
+            if intervals and intervals.overlaps(start, end):
+                return True
+        return False
+
+    def add(self, booking):
+        """Record a confirmed booking in the days that are already cached"""
+        if booking.status != 'confirmed':
+            return
+        start, end = self._naive(booking.start_time), self._naive(booking.end_time)
+        with self._lock:
+            for day in self._days_spanned(start, end):
+                if day in self._days:
+                    self._insert(self._days[day], start, end, booking.id, booking.service_id)
+
+    def remove(self, booking):
+        """Drop a cancelled booking from every cached bucket"""
+        start, end = self._naive(booking.start_time), self._naive(booking.end_time)
+        with self._lock:
+            for day in self._days_spanned(start, end):
+                for intervals in self._days.get(day, {}).values():
+                    intervals.remove(booking.id)
+
+    def invalidate(self, day=None):
+        """Forget one cached day, or all of them"""
+        with self._lock:
+            if day is None:
+                self._days.clear()
+                self._loaded_at.clear()
+            else:
+                self._days.pop(day, None)
+                self._loaded_at.pop(day, None)
+
+    def invalidate_span(self, start, end):
+        """Forget every cached day an interval touches"""
+        start, end = self._naive(start), self._naive(end)
+        with self._lock:
+            for day in self._days_spanned(start, end):
+                self._days.pop(day, None)
+                self._loaded_at.pop(day, None)
+
+
+# Process-wide index used by the booking blueprints
+booking_index = BookingIntervalIndex()
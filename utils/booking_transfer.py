@@ -0,0 +1,317 @@
+"""
+Bulk booking export and import (CSV and JSON Lines)
+Exports stream rows from the database with yield_per and write them one
+line at a time, so memory stays flat however many years of bookings there
+are. Imports read a file incrementally and insert in batched transactions.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+import pytz
+
+from db import db
+from db.models import Booking, BookingArchive, Service
+from utils.booking_utils import booking_length_error
+from utils.booking_index import booking_index
+from utils.capacity import add_slot_usage, spanned_slots, SEATLESS_STATUSES
+from utils.reminders import schedule_booking_reminders
+
+FORMATS = ('csv', 'jsonl')
+MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+STATUSES = ('pending', 'confirmed', 'waitlisted', 'cancelled')
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+
+EXPORT_FIELDS = [
+    'id', 'user_name', 'email', 'phone_number', 'service_id', 'service_name', 'num_people',
+    'start_time', 'end_time', 'status', 'admin_notes', 'created_at'
+]
+
+
+def _parse_datetime(value, field):
+    """ISO 8601 string to naive UTC (naive values are taken as UTC already)"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Invalid {field}: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(pytz.UTC).replace(tzinfo=None)
+    return parsed
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _export_query(model, start, end, status):
+    query = db.session.query(
+        model.id, model.user_name, model.email, model.phone_number, model.service_id,
+        Service.name.label('service_name'), model.num_people, model.start_time,
+        model.end_time, model.status, model.admin_notes, model.created_at
+    ).outerjoin(Service, model.service_id == Service.id)
+
+    if start is not None:
+        query = query.filter(model.start_time >= start)
+    if end is not None:
+        query = query.filter(model.start_time < end)
+    if status:
+        query = query.filter(model.status == status)
+    return query
+
+
+def iter_bookings(start=None, end=None, status=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream export rows in id order, fetching `batch_size` rows at a time
+
+    Only the exported columns are selected (no Booking objects), and
+    yield_per keeps the driver from buffering the whole result. Archived
+    bookings are included (UNION ALL) when the range reaches back into the
+    archive, which an export without a start date always does.
+    """
+    from utils.archive import range_needs_archive
+
+    query = _export_query(Booking, start, end, status)
+    if range_needs_archive(start):
+        query = query.union_all(_export_query(BookingArchive, start, end, status))
+
+    for row in query.order_by(Booking.id).execution_options(yield_per=batch_size):
+        yield {field: _serialize(getattr(row, field)) for field in EXPORT_FIELDS}
+
+
+def generate_csv(rows):
+    """Yield a header line, then one CSV line per row"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+
+    writer.writeheader()
+    for row in rows:
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+    yield buffer.getvalue()
+
+
+def generate_jsonl(rows):
+    """Yield one JSON object per line"""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def generate_export(fmt, **filters):
+    """Export lines in the requested format ('csv' or 'jsonl')"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    rows = iter_bookings(**filters)
+    return generate_csv(rows) if fmt == 'csv' else generate_jsonl(rows)
+
+
+def read_records(stream, fmt):
+    """
+    Yield (line_number, record) from a text stream without reading it all
+
+    CSV files need a header row; JSON Lines files hold one object per line.
+    A line that cannot be parsed is yielded as a ValueError instead of a dict.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+class BookingImporter:
+    """
+    Insert bookings from an external system in batched transactions
+
+    Each batch is committed on its own, so a failure part-way through keeps
+    the earlier batches, and rows already in the database (same email,
+    start time and service) are skipped, so the import can simply be re-run.
+    Imported bookings take their seats in the capacity ledger and future
+    active ones get SMS reminders; no confirmation emails or texts are sent.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, default_status='confirmed'):
+        self.batch_size = batch_size
+        self.default_status = default_status
+        self.stats = {"imported": 0, "skipped": 0, "failed": 0, "batches": 0}
+        self.errors = []
+        self._services = None
+
+    def _lookup_service(self, record):
+        """
+        Resolve service_id, or a service name (first match)
+
+        Returns:
+            tuple: (service_id, duration) or None for bookings without a service
+        """
+        if self._services is None:
+            # Plain tuples: the session is cleared after every batch
+            rows = db.session.query(Service.id, Service.name, Service.duration).order_by(Service.id).all()
+            self._services = {row.id: (row.id, row.duration) for row in rows}
+            self._services_by_name = {}
+            for row in rows:
+                self._services_by_name.setdefault(row.name.strip().lower(), (row.id, row.duration))
+
+        service_id = record.get('service_id')
+        if service_id not in (None, ''):
+            service = self._services.get(int(service_id))
+            if service is None:
+                raise ValueError(f"Unknown service_id: {service_id}")
+            return service
+
+        name = (record.get('service_name') or record.get('service') or '').strip().lower()
+        if name:
+            service = self._services_by_name.get(name)
+            if service is None:
+                raise ValueError(f"Unknown service: {name!r}")
+            return service
+        return None
+
+    def build_booking(self, record):
+        """Validate one record and turn it into an unsaved Booking"""
+        for field in ('user_name', 'email', 'start_time'):
+            if not record.get(field):
+                raise ValueError(f"Missing required field: {field}")
+
+        service = self._lookup_service(record)
+        start_time = _parse_datetime(record['start_time'], 'start_time')
+        if record.get('end_time'):
+            end_time = _parse_datetime(record['end_time'], 'end_time')
+        elif service is not None:
+            end_time = start_time + timedelta(minutes=service[1])
+        else:
+            raise ValueError("Missing end_time and no service to take the duration from")
+        length_error = booking_length_error(start_time, end_time)
+        if length_error:
+            raise ValueError(length_error)
+
+        status = (record.get('status') or self.default_status).strip().lower()
+        if status not in STATUSES:
+            raise ValueError(f"Invalid status: {status!r}")
+
+        booking = Booking(
+            user_name=str(record['user_name']).strip(),
+            email=str(record['email']).strip(),
+            phone_number=(str(record.get('phone_number') or record.get('phone') or '').strip() or None),
+            service_id=service[0] if service else None,
+            num_people=max(1, int(record.get('num_people') or 1)),
+            start_time=start_time,
+            end_time=end_time,
+            status=status,
+            admin_notes=record.get('admin_notes') or None
+        )
+        if record.get('created_at'):
+            booking.created_at = _parse_datetime(record['created_at'], 'created_at')
+        return booking
+
+    def _existing_keys(self, bookings):
+        """(email_normalized, start_time, service_id) of batch rows already stored"""
+        emails = {booking.email_normalized for booking in bookings}
+        starts = [booking.start_time for booking in bookings]
+        keys = set()
+        # Re-importing an old export must not bring archived bookings back either
+        for model in (Booking, BookingArchive):
+            rows = db.session.query(model.email_normalized, model.start_time, model.service_id).filter(
+                model.email_normalized.in_(emails),
+                model.start_time >= min(starts),
+                model.start_time <= max(starts)
+            ).all()
+            keys.update(tuple(row) for row in rows)
+        return keys
+
+    def _flush_batch(self, batch):
+        if not batch:
+            return
+
+        try:
+            existing = self._existing_keys(batch)
+            usage = {}
+            new_bookings = []
+            for booking in batch:
+                key = (booking.email_normalized, booking.start_time, booking.service_id)
+                if key in existing:
+                    self.stats["skipped"] += 1
+                    continue
+                existing.add(key)  # Duplicates inside the file too
+                new_bookings.append(booking)
+
+                if booking.status not in SEATLESS_STATUSES:
+                    for slot_start in spanned_slots(booking.start_time, booking.end_time):
+                        people, count = usage.get((booking.service_id, slot_start), (0, 0))
+                        usage[(booking.service_id, slot_start)] = (people + booking.num_people, count + 1)
+
+            db.session.add_all(new_bookings)
+            db.session.flush()
+            add_slot_usage(usage)
+
+            now = datetime.utcnow()
+            for booking in new_bookings:
+                if booking.start_time > now:
+                    schedule_booking_reminders(booking)
+
+            db.session.commit()
+            self.stats["imported"] += len(new_bookings)
+            self.stats["batches"] += 1
+        except Exception as e:
+            db.session.rollback()
+            self.stats["failed"] += len(batch)
+            self.errors.append((None, f"Batch of {len(batch)} rows failed: {e}"))
+        finally:
+            # Drop the batch's objects so memory does not grow with the file
+            db.session.expunge_all()
+
+    def run(self, records):
+        """
+        Import (line_number, record) pairs
+
+        Returns:
+            dict: imported/skipped/failed/batches counts
+        """
+        batch = []
+        for line_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                batch.append(self.build_booking(record))
+            except (ValueError, TypeError) as e:
+                self.stats["failed"] += 1
+                self.errors.append((line_number, str(e)))
+                continue
+
+            if len(batch) >= self.batch_size:
+                self._flush_batch(batch)
+                batch = []
+
+        self._flush_batch(batch)
+        booking_index.invalidate()
+        return self.stats
+
+
+def import_bookings(stream, fmt, batch_size=IMPORT_BATCH_SIZE, default_status='confirmed'):
+    """
+    Import bookings from a CSV or JSON Lines text stream
+
+    Returns:
+        tuple: (stats dict, list of (line_number, error))
+    """
+    importer = BookingImporter(batch_size=batch_size, default_status=default_status)
+    importer.run(read_records(stream, fmt))
+    return importer.stats, importer.errors
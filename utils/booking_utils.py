@@ -0,0 +1,180 @@
+"""
+Shared helpers for the booking blueprints
+Used by both routes/booking.py and features/booking/booking.py
+"""
+
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy.orm import contains_eager
+
+from db import db
+from db.models import Booking, BookingArchive, Service
+from utils.contact import normalize_email, normalize_phone, phone_search_prefix, PREFIX_END
+
+# FullCalendar's month view renders six full weeks
+CALENDAR_WINDOW_DAYS = 42
+
+# No booking runs longer than this, so overlap queries can bound start_time
+# from below and stay on the start_time indexes
+MAX_BOOKING_LENGTH = timedelta(days=1)
+
+
+def booking_length_error(start_time, end_time):
+    """
+    Why a booking from start_time to end_time cannot be stored, or None
+
+    Every create path checks this, since the overlap queries rely on no
+    booking running longer than MAX_BOOKING_LENGTH.
+    """
+    if end_time <= start_time:
+        return "end_time must be after start_time"
+    if end_time - start_time > MAX_BOOKING_LENGTH:
+        hours = int(MAX_BOOKING_LENGTH.total_seconds() // 3600)
+        return f"A booking cannot be longer than {hours} hours"
+    return None
+
+
+def parse_calendar_datetime(value):
+    """
+    Parse a FullCalendar start/end query parameter into a naive UTC datetime
+
+    Accepts plain dates ('2025-10-01'), naive datetimes and ISO strings with
+    a 'Z' or numeric offset. Bookings are stored as naive UTC.
+    """
+    if not value:
+        return None
+
+    # A '+' in an unencoded query string arrives as a space
+    value = value.strip().replace(' ', '+').replace('Z', '+00:00')
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(pytz.UTC).replace(tzinfo=None)
+    return parsed
+
+
+def get_calendar_range(args):
+    """
+    Get the (start, end) window requested by the calendar
+
+    Args:
+        args: request.args (or any mapping) with optional 'start' and 'end'
+
+    Returns:
+        tuple: (start, end) naive UTC datetimes. Defaults to the month view
+               containing today when the client sends no range.
+
+    Raises:
+        ValueError: if start or end is not a valid ISO date/datetime
+    """
+    start = parse_calendar_datetime(args.get('start'))
+    end = parse_calendar_datetime(args.get('end'))
+
+    if start is None:
+        today = datetime.utcnow()
+        start = datetime(today.year, today.month, 1)
+    if end is None or end <= start:
+        end = start + timedelta(days=CALENDAR_WINDOW_DAYS)
+
+    return start, end
+
+
+def query_calendar_events(start, end):
+    """
+    Fetch the columns needed for calendar events overlapping [start, end)
+
+    Only the fields used by the event feed are selected and the service name
+    comes from the same query, so no Booking/Service objects are built.
+    Recurring series occurrences in the range are expanded and merged in.
+    """
+    from utils.archive import range_needs_archive
+    from utils.recurring import expand_series
+
+    rows = _calendar_rows(Booking, start, end)
+
+    # Archived bookings only for ranges reaching back into the archive
+    if range_needs_archive(start):
+        rows = sorted(rows + _calendar_rows(BookingArchive, start, end), key=lambda row: row.start_time)
+
+    occurrences = expand_series(start, end)
+    if not occurrences:
+        return rows
+    return sorted(rows + occurrences, key=lambda row: row.start_time)
+
+
+def _calendar_rows(model, start, end):
+    return db.session.query(
+        model.id,
+        model.user_name,
+        model.num_people,
+        model.status,
+        model.start_time,
+        model.end_time,
+        Service.name.label('service_name')
+    ).outerjoin(
+        Service, model.service_id == Service.id
+    ).filter(
+        model.start_time >= start - MAX_BOOKING_LENGTH,
+        model.start_time < end,
+        model.end_time > start
+    ).order_by(model.start_time).all()
+
+
+def _exact_or_prefix(column, value, complete):
+    """Equality for complete values, an index range scan for prefixes"""
+    if complete:
+        return column == value
+    return db.and_(column >= value, column < value + PREFIX_END)
+
+
+def search_bookings_by_contact(email=None, phone=None, include_archive=False, allow_prefix=False):
+    """
+    Find bookings by customer email and/or phone
+
+    Both inputs are normalized the same way as the stored lookup columns, so
+    a complete email or phone number is an exact index lookup. Partial input
+    ('jane@', '555') is a prefix range scan on the same index, allowed only
+    with `allow_prefix` (admin tools): the public search must not list other
+    customers' bookings. Archived bookings are searched too when
+    `include_archive` is set.
+
+    Returns:
+        list: Booking (and BookingArchive) objects with their service loaded, newest first
+
+    Raises:
+        ValueError: for partial input without allow_prefix
+    """
+    email = normalize_email(email)
+    email_complete = False
+    if email:
+        local, _, domain = email.partition('@')
+        email_complete = bool(local and '.' in domain)
+        if not email_complete and not allow_prefix:
+            raise ValueError("Enter your full email address")
+
+    phone_value, phone_complete = None, False
+    if phone:
+        phone_value = normalize_phone(phone)
+        phone_complete = phone_value is not None
+        if not phone_complete:
+            if not allow_prefix:
+                raise ValueError("Enter your full phone number")
+            phone_value = phone_search_prefix(phone)
+            if not phone_value:
+                return []
+
+    models = (Booking, BookingArchive) if include_archive else (Booking,)
+    bookings = []
+    for model in models:
+        query = model.query.outerjoin(model.service).options(contains_eager(model.service))
+
+        if email:
+            query = query.filter(_exact_or_prefix(model.email_normalized, email, email_complete))
+
+        if phone_value:
+            query = query.filter(_exact_or_prefix(model.phone_e164, phone_value, phone_complete))
+
+        bookings.extend(query.order_by(model.start_time.desc()).all())
+
+    if include_archive:
+        bookings.sort(key=lambda booking: booking.start_time, reverse=True)
+    return bookings
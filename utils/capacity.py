@@ -0,0 +1,283 @@
+"""
+Per-slot capacity ledger
+Seats are claimed and released with conditional UPDATEs on slot_capacity, so
+the capacity check and the increment happen atomically inside the same
+transaction as the Booking insert or cancel. A booking holds seats in every
+slot of the SLOT_GRID it spans (spanned_slots), not just the one it starts
+in, so a 60-minute booking at 09:00 also fills the 09:30 slot. Recurring
+series hold seats without ledger rows. Whoever claims a slot first takes its
+ledger row's write lock (lock_slots) and only then reads the seats series
+hold, so one-off bookings and new series never both count on the same free
+seats.
+"""
+
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import bindparam, update
+
+from db import db
+from db.models import SlotCapacity
+from utils.booking_utils import MAX_BOOKING_LENGTH
+
+DEFAULT_CAPACITY = 10
+NO_SERVICE = 0  # Ledger key for bookings that have no service
+
+# Slot grid of the booking pages (routes/booking.py SLOT_MINUTES; the hourly
+# slots of features/booking fall on it too)
+SLOT_GRID = timedelta(minutes=30)
+
+# Bookings in these states do not hold seats in the ledger
+SEATLESS_STATUSES = ('cancelled', 'waitlisted')
+
+
+def ledger_key(service_id, slot_start):
+    """Normalize a (service, slot start) pair to the ledger's key format"""
+    service_key = int(service_id) if service_id else NO_SERVICE
+    if slot_start.tzinfo is not None:
+        slot_start = slot_start.astimezone(pytz.UTC).replace(tzinfo=None)
+    return service_key, slot_start
+
+
+def spanned_slots(start_time, end_time=None):
+    """
+    Ledger slots a booking occupies (naive UTC): its start, then every
+    SLOT_GRID point before its end; only the start without an end
+    """
+    start_time = ledger_key(None, start_time)[1]
+    slots = [start_time]
+    if end_time is None:
+        return slots
+
+    end_time = min(ledger_key(None, end_time)[1], start_time + MAX_BOOKING_LENGTH)
+    midnight = datetime.combine(start_time.date(), datetime.min.time())
+    slot = midnight + ((start_time - midnight) // SLOT_GRID + 1) * SLOT_GRID
+    while slot < end_time:
+        slots.append(slot)
+        slot += SLOT_GRID
+    return slots
+
+
+def get_service_capacity(service):
+    """Get the per-slot people limit for a service"""
+    if service is not None and service.capacity:
+        return service.capacity
+    return DEFAULT_CAPACITY
+
+
+def _insert_missing_slots(connection, params):
+    """Create empty ledger rows for params' (key_service, key_slot), keeping existing ones"""
+    table = SlotCapacity.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        connection.execute(
+            insert(table).values(
+                service_id=bindparam('key_service'), slot_start=bindparam('key_slot'),
+                booked_people=0, booking_count=0
+            ).on_conflict_do_nothing(index_elements=['service_id', 'slot_start']),
+            params
+        )
+    else:
+        # No portable upsert: insert what is missing, ignoring a concurrent insert's race
+        for param in params:
+            filters = dict(service_id=param['key_service'], slot_start=param['key_slot'])
+            if SlotCapacity.query.filter_by(**filters).first() is None:
+                db.session.add(SlotCapacity(booked_people=0, booking_count=0, **filters))
+        db.session.flush()
+
+
+def lock_slots(service_id, slot_starts):
+    """
+    Create the ledger rows of these slots if needed and hold their write
+    locks until the caller commits (no commit)
+
+    Rows are locked in slot order, so two claims on overlapping slots cannot
+    deadlock. Reads made afterwards see every seat committed in the slots,
+    including those of series; other claims on them wait for this transaction.
+    """
+    params = sorted(
+        {ledger_key(service_id, slot_start) for slot_start in slot_starts},
+        key=lambda key: key[1]
+    )
+    if not params:
+        return
+    params = [dict(key_service=service_key, key_slot=slot_start) for service_key, slot_start in params]
+
+    connection = db.session.connection()
+    table = SlotCapacity.__table__
+    _insert_missing_slots(connection, params)
+    # A no-op UPDATE takes the row lock on every backend (SQLite locks the database)
+    connection.execute(
+        update(table)
+        .where(table.c.service_id == bindparam('key_service'), table.c.slot_start == bindparam('key_slot'))
+        .values(booked_people=table.c.booked_people),
+        params
+    )
+
+
+def get_slot_usage(service_id, slot_start):
+    """
+    Read one ledger row, plus the seats recurring series hold in the slot
+
+    Returns:
+        tuple: (booked_people, booking_count), (0, 0) if nobody booked the slot
+    """
+    service_key, slot_start = ledger_key(service_id, slot_start)
+    row = db.session.query(
+        SlotCapacity.booked_people, SlotCapacity.booking_count
+    ).filter_by(service_id=service_key, slot_start=slot_start).first()
+    series_people, series_count = get_series_slot_usage(service_key, slot_start)
+    if row is None:
+        return series_people, series_count
+    return row.booked_people + series_people, row.booking_count + series_count
+
+
+def get_series_slot_usage(service_id, slot_start):
+    """Seats recurring series hold in one slot (they are not in the ledger)"""
+    from utils.recurring import series_usage
+
+    service_key, slot_start = ledger_key(service_id, slot_start)
+    usage = series_usage(slot_start, slot_start + timedelta(microseconds=1), [service_key])
+    return usage.get((service_key, slot_start), (0, 0))
+
+
+def get_day_usage(service_id, day):
+    """
+    Read every ledger row of one service for a day in a single range query,
+    plus the day's recurring series occurrences
+
+    Returns:
+        dict: slot_start -> (booked_people, booking_count)
+    """
+    from utils.recurring import series_usage
+
+    service_key = int(service_id) if service_id else NO_SERVICE
+    day_start = datetime.combine(day, datetime.min.time())
+    rows = db.session.query(
+        SlotCapacity.slot_start, SlotCapacity.booked_people, SlotCapacity.booking_count
+    ).filter(
+        SlotCapacity.service_id == service_key,
+        SlotCapacity.slot_start >= day_start,
+        SlotCapacity.slot_start < day_start + timedelta(days=1)
+    ).all()
+    usage = {row.slot_start: (row.booked_people, row.booking_count) for row in rows}
+    for (_, slot_start), (people, count) in series_usage(day_start, day_start + timedelta(days=1), [service_key]).items():
+        booked_people, booking_count = usage.get(slot_start, (0, 0))
+        usage[slot_start] = (booked_people + people, booking_count + count)
+    return usage
+
+
+def _slots_usage(service_key, slots):
+    """Ledger usage of these slots plus the seats series hold there: slot -> (people, bookings)"""
+    from utils.recurring import series_usage
+
+    usage = {slot: (0, 0) for slot in slots}
+    for row in db.session.query(
+        SlotCapacity.slot_start, SlotCapacity.booked_people, SlotCapacity.booking_count
+    ).filter(SlotCapacity.service_id == service_key, SlotCapacity.slot_start.in_(slots)):
+        usage[row.slot_start] = (row.booked_people, row.booking_count)
+    for (_, slot_start), (people, count) in series_usage(
+        min(slots), max(slots) + timedelta(microseconds=1), [service_key]
+    ).items():
+        if slot_start in usage:
+            booked_people, booking_count = usage[slot_start]
+            usage[slot_start] = (booked_people + people, booking_count + count)
+    return usage
+
+
+def _slot_params(service_key, slots, people, bookings):
+    return [
+        dict(key_service=service_key, key_slot=slot, people=people, bookings=bookings)
+        for slot in slots
+    ]
+
+
+def reserve_seats(service_id, slot_start, num_people, capacity, end_time=None):
+    """
+    Claim seats for a new booking without committing
+
+    Seats are taken in every slot from slot_start to end_time (spanned_slots),
+    and only if each of them has room. The slots' ledger rows are locked
+    first and read afterwards, and the locks are held until the caller
+    commits, so concurrent requests cannot both take the last seats. Seats
+    held by recurring series count against the capacity; a series created
+    concurrently is either seen here or sees this booking (create_series
+    locks too).
+
+    Returns:
+        tuple: (granted, booked_people, booking_count) of the fullest slot
+               after the claim, series included
+    """
+    service_key = ledger_key(service_id, slot_start)[0]
+    slots = spanned_slots(slot_start, end_time)
+    lock_slots(service_key, slots)
+    usage = _slots_usage(service_key, slots)
+
+    granted = all(people + num_people <= capacity for people, _ in usage.values())
+    if granted:
+        _add_usage(db.session.connection(), _slot_params(service_key, slots, num_people, 1))
+        usage = {slot: (people + num_people, count + 1) for slot, (people, count) in usage.items()}
+    booked_people, booking_count = max(usage.values())
+    return granted, booked_people, booking_count
+
+
+def release_seats(booking):
+    """Give back a booking's seats in every slot it spans, without committing (call before changing its status)"""
+    if booking.status in SEATLESS_STATUSES:
+        return
+
+    service_key = ledger_key(booking.service_id, booking.start_time)[0]
+    table = SlotCapacity.__table__
+    db.session.connection().execute(
+        update(table)
+        .where(
+            table.c.service_id == bindparam('key_service'),
+            table.c.slot_start == bindparam('key_slot'),
+            table.c.booked_people >= bindparam('people')
+        )
+        .values(
+            booked_people=table.c.booked_people - bindparam('people'),
+            booking_count=table.c.booking_count - bindparam('bookings')
+        ),
+        _slot_params(service_key, spanned_slots(booking.start_time, booking.end_time), booking.num_people, 1)
+    )
+
+
+def _add_usage(connection, params):
+    """Add params' people and bookings to their (existing) ledger rows"""
+    table = SlotCapacity.__table__
+    connection.execute(
+        update(table)
+        .where(table.c.service_id == bindparam('key_service'), table.c.slot_start == bindparam('key_slot'))
+        .values(
+            booked_people=table.c.booked_people + bindparam('people'),
+            booking_count=table.c.booking_count + bindparam('bookings')
+        ),
+        params
+    )
+
+
+def add_slot_usage(usage):
+    """
+    Add already-decided bookings to the ledger without a capacity check
+    (bulk imports of historical bookings; no commit)
+
+    Uses one executemany for the missing rows and one for the increments.
+
+    Args:
+        usage: dict of (service_id, slot_start) -> (people, bookings)
+    """
+    if not usage:
+        return
+
+    params = []
+    for (service_id, slot_start), (people, bookings) in usage.items():
+        service_key, slot_start = ledger_key(service_id, slot_start)
+        params.append(dict(key_service=service_key, key_slot=slot_start, people=people, bookings=bookings))
+
+    connection = db.session.connection()
+    _insert_missing_slots(connection, params)
+    _add_usage(connection, params)
@@ -0,0 +1,69 @@
+"""
+Contact normalization
+Bookings store a lowercase email and an E.164 phone next to what the customer
+typed, so lookups and SMS sends compare one canonical form
+"""
+
+import re
+
+NON_DIGITS = re.compile(r'\D')
+
+# Upper bound for prefix range scans: any string starting with the prefix
+# sorts below prefix + PREFIX_END
+PREFIX_END = '\uffff'
+
+
+def normalize_email(value):
+    """Lowercase, trimmed email, or None if empty"""
+    if not value:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+def normalize_phone(value):
+    """
+    Convert a phone number to E.164 ('+15551234567')
+
+    Numbers already starting with '+' keep their country code; bare 10-digit
+    numbers are treated as US numbers.
+
+    Returns:
+        str or None: the E.164 number, or None if it cannot be normalized
+    """
+    if not value:
+        return None
+
+    value = str(value).strip()
+    if value.startswith('+') and value[1:].isdigit() and 8 <= len(value) - 1 <= 15:
+        return value  # Already E.164
+
+    digits = NON_DIGITS.sub('', value)
+    if value.startswith('+'):
+        return '+' + digits if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return '+1' + digits
+    if len(digits) == 11 and digits.startswith('1'):
+        return '+' + digits
+    return None
+
+
+def phone_search_prefix(value):
+    """
+    Normalize a partial phone number typed into the admin booking search
+
+    Full numbers are normalized like stored ones; partial input becomes a
+    prefix of the stored E.164 form ('555' -> '+1555').
+    """
+    full = normalize_phone(value)
+    if full:
+        return full
+
+    value = str(value or '').strip()
+    digits = NON_DIGITS.sub('', value)
+    if not digits:
+        return None
+    # US area codes never start with 1, so a leading 1 is the country code
+    if value.startswith('+') or digits.startswith('1'):
+        return '+' + digits
+    return '+1' + digits if len(digits) <= 10 else None
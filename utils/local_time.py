@@ -0,0 +1,21 @@
+"""
+Business time zone
+Booking times are stored as naive UTC; what customers see, and the day a
+booking is filed under (Booking.start_date), use the studio's local time.
+"""
+
+import pytz
+
+LOCAL_TZ = pytz.timezone("America/New_York")  # change to your timezone
+
+
+def to_local(value):
+    """A naive UTC (or aware) datetime in LOCAL_TZ"""
+    if value.tzinfo is None:
+        value = pytz.UTC.localize(value)
+    return value.astimezone(LOCAL_TZ)
+
+
+def local_date(value):
+    """Local calendar day of a naive UTC (or aware) datetime"""
+    return to_local(value).date()
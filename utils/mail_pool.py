@@ -0,0 +1,198 @@
+"""
+Pooled SMTP transport for Flask-Mail
+Keeps a few authenticated SMTP sessions open and hands them out to
+mail.send()/mail.connect(), so each email skips the TCP connect, STARTTLS
+handshake and AUTH that a fresh Flask-Mail connection does
+"""
+
+import atexit
+import smtplib
+import threading
+import time
+
+from flask_mail import Connection, Mail
+
+DEFAULT_POOL_SIZE = 3
+DEFAULT_IDLE_SECONDS = 45      # Most servers drop idle sessions after about a minute
+DEFAULT_MAX_MESSAGES = 100     # Recycle a session after this many messages
+DEFAULT_TIMEOUT = 10
+
+
+def _is_dropped_connection(error):
+    """True for errors meaning the server closed the session, not that it rejected the message"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError)):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+
+
+class PooledConnection(Connection):
+    """
+    Flask-Mail connection whose SMTP session outlives a `with` block
+
+    Leaving the block returns it to the pool instead of sending QUIT. If the
+    server has dropped the session, send() reconnects once and resends.
+    """
+
+    def __init__(self, pool, state):
+        super().__init__(state)
+        self.pool = pool
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    def configure_host(self):
+        # Same as Flask-Mail's, plus a socket timeout
+        if self.mail.use_ssl:
+            host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=self.pool.timeout)
+        else:
+            host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=self.pool.timeout)
+
+        host.set_debuglevel(int(self.mail.debug))
+
+        if self.mail.use_tls:
+            host.starttls()
+
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+
+        return host
+
+    def open(self):
+        self.host = None if self.mail.suppress else self.configure_host()
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+        return self
+
+    def close(self):
+        if self.host is None:
+            return
+        try:
+            self.host.quit()
+        except Exception:
+            self.host.close()
+        self.host = None
+
+    def is_stale(self):
+        idle = time.monotonic() - self.last_used
+        return idle > self.pool.idle_seconds or \
+            (self.pool.max_messages and self.messages_sent >= self.pool.max_messages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.pool.release(self, broken=exc_value is not None and _is_dropped_connection(exc_value))
+
+    def send(self, message, envelope_from=None):
+        try:
+            super().send(message, envelope_from)
+        except Exception as e:
+            if not _is_dropped_connection(e):
+                raise
+            # The server closed the session (idle timeout, restart); the
+            # message was not accepted, so reconnect and send it again
+            self.close()
+            self.open()
+            self.pool.count("reconnected")
+            super().send(message, envelope_from)
+
+        self.messages_sent += 1
+        self.last_used = time.monotonic()
+        self.pool.count("sent")
+
+
+class SMTPConnectionPool:
+    """At most `size` open SMTP sessions, reused most-recently-used first"""
+
+    def __init__(self, state, size=DEFAULT_POOL_SIZE, idle_seconds=DEFAULT_IDLE_SECONDS,
+                 max_messages=DEFAULT_MAX_MESSAGES, timeout=DEFAULT_TIMEOUT):
+        self.state = state
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+        self._stats = {"opened": 0, "reused": 0, "reconnected": 0, "recycled": 0, "sent": 0}
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        stats["size"] = self.size
+        return stats
+
+    def acquire(self):
+        """Get an open connection, waiting up to `timeout` seconds if all are in use"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise smtplib.SMTPException(f"No SMTP connection free after {self.timeout}s")
+
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+
+                if connection is None:
+                    connection = PooledConnection(self, self.state).open()
+                    self.count("opened")
+                    return connection
+
+                if connection.is_stale():
+                    connection.close()
+                    self.count("recycled")
+                    continue
+
+                self.count("reused")
+                return connection
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        """Return a connection to the pool (closing it if broken or the pool is closed)"""
+        try:
+            if broken or self._closed or (connection.host is None and not self.state.suppress):
+                connection.close()
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Send QUIT on every idle connection"""
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class PooledMail(Mail):
+    """
+    Flask-Mail extension that sends over pooled connections
+
+    Drop-in for Mail: send() and connect() keep working, but connect()
+    hands out a pooled connection and leaving its `with` block returns it.
+    """
+
+    def init_app(self, app):
+        state = super().init_app(app)
+        self.pool = SMTPConnectionPool(
+            state,
+            size=int(app.config.get('MAIL_POOL_SIZE', DEFAULT_POOL_SIZE)),
+            idle_seconds=float(app.config.get('MAIL_POOL_IDLE_SECONDS', DEFAULT_IDLE_SECONDS)),
+            max_messages=int(app.config.get('MAIL_POOL_MAX_MESSAGES', DEFAULT_MAX_MESSAGES)),
+            timeout=float(app.config.get('MAIL_TIMEOUT', DEFAULT_TIMEOUT))
+        )
+        atexit.register(self.pool.close)
+        return state
+
+    def connect(self):
+        return self.pool.acquire()
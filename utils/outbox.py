@@ -0,0 +1,442 @@
+"""
+Notification outbox
+Booking emails and SMS are written to notification_outbox in the same
+transaction as the booking change, then sent by a fixed-size pool of worker
+threads. Rows stay in the table until they are sent, so messages queued when
+the process stops are picked up again on the next start.
+"""
+
+import atexit
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+
+from db import db
+from db.models import NotificationOutbox
+from utils.contact import normalize_phone
+
+DEFAULT_WORKERS = 2
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_ATTEMPTS = 5
+POLL_INTERVAL = 5  # Seconds between outbox checks when no commit wakes the pool
+
+# A claimed row that is not reported back within the lease (crashed process)
+# becomes due again
+LEASE = timedelta(minutes=5)
+
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+# Pool running in this process, woken after commits that queued messages
+_pool = None
+
+
+def mail_configured(app=None):
+    """Check whether SMTP credentials are set"""
+    app = app or current_app
+    return bool(app.config.get("MAIL_USERNAME") and app.config.get("MAIL_PASSWORD"))
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts"""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def _queue_message(channel, kind, recipient, body, subject=None, sender=None, booking_id=None):
+    message = NotificationOutbox(
+        channel=channel,
+        kind=kind,
+        booking_id=booking_id,
+        recipient=recipient,
+        sender=sender,
+        subject=subject,
+        body=body,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(message)
+    db.session.info['outbox_pending'] = True
+    return message
+
+
+def queue_email(kind, recipients, subject, body, sender=None, booking_id=None):
+    """
+    Add an email to the outbox without committing
+
+    The caller's commit makes the message durable together with the booking
+    change it belongs to.
+
+    Returns:
+        NotificationOutbox or None: the queued row, or None if mail is not configured
+    """
+    if not mail_configured():
+        print(f"📧 Email credentials not configured, {kind} email not queued")
+        return None
+
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    return _queue_message(
+        'email', kind, ','.join(recipients), body,
+        subject=subject,
+        sender=sender or current_app.config.get('MAIL_DEFAULT_SENDER'),
+        booking_id=booking_id
+    )
+
+
+def queue_sms(kind, to_number, body, booking_id=None):
+    """
+    Add an SMS to the outbox without committing
+
+    Returns:
+        NotificationOutbox or None: the queued row, or None if the number is
+        invalid or SMS is not configured
+    """
+    from routes.send_sms import get_sms_status
+
+    phone = normalize_phone(to_number)
+    if not phone:
+        print(f"📱 Invalid phone number {to_number}, {kind} SMS not queued")
+        return None
+    if not get_sms_status()['client_configured']:
+        print(f"📱 Twilio client not configured, {kind} SMS not queued")
+        return None
+    return _queue_message('sms', kind, phone, body, booking_id=booking_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_pool_after_commit(session):
+    if session.info.pop('outbox_pending', False) and _pool is not None:
+        _pool.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_messages(session):
+    session.info.pop('outbox_pending', None)
+
+
+class OutboxWorkerPool:
+    """
+    Fixed-size pool draining the notification outbox
+
+    A dispatcher thread claims due rows in batches (an UPDATE stamps them with
+    a claim token, so concurrent processes never send the same row) and hands
+    each batch to a bounded queue. Worker threads send a batch's emails over
+    one SMTP connection, then record every result in one commit. Failures are
+    retried with exponential backoff until max_attempts.
+    """
+
+    def __init__(self, app, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, poll_interval=POLL_INTERVAL):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self._batches = queue.Queue(maxsize=workers)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._counters = {
+            "claimed": 0,
+            "sent": 0,
+            "retried": 0,
+            "failed": 0,
+            "released": 0,
+            "batches": 0
+        }
+        self._last_error = None
+        self._last_batch_seconds = None
+
+    def start(self):
+        """Start the dispatcher and worker threads"""
+        if self._threads:
+            return self
+
+        self._stopping.clear()
+        self._threads.append(threading.Thread(target=self._dispatch_loop, name="outbox-dispatcher", daemon=True))
+        for number in range(self.workers):
+            self._threads.append(threading.Thread(target=self._work_loop, name=f"outbox-worker-{number}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        """
+        Stop claiming, let workers finish the batch they are sending, and put
+        batches that were claimed but not started back to pending
+        """
+        if not self._threads:
+            return
+
+        self._stopping.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self._threads = []
+
+        while True:
+            try:
+                batch = self._batches.get_nowait()
+            except queue.Empty:
+                break
+            self._release(batch)
+        print(f"📬 Notification outbox stopped ({self._counters['released']} messages released)")
+
+    def wake(self):
+        """Check the outbox now instead of waiting for the next poll"""
+        self._wake.set()
+
+    def metrics(self):
+        """Counters since start plus current queue depth"""
+        with self._lock:
+            counters = dict(self._counters)
+        counters.update({
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "running": bool(self._threads) and not self._stopping.is_set(),
+            "queued_batches": self._batches.qsize(),
+            "last_batch_seconds": self._last_batch_seconds,
+            "last_error": self._last_error
+        })
+        return counters
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _dispatch_loop(self):
+        while not self._stopping.is_set():
+            # Clear before claiming so a commit during the claim is not missed
+            self._wake.clear()
+            try:
+                batch = self._claim_batch()
+            except Exception as e:
+                print(f"❌ Outbox claim failed: {e}")
+                self._last_error = str(e)
+                batch = None
+
+            if batch:
+                if not self._hand_off(batch):
+                    self._release(batch)
+                continue
+            self._wake.wait(self.poll_interval)
+
+    def _hand_off(self, batch):
+        while not self._stopping.is_set():
+            try:
+                self._batches.put(batch, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _claim_batch(self):
+        with self.app.app_context():
+            now = datetime.utcnow()
+            due = (
+                NotificationOutbox.status.in_(('pending', 'sending')),
+                NotificationOutbox.next_attempt_at <= now
+            )
+            ids = [row.id for row in db.session.query(NotificationOutbox.id).filter(*due)
+                   .order_by(NotificationOutbox.next_attempt_at).limit(self.batch_size)]
+            if not ids:
+                return None
+
+            token = uuid.uuid4().hex
+            db.session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(ids), *due)
+                .values(status='sending', claim_token=token, next_attempt_at=now + LEASE)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+            messages = [
+                {
+                    "id": row.id,
+                    "channel": row.channel,
+                    "kind": row.kind,
+                    "recipient": row.recipient,
+                    "sender": row.sender,
+                    "subject": row.subject,
+                    "body": row.body,
+                    "attempts": row.attempts
+                }
+                for row in NotificationOutbox.query.filter_by(claim_token=token)
+            ]
+            if not messages:
+                return None
+
+        self._count("claimed", len(messages))
+        return {"token": token, "messages": messages}
+
+    def _work_loop(self):
+        while not self._stopping.is_set():
+            try:
+                batch = self._batches.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                print(f"❌ Outbox batch failed: {e}")
+                self._last_error = str(e)
+                self._release(batch)
+
+    def _send_batch(self, batch):
+        started = time.monotonic()
+        messages = batch["messages"]
+
+        with self.app.app_context():
+            results = {}  # message id -> error text, None when sent
+            emails = [message for message in messages if message["channel"] == 'email']
+            if emails:
+                results.update(self._send_emails(emails))
+            for message in messages:
+                if message["channel"] == 'sms':
+                    results[message["id"]] = self._send_sms(message)
+
+            self._record_results(batch, results)
+
+        self._count("batches")
+        self._last_batch_seconds = round(time.monotonic() - started, 3)
+
+    def _send_emails(self, messages):
+        """Send every email of a batch over one (pooled) SMTP connection"""
+        results = {}
+        try:
+            with self.app.mail.connect() as connection:
+                for message in messages:
+                    try:
+                        connection.send(Message(
+                            subject=message["subject"],
+                            recipients=message["recipient"].split(','),
+                            sender=message["sender"],
+                            body=message["body"]
+                        ))
+                        results[message["id"]] = None
+                    except Exception as e:
+                        results[message["id"]] = f"{type(e).__name__}: {e}"
+        except Exception as e:
+            # Connect/login failed, or the session could not be re-established
+            for message in messages:
+                results.setdefault(message["id"], f"{type(e).__name__}: {e}")
+        return results
+
+    def _send_sms(self, message):
+        from routes.send_sms import send_sms_reminder
+
+        try:
+            return None if send_sms_reminder(message["recipient"], message["body"]) else "SMS not sent"
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    def _record_results(self, batch, results):
+        now = datetime.utcnow()
+        token = batch["token"]
+        claimed = (NotificationOutbox.claim_token == token,)
+
+        sent_ids = [message_id for message_id, error in results.items() if error is None]
+        if sent_ids:
+            db.session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(sent_ids), *claimed)
+                .values(status='sent', sent_at=now, claim_token=None, last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+
+        retried = failed = 0
+        for message in batch["messages"]:
+            error = results.get(message["id"], "not sent")
+            if error is None:
+                continue
+
+            attempts = message["attempts"] + 1
+            values = dict(attempts=attempts, claim_token=None, last_error=error[:255])
+            if attempts >= self.max_attempts:
+                values["status"] = 'failed'
+                failed += 1
+            else:
+                values.update(status='pending', next_attempt_at=now + retry_delay(attempts))
+                retried += 1
+            db.session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id == message["id"], *claimed)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            self._last_error = error
+            print(f"❌ {message['channel']} {message['kind']} to {message['recipient']} failed "
+                  f"(attempt {attempts}/{self.max_attempts}): {error}")
+
+        db.session.commit()
+        self._count("sent", len(sent_ids))
+        self._count("retried", retried)
+        self._count("failed", failed)
+
+    def _release(self, batch):
+        """Put claimed, unsent messages back to pending"""
+        try:
+            with self.app.app_context():
+                result = db.session.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.claim_token == batch["token"],
+                           NotificationOutbox.status == 'sending')
+                    .values(status='pending', claim_token=None, next_attempt_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+            self._count("released", result.rowcount)
+        except Exception as e:
+            print(f"❌ Failed to release outbox batch (lease will expire): {e}")
+
+
+def get_outbox_status():
+    """Message counts per status and pool metrics, for the status endpoint"""
+    counts = dict(
+        db.session.query(NotificationOutbox.status, func.count(NotificationOutbox.id))
+        .group_by(NotificationOutbox.status).all()
+    )
+    oldest_due = db.session.query(func.min(NotificationOutbox.next_attempt_at)).filter(
+        NotificationOutbox.status == 'pending'
+    ).scalar()
+    return {
+        "messages": counts,
+        "oldest_pending_since": oldest_due.isoformat() if oldest_due else None,
+        "pool": _pool.metrics() if _pool is not None else None
+    }
+
+
+def init_outbox(app):
+    """Start the outbox worker pool for this process"""
+    global _pool
+
+    workers = int(app.config.get('NOTIFICATION_WORKERS', DEFAULT_WORKERS))
+    if workers < 1:
+        print("📬 Notification outbox workers disabled (NOTIFICATION_WORKERS = 0)")
+        return None
+    if _pool is not None:
+        return _pool
+
+    _pool = OutboxWorkerPool(
+        app,
+        workers=workers,
+        batch_size=int(app.config.get('NOTIFICATION_BATCH_SIZE', DEFAULT_BATCH_SIZE)),
+        max_attempts=int(app.config.get('NOTIFICATION_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+    ).start()
+    atexit.register(_pool.stop)
+    app.extensions['notification_outbox'] = _pool
+
+    print(f"📬 Notification outbox started with {workers} workers")
+    return _pool
@@ -0,0 +1,299 @@
+"""
+Recurring booking series
+A series stores its rule once (first start, duration, every N days or
+weeks, optional count/until) and its occurrences are expanded only for the
+window being queried. The only rows stored per occurrence are exceptions:
+occurrences that were cancelled, or waitlisted because the slot was full.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import or_
+
+from db import db
+from db.models import BookingSeries, BookingSeriesException, Service, SlotCapacity
+from utils.capacity import ledger_key, get_service_capacity, lock_slots, spanned_slots, NO_SERVICE, SEATLESS_STATUSES
+from utils.booking_utils import MAX_BOOKING_LENGTH, booking_length_error
+from utils.local_time import LOCAL_TZ
+
+FREQUENCIES = {'daily': 1, 'weekly': 7}  # Days per step
+MAX_OCCURRENCES = 520
+DEFAULT_TIMEZONE = LOCAL_TZ.zone
+
+# Series without a count are capacity-checked this far ahead when created; later
+# one-off bookings always see the series' seats
+CAPACITY_HORIZON = timedelta(weeks=26)
+
+
+class Occurrence(namedtuple('Occurrence', [
+    'series_id', 'start_time', 'end_time', 'status', 'service_id', 'service_name',
+    'num_people', 'user_name', 'email', 'phone_number', 'phone_e164'
+])):
+    """One expanded occurrence; has the attributes the calendar feeds read from booking rows"""
+    __slots__ = ()
+
+    @property
+    def id(self):
+        return f"series-{self.series_id}-{self.start_time:%Y%m%d%H%M}"
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(pytz.UTC).replace(tzinfo=None)
+    return value
+
+
+def occurrence_starts(series, window_start, window_end):
+    """
+    Yield the rule's occurrence starts (naive UTC) for occurrences
+    overlapping [window_start, window_end)
+
+    Steps are taken in the series' local time, so a weekly 6 PM session
+    stays at 6 PM across daylight saving changes. Jumps straight to the
+    window instead of walking from the first occurrence.
+    """
+    tz = pytz.timezone(series.timezone or DEFAULT_TIMEZONE)
+    first_local = pytz.UTC.localize(series.start_time).astimezone(tz).replace(tzinfo=None)
+    step = timedelta(days=FREQUENCIES[series.frequency] * series.interval)
+    duration = timedelta(minutes=series.duration_minutes)
+
+    index = 0
+    if window_start > series.start_time:
+        # A day of slack covers the UTC offset changing between the two dates
+        index = max(0, (window_start - duration - series.start_time - timedelta(days=1)) // step)
+
+    while series.count is None or index < series.count:
+        start = tz.normalize(tz.localize(first_local + index * step)).astimezone(pytz.UTC).replace(tzinfo=None)
+        if start >= window_end or (series.until is not None and start > series.until):
+            return
+        if start + duration > window_start:
+            yield start
+        index += 1
+
+
+def _service_filter(column, service_keys):
+    """Match ledger service keys, where NO_SERVICE stands for NULL"""
+    ids = [key for key in service_keys if key != NO_SERVICE]
+    clauses = [column.in_(ids)] if ids else []
+    if NO_SERVICE in service_keys:
+        clauses.append(column.is_(None))
+    return or_(*clauses) if clauses else column.in_([])
+
+
+def expand_series(window_start, window_end, service_ids=None, series_ids=None, include_cancelled=False):
+    """
+    Occurrences of every live series overlapping [window_start, window_end)
+
+    One query for the series (with service names) and one for their
+    exceptions in the window, however many occurrences come out.
+
+    Args:
+        service_ids: only these services (ledger keys: 0 = no service)
+        series_ids: only these series
+        include_cancelled: also yield cancelled occurrences
+
+    Returns:
+        list: Occurrence tuples sorted by start_time
+    """
+    query = db.session.query(BookingSeries, Service.name).outerjoin(
+        Service, BookingSeries.service_id == Service.id
+    ).filter(
+        BookingSeries.status != 'cancelled',
+        BookingSeries.start_time < window_end,
+        or_(BookingSeries.until.is_(None), BookingSeries.until > window_start - MAX_BOOKING_LENGTH)
+    )
+    if service_ids is not None:
+        query = query.filter(_service_filter(BookingSeries.service_id, service_ids))
+    if series_ids is not None:
+        query = query.filter(BookingSeries.id.in_(series_ids))
+
+    rows = query.all()
+    if not rows:
+        return []
+
+    exceptions = {
+        (row.series_id, row.occurrence_start): row.status
+        for row in db.session.query(
+            BookingSeriesException.series_id, BookingSeriesException.occurrence_start, BookingSeriesException.status
+        ).filter(
+            BookingSeriesException.series_id.in_([series.id for series, _ in rows]),
+            BookingSeriesException.occurrence_start >= window_start - MAX_BOOKING_LENGTH,
+            BookingSeriesException.occurrence_start < window_end
+        )
+    }
+
+    occurrences = []
+    for series, service_name in rows:
+        duration = timedelta(minutes=series.duration_minutes)
+        for start in occurrence_starts(series, window_start, window_end):
+            status = exceptions.get((series.id, start), series.status)
+            if status == 'cancelled' and not include_cancelled:
+                continue
+            occurrences.append(Occurrence(
+                series.id, start, start + duration, status, series.service_id, service_name,
+                series.num_people, series.user_name, series.email, series.phone_number, series.phone_e164
+            ))
+    occurrences.sort(key=lambda occurrence: occurrence.start_time)
+    return occurrences
+
+
+def series_usage(window_start, window_end, service_ids=None, exclude_series_id=None):
+    """
+    Seats held by series occurrences in the slots of [window_start, window_end),
+    in the capacity ledger's key format; like a booking, an occurrence holds
+    every slot it spans
+
+    Returns:
+        dict: (service_key, slot_start) -> (people, bookings)
+    """
+    usage = {}
+    for occurrence in expand_series(window_start, window_end, service_ids=service_ids):
+        if occurrence.status in SEATLESS_STATUSES or occurrence.series_id == exclude_series_id:
+            continue
+        for slot_start in spanned_slots(occurrence.start_time, occurrence.end_time):
+            if not window_start <= slot_start < window_end:
+                continue
+            key = ledger_key(occurrence.service_id, slot_start)
+            people, bookings = usage.get(key, (0, 0))
+            usage[key] = (people + occurrence.num_people, bookings + 1)
+    return usage
+
+
+def occurrence_slots(series, starts):
+    """Ledger slots each occurrence spans: start -> [slot_start, ...]"""
+    duration = timedelta(minutes=series.duration_minutes)
+    return {start: spanned_slots(start, start + duration) for start in starts}
+
+
+def full_occurrences(series, starts, capacity):
+    """
+    Which of a series' occurrence starts have no room for it in one of the
+    slots they span
+
+    One ledger range query and one series expansion cover every
+    occurrence, instead of a capacity check per date.
+    """
+    if not starts:
+        return []
+
+    service_key = ledger_key(series.service_id, starts[0])[0]
+    slots = occurrence_slots(series, starts)
+    first, last = starts[0], slots[starts[-1]][-1] + timedelta(microseconds=1)
+
+    booked = {
+        row.slot_start: row.booked_people
+        for row in db.session.query(SlotCapacity.slot_start, SlotCapacity.booked_people).filter(
+            SlotCapacity.service_id == service_key,
+            SlotCapacity.slot_start >= first,
+            SlotCapacity.slot_start < last
+        )
+    }
+    other_series = series_usage(first, last, [service_key], exclude_series_id=series.id)
+
+    def used(slot):
+        return booked.get(slot, 0) + other_series.get((service_key, slot), (0, 0))[0]
+
+    return [
+        start for start in starts
+        if any(used(slot) + series.num_people > capacity for slot in slots[start])
+    ]
+
+
+def create_series(user_name, email, phone_number, service, start_time, end_time, num_people=1,
+                  frequency='weekly', interval=1, count=None, until=None, status='confirmed',
+                  timezone=DEFAULT_TIMEZONE):
+    """
+    Add a series and check its capacity in one batched pass (flushes, does not commit)
+
+    Occurrences whose slot is already full are stored as 'waitlisted'
+    exceptions, the same way a single booking for a full slot is waitlisted.
+    The checked slots' ledger rows stay locked until the caller commits, and
+    are read only after locking, as reserve_seats does, so concurrent
+    bookings cannot take the same seats.
+
+    Returns:
+        tuple: (series, list of waitlisted occurrence starts, number of occurrences checked)
+
+    Raises:
+        ValueError: if the rule is invalid
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency: {frequency}")
+    if int(interval) < 1:
+        raise ValueError("interval must be at least 1")
+    if count is not None and not 1 <= int(count) <= MAX_OCCURRENCES:
+        raise ValueError(f"count must be between 1 and {MAX_OCCURRENCES}")
+    length_error = booking_length_error(start_time, end_time)
+    if length_error:
+        raise ValueError(length_error)
+    pytz.timezone(timezone)  # Raises UnknownTimeZoneError (a KeyError) for bad names
+    start_time, end_time, until = _naive_utc(start_time), _naive_utc(end_time), _naive_utc(until)
+
+    series = BookingSeries(
+        user_name=user_name,
+        email=email,
+        phone_number=phone_number,
+        service_id=service.id if service else None,
+        num_people=num_people,
+        start_time=start_time,
+        duration_minutes=int((end_time - start_time).total_seconds() // 60),
+        frequency=frequency,
+        interval=int(interval),
+        count=int(count) if count is not None else None,
+        until=until,
+        timezone=timezone,
+        status=status
+    )
+    db.session.add(series)
+    db.session.flush()
+
+    # A counted series (at most MAX_OCCURRENCES) is checked in full, others up to the horizon
+    if count is not None:
+        check_until = datetime.max
+    else:
+        check_until = max(start_time, datetime.utcnow()) + CAPACITY_HORIZON
+    starts = list(occurrence_starts(series, start_time, check_until))
+
+    lock_slots(series.service_id, [slot for slots in occurrence_slots(series, starts).values() for slot in slots])
+    waitlisted = full_occurrences(series, starts, get_service_capacity(service))
+    db.session.add_all(
+        BookingSeriesException(series_id=series.id, occurrence_start=start, status='waitlisted')
+        for start in waitlisted
+    )
+    db.session.flush()
+    return series, waitlisted, len(starts)
+
+
+def cancel_occurrence(series, occurrence_start):
+    """
+    Cancel one occurrence by storing a 'cancelled' exception (no commit)
+
+    Returns:
+        bool: False if the rule has no occurrence at that start or it is already cancelled
+    """
+    if occurrence_start not in occurrence_starts(series, occurrence_start, occurrence_start + timedelta(microseconds=1)):
+        return False
+
+    exception = BookingSeriesException.query.filter_by(series_id=series.id, occurrence_start=occurrence_start).first()
+    if exception is None:
+        db.session.add(BookingSeriesException(series_id=series.id, occurrence_start=occurrence_start, status='cancelled'))
+    elif exception.status == 'cancelled':
+        return False
+    else:
+        exception.status = 'cancelled'
+    db.session.flush()
+    return True
+
+
+def end_series(series, now=None):
+    """
+    Stop a series from now on (no commit): past occurrences stay in the
+    history, a series that has not started yet is cancelled outright
+    """
+    now = now or datetime.utcnow()
+    if series.start_time >= now:
+        series.status = 'cancelled'
+    else:
+        series.until = now if series.until is None else min(series.until, now)
+    db.session.flush()
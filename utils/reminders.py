@@ -0,0 +1,437 @@
+"""
+Event-driven SMS reminders
+Each booking gets one booking_reminders row per offset (e.g. 24h and 30m
+before its start) when it is created; cancelling marks them cancelled. The
+rows are the durable schedule. In memory, a heap keyed on fire time and one
+timer thread fire each reminder on time, without polling the booking table.
+
+Recurring series occurrences are not stored, so their reminder rows are
+created when the occurrence comes within the scheduler's horizon.
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+
+from db import db
+from db.models import Booking, BookingReminder, BookingSeries
+from utils.recurring import expand_series
+
+DEFAULT_OFFSETS = (1440, 30)  # Minutes before the booking starts
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+# Reminders due less than GRACE ago (downtime, restart) are still sent;
+# older ones are marked missed
+GRACE = timedelta(minutes=15)
+
+# The heap holds reminders firing within HORIZON; it is topped up from the
+# (status, fire_at) index every REFRESH_SECONDS, which also picks up
+# reminders scheduled by other processes
+HORIZON = timedelta(hours=6)
+REFRESH_SECONDS = 300
+
+RETRY_DELAY = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+
+# Scheduler running in this process, told about reminders after commit
+_scheduler = None
+
+
+def get_reminder_offsets(app=None):
+    """Configured reminder offsets in minutes, largest first"""
+    app = app or current_app
+    offsets = app.config.get('REMINDER_OFFSETS_MINUTES') or DEFAULT_OFFSETS
+    return sorted({int(offset) for offset in offsets}, reverse=True)
+
+
+def schedule_booking_reminders(booking):
+    """
+    Add a reminder row per offset for a booking (flushes, does not commit)
+
+    Only active bookings with a phone number get reminders, and offsets
+    whose fire time has already passed are skipped.
+    """
+    if booking.status not in ACTIVE_STATUSES or not (booking.phone_e164 or booking.phone_number):
+        return []
+
+    now = datetime.utcnow()
+    start_time = booking.start_time.replace(tzinfo=None)
+    reminders = []
+    for offset in get_reminder_offsets():
+        fire_at = start_time - timedelta(minutes=offset)
+        if fire_at > now:
+            reminders.append(BookingReminder(
+                booking_id=booking.id, offset_minutes=offset, fire_at=fire_at, status='scheduled'
+            ))
+
+    if reminders:
+        db.session.add_all(reminders)
+        db.session.flush()
+        db.session.info.setdefault('reminders_scheduled', []).extend(
+            (reminder.fire_at, reminder.id) for reminder in reminders
+        )
+    return reminders
+
+
+def cancel_booking_reminders(booking):
+    """Cancel a booking's pending reminders (no commit)"""
+    db.session.execute(
+        update(BookingReminder)
+        .where(BookingReminder.booking_id == booking.id, BookingReminder.status == 'scheduled')
+        .values(status='cancelled')
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _insert_reminder_rows(rows):
+    """Insert series reminder rows, skipping ones another process already created"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.session.execute(
+            insert(BookingReminder).on_conflict_do_nothing(
+                index_elements=['series_id', 'occurrence_start', 'offset_minutes']
+            ),
+            rows
+        )
+        return
+
+    for row in rows:
+        exists = db.session.query(BookingReminder.id).filter_by(
+            series_id=row['series_id'], occurrence_start=row['occurrence_start'],
+            offset_minutes=row['offset_minutes']
+        ).first()
+        if exists is None:
+            db.session.add(BookingReminder(**row))
+    db.session.flush()
+
+
+def schedule_series_reminders(window_start, window_end, series_ids=None):
+    """
+    Create reminder rows for series occurrences whose reminders fire in
+    (window_start, window_end) (no commit)
+
+    Returns:
+        list: (fire_at, reminder_id) of the scheduled series reminders in the window
+    """
+    offsets = get_reminder_offsets()
+    rows = []
+    for occurrence in expand_series(window_start, window_end + timedelta(minutes=max(offsets)), series_ids=series_ids):
+        if occurrence.status not in ACTIVE_STATUSES or not (occurrence.phone_e164 or occurrence.phone_number):
+            continue
+        for offset in offsets:
+            fire_at = occurrence.start_time - timedelta(minutes=offset)
+            if window_start < fire_at < window_end:
+                rows.append(dict(
+                    series_id=occurrence.series_id, occurrence_start=occurrence.start_time,
+                    offset_minutes=offset, fire_at=fire_at, status='scheduled', attempts=0
+                ))
+
+    if not rows:
+        return []
+    _insert_reminder_rows(rows)
+
+    query = db.session.query(BookingReminder.fire_at, BookingReminder.id).filter(
+        BookingReminder.series_id.isnot(None),
+        BookingReminder.status == 'scheduled',
+        BookingReminder.fire_at > window_start,
+        BookingReminder.fire_at < window_end
+    )
+    if series_ids is not None:
+        query = query.filter(BookingReminder.series_id.in_(series_ids))
+    return [(row.fire_at, row.id) for row in query]
+
+
+def schedule_new_series_reminders(series):
+    """Create the reminders a new series needs before the scheduler's next refresh (no commit)"""
+    now = datetime.utcnow()
+    jobs = schedule_series_reminders(now, now + HORIZON, series_ids=[series.id])
+    db.session.info.setdefault('reminders_scheduled', []).extend(jobs)
+    return jobs
+
+
+def cancel_series_reminders(series, occurrence_start=None, after=None):
+    """Cancel a series' pending reminders: one occurrence's, or every occurrence after `after` (no commit)"""
+    query = update(BookingReminder).where(
+        BookingReminder.series_id == series.id, BookingReminder.status == 'scheduled'
+    )
+    if occurrence_start is not None:
+        query = query.where(BookingReminder.occurrence_start == occurrence_start)
+    if after is not None:
+        query = query.where(BookingReminder.occurrence_start > after)
+    db.session.execute(query.values(status='cancelled').execution_options(synchronize_session=False))
+
+
+@event.listens_for(Session, 'after_commit')
+def _add_committed_reminders(session):
+    jobs = session.info.pop('reminders_scheduled', None)
+    if jobs and _scheduler is not None:
+        _scheduler.add(jobs)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_reminders(session):
+    session.info.pop('reminders_scheduled', None)
+
+
+def _claim(reminder_ids, now):
+    """Mark due reminders sent unless another run already did (no commit)"""
+    claimed = []
+    for reminder_id in reminder_ids:
+        result = db.session.execute(
+            update(BookingReminder)
+            .where(
+                BookingReminder.id == reminder_id,
+                BookingReminder.status == 'scheduled',
+                BookingReminder.fire_at <= now
+            )
+            .values(status='sent', sent_at=now, attempts=BookingReminder.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed.append(reminder_id)
+    return claimed
+
+
+def send_due_reminders(app, reminder_ids=None):
+    """
+    Send reminders whose fire time has come
+
+    Each reminder is claimed with a conditional UPDATE before sending, so the
+    timer thread, another process and a manual /send-reminders call never
+    text a client twice. Failed sends are rescheduled RETRY_DELAY later, up
+    to MAX_ATTEMPTS, while the booking has not started.
+
+    Args:
+        app: Flask application instance
+        reminder_ids: reminders popped from the heap, or None to look up
+                      every due reminder
+
+    Returns:
+        int: number of reminders sent
+    """
+    from routes.send_sms import (
+        send_reminders_concurrently, get_sms_status, DEFAULT_SMS_CONCURRENCY, DEFAULT_SMS_RATE_PER_SECOND
+    )
+
+    if not get_sms_status()['client_configured']:
+        print("Twilio client not configured. Reminders left scheduled.")
+        return 0
+
+    with app.app_context():
+        now = datetime.utcnow()
+        if reminder_ids is None:
+            reminder_ids = [row.id for row in db.session.query(BookingReminder.id).filter(
+                BookingReminder.status == 'scheduled',
+                BookingReminder.fire_at > now - GRACE,
+                BookingReminder.fire_at <= now
+            )]
+
+        claimed = _claim(reminder_ids, now)
+        db.session.commit()
+        if not claimed:
+            return 0
+
+        # A reminder belongs to a booking or to one occurrence of a series
+        rows = db.session.query(
+            BookingReminder.id, BookingReminder.attempts, BookingReminder.booking_id,
+            func.coalesce(Booking.status, BookingSeries.status).label('status'),
+            func.coalesce(Booking.user_name, BookingSeries.user_name).label('user_name'),
+            func.coalesce(Booking.phone_e164, BookingSeries.phone_e164).label('phone_e164'),
+            func.coalesce(Booking.phone_number, BookingSeries.phone_number).label('phone_number'),
+            func.coalesce(Booking.start_time, BookingReminder.occurrence_start).label('start_time')
+        ).outerjoin(Booking, BookingReminder.booking_id == Booking.id).outerjoin(
+            BookingSeries, BookingReminder.series_id == BookingSeries.id
+        ).filter(
+            BookingReminder.id.in_(claimed)
+        ).all()
+
+        reminders, inactive = [], []
+        for row in rows:
+            phone_number = row.phone_e164 or row.phone_number
+            if row.status in ACTIVE_STATUSES and phone_number and row.start_time > now:
+                reminders.append((row.id, phone_number, row.user_name, row.start_time))
+            else:
+                inactive.append(row.id)
+
+        if inactive:
+            db.session.execute(
+                update(BookingReminder).where(BookingReminder.id.in_(inactive))
+                .values(status='cancelled', sent_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+        if not reminders:
+            return 0
+
+        failed = set(send_reminders_concurrently(
+            reminders,
+            max_workers=app.config.get('SMS_MAX_CONCURRENCY', DEFAULT_SMS_CONCURRENCY),
+            rate_per_second=app.config.get('SMS_RATE_PER_SECOND', DEFAULT_SMS_RATE_PER_SECOND)
+        ))
+
+        retry_jobs = []
+        for row in rows:
+            if row.id not in failed:
+                continue
+            retry_at = datetime.utcnow() + RETRY_DELAY
+            if row.attempts < MAX_ATTEMPTS and retry_at < row.start_time:
+                values = dict(status='scheduled', fire_at=retry_at, sent_at=None)
+                retry_jobs.append((retry_at, row.id))
+            else:
+                values = dict(status='failed', sent_at=None)
+            db.session.execute(
+                update(BookingReminder).where(BookingReminder.id == row.id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+        sent = [row for row in rows if row.id not in failed and row.id not in inactive]
+        sent_bookings = [row.booking_id for row in sent if row.booking_id is not None]
+        if sent_bookings:
+            db.session.execute(
+                update(Booking).where(Booking.id.in_(sent_bookings)).values(reminder_sent_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+        if retry_jobs and _scheduler is not None:
+            _scheduler.add(retry_jobs)
+        return len(sent)
+
+
+class ReminderScheduler:
+    """
+    In-memory min-heap of (fire_at, reminder_id) served by one timer thread
+
+    The thread sleeps until the earliest fire time (or the next refresh) and
+    wakes early when add() pushes an earlier reminder. Cancelled reminders
+    stay in the heap and are dropped when their claim fails.
+    """
+
+    def __init__(self, app, horizon=HORIZON, refresh_seconds=REFRESH_SECONDS):
+        self.app = app
+        self.horizon = horizon
+        self.refresh_seconds = refresh_seconds
+
+        self._heap = []
+        self._queued = set()
+        self._horizon_end = None
+        self._next_refresh = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        """Load upcoming reminders and start the timer thread"""
+        if self._thread is not None:
+            return self
+        self._refresh()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add(self, jobs):
+        """Push (fire_at, reminder_id) jobs that fall inside the loaded horizon"""
+        with self._condition:
+            for fire_at, reminder_id in jobs:
+                if reminder_id in self._queued:
+                    continue
+                if self._horizon_end is not None and fire_at >= self._horizon_end:
+                    continue  # Loaded by a later refresh
+                heapq.heappush(self._heap, (fire_at, reminder_id))
+                self._queued.add(reminder_id)
+            self._condition.notify()
+
+    def pending(self):
+        """Number of reminders waiting in the heap"""
+        with self._condition:
+            return len(self._heap)
+
+    def _refresh(self):
+        """Load scheduled reminders up to the horizon from the (status, fire_at) index"""
+        with self.app.app_context():
+            now = datetime.utcnow()
+            horizon_end = now + self.horizon
+
+            # Reminders that were due too long ago (e.g. the app was down) are not sent late
+            db.session.execute(
+                update(BookingReminder)
+                .where(BookingReminder.status == 'scheduled', BookingReminder.fire_at <= now - GRACE)
+                .values(status='missed')
+                .execution_options(synchronize_session=False)
+            )
+
+            # Series occurrences coming into the horizon get their reminder rows now
+            schedule_series_reminders(now - GRACE, horizon_end)
+            db.session.commit()
+
+            rows = db.session.query(BookingReminder.fire_at, BookingReminder.id).filter(
+                BookingReminder.status == 'scheduled',
+                BookingReminder.fire_at < horizon_end
+            ).all()
+
+        with self._condition:
+            self._horizon_end = horizon_end
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+        self.add([(row.fire_at, row.id) for row in rows])
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, reminder_id = heapq.heappop(self._heap)
+            self._queued.discard(reminder_id)
+            due.append(reminder_id)
+        return due
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    due = self._pop_due(datetime.utcnow())
+                    if due or time.monotonic() >= self._next_refresh:
+                        break
+                    wait = self._next_refresh - time.monotonic()
+                    if self._heap:
+                        wait = min(wait, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+                    self._condition.wait(max(wait, 0.01))
+                if self._stopping:
+                    return
+
+            try:
+                if due:
+                    send_due_reminders(self.app, due)
+                else:
+                    self._refresh()
+            except Exception as e:
+                print(f"❌ Reminder scheduler error: {e}")
+                with self._condition:
+                    self._next_refresh = time.monotonic() + self.refresh_seconds
+
+
+def init_reminder_scheduler(app):
+    """Start the reminder scheduler for this process"""
+    global _scheduler
+
+    if _scheduler is None:
+        _scheduler = ReminderScheduler(app).start()
+        print(f"⏰ Reminder scheduler started ({_scheduler.pending()} reminders in the next "
+              f"{int(HORIZON.total_seconds() // 3600)}h, offsets {get_reminder_offsets(app)} minutes)")
+    return _scheduler
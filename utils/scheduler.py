@@ -1,33 +1,21 @@
 """
 Background scheduler setup for SMS reminders
+Reminders are fired by the event-driven scheduler in utils/reminders.py
+instead of polling the booking table. The archiver (utils/archive.py) and
+the backup job (utils/backup.py) start alongside it.
 """
 
-from routes.send_sms import check_and_send_reminders
-
-
-def create_scheduler_function(app):
-    """Create a scheduler function with app context"""
-    
-    def check_and_send_reminders_with_context():
-        """Check for bookings that need reminders and send SMS"""
-        from db.models import Booking
-        check_and_send_reminders(app, Booking)
-    
-    return check_and_send_reminders_with_context
+from utils.archive import init_archiver
+from utils.backup import init_backups
+from utils.reminders import init_reminder_scheduler
 
 
 def init_scheduler(app):
-    """Initialize the background scheduler for SMS reminders"""
+    """Initialize the reminder scheduler for SMS reminders"""
     try:
-        from apscheduler.schedulers.background import BackgroundScheduler
-        
-        scheduler = BackgroundScheduler()
-        reminder_function = create_scheduler_function(app)
-        scheduler.add_job(func=reminder_function, trigger="interval", minutes=5)
-        scheduler.start()
-        
-        print("📅 SMS reminder scheduler started - checking every 5 minutes")
-        return scheduler
+        init_archiver(app)
+        init_backups(app)
+        return init_reminder_scheduler(app)
         
     except Exception as e:
         print(f"❌ Failed to start scheduler: {e}")
@@ -0,0 +1,564 @@
+"""
+Online schema migrations
+Brings an existing database up to the models without dropping anything and
+without stopping the app. Alembic (`flask db upgrade`, also run at boot for
+databases it manages) stays the way deployments migrate; this runner is
+only applied by the `flask schema` commands, e.g. for databases that
+predate Alembic. At boot it just reports the differences.
+
+- Missing tables and indexes are created.
+- Missing columns are added with ALTER TABLE ADD COLUMN, which is instant on
+  SQLite and PostgreSQL; defaults that SQL cannot express (datetime.utcnow,
+  db.func.now()) are backfilled in batches afterwards, and so are columns
+  the models derive from another column (info['derived_from'] =
+  (source column, function), e.g. Booking.email_normalized).
+- A table that needs a full rebuild is copied into a shadow table in
+  batches, while triggers log the rows written meanwhile; the cutover
+  replays that log and swaps the tables in one short transaction.
+
+Every batch is its own transaction that also records a checkpoint in
+schema_migration_progress, so readers (and writers, between batches) keep
+going, and an interrupted backfill or rebuild resumes where it stopped.
+"""
+
+import time
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from flask.cli import AppGroup
+
+from db import db
+from db.models import SchemaMigrationProgress
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PAUSE = 0.05  # Seconds between batches, so other writers get the lock
+
+REBUILD_DIALECTS = ('sqlite', 'postgresql')
+
+progress_table = SchemaMigrationProgress.__table__
+
+
+class DerivedValue:
+    """Backfill value computed per row from another column of the row"""
+
+    def __init__(self, source, derive):
+        self.source = source
+        self.derive = derive
+
+
+def backfill_value(column):
+    """What `flask schema migrate` fills a model column's NULLs with, or None"""
+    if 'derived_from' in column.info:
+        return DerivedValue(*column.info['derived_from'])
+    if column.default is not None and column.default.is_callable:
+        return column.default.arg(None)
+    if column.default is not None:
+        return column.default.arg
+    return None
+
+
+class OnlineMigrator:
+    """Plans and applies non-destructive schema changes for one engine"""
+
+    def __init__(self, engine, metadata=None, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE):
+        self.engine = engine
+        self.metadata = metadata if metadata is not None else db.metadata
+        self.batch_size = batch_size
+        self.pause = pause
+        self._quote = engine.dialect.identifier_preparer.quote
+
+    # ------------------------------------------------------------------ planning
+
+    def plan(self):
+        """
+        Differences between the models and the database that can be fixed online
+
+        Returns:
+            list: ('create_table', table, None), ('add_column', table, column)
+                  and ('create_index', table, index) steps, in dependency order
+        """
+        inspector = sa.inspect(self.engine)
+        existing = set(inspector.get_table_names())
+        steps = []
+
+        for table in self.metadata.sorted_tables:
+            if table.name not in existing:
+                steps.append(('create_table', table.name, None))
+                continue
+
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    steps.append(('add_column', table.name, column.name))
+
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    steps.append(('create_index', table.name, index.name))
+        return steps
+
+    def apply(self, steps, backfill=True):
+        """
+        Apply planned steps; returns the (table, column, value) backfills
+        still to run when backfill=False
+        """
+        pending = []
+        for action, table_name, name in steps:
+            if action == 'create_table':
+                self.metadata.tables[table_name].create(self.engine, checkfirst=True)
+                print(f"✅ Created table {table_name}")
+            elif action == 'add_column':
+                value = self.add_column(table_name, name)
+                if value is not None:
+                    pending.append((table_name, name, value))
+            elif action == 'create_index':
+                index = next(index for index in self.metadata.tables[table_name].indexes if index.name == name)
+                index.create(self.engine, checkfirst=True)
+                print(f"✅ Created index {name}")
+
+        if backfill:
+            for table_name, column_name, value in pending:
+                self.backfill(table_name, column_name, value)
+            return []
+        return pending
+
+    # ------------------------------------------------------------------ columns
+
+    def _literal(self, value):
+        return str(sa.literal(value).compile(dialect=self.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+    def _sql_default(self, column):
+        """The column's default as a SQL literal for ADD COLUMN, or None"""
+        if column.server_default is not None and isinstance(column.server_default, sa.DefaultClause):
+            arg = column.server_default.arg
+            return self._literal(arg) if isinstance(arg, str) else str(arg.compile(dialect=self.engine.dialect))
+        if column.default is not None and column.default.is_scalar:
+            return self._literal(column.default.arg)
+        return None
+
+    def add_column(self, table_name, column_name):
+        """
+        ALTER TABLE ADD COLUMN for a model column (no table rewrite)
+
+        A NOT NULL column needs a constant default to be added that way; one
+        without is added as nullable and left to the model to enforce.
+
+        Returns:
+            The value existing rows still have to be backfilled with (a
+            Python value, SQL expression or DerivedValue), or None
+        """
+        column = self.metadata.tables[table_name].c[column_name]
+        default = self._sql_default(column)
+
+        ddl = (f"ALTER TABLE {self._quote(table_name)} ADD COLUMN {self._quote(column_name)} "
+               f"{column.type.compile(dialect=self.engine.dialect)}")
+        if default is not None:
+            ddl += f" DEFAULT {default}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(ddl)
+        print(f"✅ Added column {table_name}.{column_name}")
+
+        # A constant default was applied by ADD COLUMN itself
+        return backfill_value(column) if default is None else None
+
+    # ------------------------------------------------------------------ progress
+
+    def _checkpoint(self, connection, task, **values):
+        values['updated_at'] = datetime.utcnow()
+        connection.execute(progress_table.update().where(progress_table.c.task == task).values(**values))
+
+    def _start_task(self, task, total):
+        """
+        Load or create the task's checkpoint
+
+        Returns:
+            tuple: (last_id, done_rows, resumed)
+        """
+        progress_table.create(self.engine, checkfirst=True)
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                sa.select(progress_table.c.last_id, progress_table.c.done_rows, progress_table.c.status)
+                .where(progress_table.c.task == task)
+            ).first()
+            if row is not None and row.status == 'running':
+                self._checkpoint(connection, task, total_rows=total)
+                return row.last_id, row.done_rows, True
+
+            now = datetime.utcnow()
+            if row is None:
+                connection.execute(progress_table.insert().values(
+                    task=task, last_id=0, done_rows=0, total_rows=total, status='running',
+                    started_at=now, updated_at=now
+                ))
+            else:
+                self._checkpoint(connection, task, last_id=0, done_rows=0, total_rows=total,
+                                 status='running', started_at=now)
+        return 0, 0, False
+
+    def _report(self, task, done, total, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        percent = f"{done * 100 / total:.0f}%" if total else "100%"
+        print(f"🔄 {task}: {done}/{total} rows ({percent}, {done / elapsed:.0f} rows/s)")
+
+    def status(self):
+        """Checkpoints of every backfill and rebuild (most recent first)"""
+        if progress_table.name not in sa.inspect(self.engine).get_table_names():
+            return []
+        with self.engine.connect() as connection:
+            rows = connection.execute(sa.select(progress_table).order_by(progress_table.c.updated_at.desc()))
+            return [dict(row._mapping) for row in rows]
+
+    # ------------------------------------------------------------------ backfill
+
+    def backfill(self, table_name, column_name, value):
+        """
+        Set `column` to `value` where it is NULL, one primary-key batch per transaction
+
+        A DerivedValue is computed for each row from its source column.
+        """
+        task = f"backfill:{table_name}.{column_name}"
+        derived = isinstance(value, DerivedValue)
+        model = self.metadata.tables[table_name]
+        # Model types (so dates bind and load as dates), but no ORM onupdate defaults
+        source_columns = [sa.column(value.source, model.c[value.source].type)] if derived else []
+        table = sa.table(table_name, sa.column('id'), sa.column(column_name, model.c[column_name].type),
+                         *source_columns)
+        column = table.c[column_name]
+
+        with self.engine.connect() as connection:
+            total = connection.execute(sa.select(sa.func.count()).select_from(table).where(column.is_(None))).scalar()
+        last_id, done, resumed = self._start_task(task, total)
+        if resumed:
+            print(f"↩️ Resuming {task} after id {last_id}")
+            total += done
+
+        started = time.monotonic()
+        while True:
+            with self.engine.begin() as connection:
+                rows = connection.execute(
+                    sa.select(table.c.id, *[table.c[source.name] for source in source_columns])
+                    .where(table.c.id > last_id, column.is_(None))
+                    .order_by(table.c.id).limit(self.batch_size)
+                ).all()
+                if not rows:
+                    self._checkpoint(connection, task, status='done')
+                    break
+                ids = [row[0] for row in rows]
+                if derived:
+                    connection.execute(
+                        table.update().where(table.c.id == sa.bindparam('row_id'))
+                        .values({column_name: sa.bindparam('derived')}),
+                        [{"row_id": row_id, "derived": value.derive(source)} for row_id, source in rows]
+                    )
+                else:
+                    connection.execute(table.update().where(table.c.id.in_(ids)).values({column_name: value}))
+                last_id = ids[-1]
+                done += len(ids)
+                self._checkpoint(connection, task, last_id=last_id, done_rows=done)
+            self._report(task, done, total, started)
+            time.sleep(self.pause)
+        print(f"✅ Backfilled {table_name}.{column_name} ({done} rows)")
+
+    # ------------------------------------------------------------------ rebuild
+
+    def _names(self, table_name):
+        return f"_new_{table_name}", f"_changes_{table_name}"
+
+    def _shadow_table(self, table):
+        """The model table under the shadow name, without indexes (their names are taken)"""
+        shadow_name, _ = self._names(table.name)
+        metadata = sa.MetaData()
+        for foreign_key in table.foreign_keys:
+            # Referenced tables must be known for the FOREIGN KEY clauses
+            if foreign_key.column.table is not table:
+                foreign_key.column.table.to_metadata(metadata)
+        shadow = table.to_metadata(metadata, name=shadow_name)
+        for index in list(shadow.indexes):
+            shadow.indexes.discard(index)
+        if self.engine.dialect.name != 'sqlite':
+            # Constraint names are per schema outside SQLite; renamed back at the cutover
+            for constraint in shadow.constraints:
+                if constraint.name and not isinstance(constraint, sa.PrimaryKeyConstraint):
+                    constraint.name = f"{constraint.name}_new"
+        return shadow
+
+    def _create_change_log(self, connection, table_name):
+        """Change-log table plus triggers recording every row id written from now on"""
+        _, log_name = self._names(table_name)
+        table, log = self._quote(table_name), self._quote(log_name)
+        connection.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {log} (id INTEGER PRIMARY KEY)")
+
+        if self.engine.dialect.name == 'sqlite':
+            for event, rows in (('INSERT', ('NEW',)), ('UPDATE', ('OLD', 'NEW')), ('DELETE', ('OLD',))):
+                inserts = " ".join(f"INSERT OR IGNORE INTO {log} (id) VALUES ({row}.id);" for row in rows)
+                trigger = self._quote(f"{log_name}_{event.lower()}")
+                connection.exec_driver_sql(
+                    f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {table} BEGIN {inserts} END"
+                )
+        else:
+            function = self._quote(f"{log_name}_log")
+            connection.exec_driver_sql(f"""
+                CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP <> 'INSERT' THEN
+                        INSERT INTO {log} (id) VALUES (OLD.id) ON CONFLICT DO NOTHING;
+                    END IF;
+                    IF TG_OP <> 'DELETE' THEN
+                        INSERT INTO {log} (id) VALUES (NEW.id) ON CONFLICT DO NOTHING;
+                    END IF;
+                    RETURN NULL;
+                END $$ LANGUAGE plpgsql
+            """)
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {function} ON {table}")
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER {function} AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {function}()"
+            )
+
+    def _drop_change_log(self, connection, table_name):
+        _, log_name = self._names(table_name)
+        if self.engine.dialect.name == 'sqlite':
+            for event in ('insert', 'update', 'delete'):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {self._quote(f'{log_name}_{event}')}")
+        else:
+            function = self._quote(f"{log_name}_log")
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {function} ON {self._quote(table_name)}")
+            connection.exec_driver_sql(f"DROP FUNCTION IF EXISTS {function}()")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self._quote(log_name)}")
+
+    def _copy_select(self, table, shadow, source_columns):
+        """INSERT INTO shadow SELECT ... with model defaults for columns the old table lacks"""
+        source = sa.table(table.name, *[sa.column(name) for name in source_columns])
+        targets, values = [], []
+        for column in shadow.columns:
+            if column.name in source_columns:
+                targets.append(column.name)
+                values.append(source.c[column.name])
+            elif column.default is not None and column.default.is_scalar:
+                targets.append(column.name)
+                values.append(sa.literal(column.default.arg))
+            elif column.default is not None and column.default.is_clause_element:
+                targets.append(column.name)
+                values.append(column.default.arg)
+        return source, sa.select(*values), targets
+
+    def _replay_changes(self, connection, table, shadow, source_columns, limit=None):
+        """Re-copy logged rows from the old table; returns how many were replayed"""
+        _, log_name = self._names(table.name)
+        log = sa.table(log_name, sa.column('id'))
+        query = sa.select(log.c.id).order_by(log.c.id)
+        ids = connection.execute(query.limit(limit) if limit else query).scalars().all()
+        if not ids:
+            return 0
+
+        source, select, targets = self._copy_select(table, shadow, source_columns)
+        connection.execute(shadow.delete().where(shadow.c.id.in_(ids)))
+        connection.execute(shadow.insert().from_select(targets, select.where(source.c.id.in_(ids))))
+        connection.execute(log.delete().where(log.c.id.in_(ids)))
+        return len(ids)
+
+    def rebuild_table(self, table_name):
+        """
+        Rebuild a table to match its model by copying it in batches
+
+        The app keeps reading and writing the old table during the copy;
+        writes made meanwhile are replayed from the change log, and only the
+        final swap (replay the last changes, drop, rename, recreate indexes)
+        blocks writers. Resumable: run it again after an interruption.
+        """
+        dialect = self.engine.dialect.name
+        if dialect not in REBUILD_DIALECTS:
+            raise NotImplementedError(f"Online table rebuilds are not supported on {dialect}")
+
+        table = self.metadata.tables[table_name]
+        shadow = self._shadow_table(table)
+        task = f"rebuild:{table_name}"
+        source_columns = {column['name'] for column in sa.inspect(self.engine).get_columns(table_name)}
+        source = sa.table(table_name, sa.column('id'))
+
+        with self.engine.connect() as connection:
+            total = connection.execute(sa.select(sa.func.count()).select_from(source)).scalar()
+        last_id, done, resumed = self._start_task(task, total)
+
+        if resumed and sa.inspect(self.engine).has_table(shadow.name):
+            print(f"↩️ Resuming {task} after id {last_id} ({done} rows already copied)")
+        else:
+            last_id = done = 0
+            with self.engine.begin() as connection:
+                self._drop_change_log(connection, table_name)
+                connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self._quote(shadow.name)}")
+                shadow.create(connection)
+                # Log writes before copying, so nothing slips between the batches and the log
+                self._create_change_log(connection, table_name)
+                self._checkpoint(connection, task, last_id=0, done_rows=0)
+
+        # Copy existing rows in primary-key batches; rows inserted from here
+        # on are in the change log, so the copy does not chase the table's tail
+        started = time.monotonic()
+        copy_source, select, targets = self._copy_select(table, shadow, source_columns)
+        with self.engine.connect() as connection:
+            upper_id = connection.execute(sa.select(sa.func.max(copy_source.c.id))).scalar() or 0
+        while True:
+            with self.engine.begin() as connection:
+                ids = connection.execute(
+                    sa.select(copy_source.c.id).where(copy_source.c.id > last_id, copy_source.c.id <= upper_id)
+                    .order_by(copy_source.c.id).limit(self.batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                connection.execute(shadow.insert().from_select(
+                    targets, select.where(copy_source.c.id > last_id, copy_source.c.id <= ids[-1])
+                ))
+                last_id = ids[-1]
+                done += len(ids)
+                self._checkpoint(connection, task, last_id=last_id, done_rows=done)
+            self._report(task, done, total, started)
+            time.sleep(self.pause)
+
+        # Catch up with writes made during the copy, a batch at a time
+        while True:
+            with self.engine.begin() as connection:
+                replayed = self._replay_changes(connection, table, shadow, source_columns, self.batch_size)
+            if replayed < self.batch_size:
+                break
+            print(f"🔄 {task}: replayed {replayed} rows written during the copy")
+            time.sleep(self.pause)
+
+        self._cutover(table, shadow, source_columns, task)
+        print(f"✅ Rebuilt {table_name} ({done} rows copied)")
+
+    def _referencing_foreign_keys(self, table_name):
+        """Foreign keys of other tables pointing at this one (PostgreSQL drops them with the table)"""
+        inspector = sa.inspect(self.engine)
+        return [
+            (other, foreign_key)
+            for other in inspector.get_table_names() if other != table_name
+            for foreign_key in inspector.get_foreign_keys(other)
+            if foreign_key['referred_table'] == table_name and foreign_key.get('name')
+        ]
+
+    def _cutover(self, table, shadow, source_columns, task):
+        """Swap the shadow table in, in one transaction that holds the write lock"""
+        quote = self._quote
+        postgres = self.engine.dialect.name == 'postgresql'
+        foreign_keys = self._referencing_foreign_keys(table.name) if postgres else []
+
+        with self.engine.begin() as connection:
+            if postgres:
+                # Readers continue, writers wait for the swap
+                connection.exec_driver_sql(f"LOCK TABLE {quote(table.name)} IN EXCLUSIVE MODE")
+            # A write first, so SQLite takes its write lock before the last replay
+            self._checkpoint(connection, task, status='cutover')
+
+            self._replay_changes(connection, table, shadow, source_columns)
+            self._drop_change_log(connection, table.name)
+
+            connection.exec_driver_sql(f"DROP TABLE {quote(table.name)}{' CASCADE' if postgres else ''}")
+            connection.exec_driver_sql(f"ALTER TABLE {quote(shadow.name)} RENAME TO {quote(table.name)}")
+            for index in table.indexes:
+                index.create(connection)
+
+            if postgres:
+                for constraint in shadow.constraints:
+                    if constraint.name and constraint.name.endswith('_new'):
+                        connection.exec_driver_sql(
+                            f"ALTER TABLE {quote(table.name)} RENAME CONSTRAINT {quote(constraint.name)} "
+                            f"TO {quote(constraint.name[:-len('_new')])}"
+                        )
+                for other, foreign_key in foreign_keys:
+                    connection.exec_driver_sql(
+                        f"ALTER TABLE {quote(other)} ADD CONSTRAINT {quote(foreign_key['name'])} "
+                        f"FOREIGN KEY ({', '.join(map(quote, foreign_key['constrained_columns']))}) "
+                        f"REFERENCES {quote(table.name)} ({', '.join(map(quote, foreign_key['referred_columns']))})"
+                    )
+                # Copied ids did not advance the new table's sequence
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {quote(table.name)}), 0) + 1, false)"
+                )
+
+            self._checkpoint(connection, task, status='done')
+
+
+def migrate_schema(engine=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Bring the database up to the models without dropping data
+
+    Tables, columns and indexes are added right away (all instant), then
+    column backfills run in batches. Only for `flask schema migrate`: on a
+    database Alembic manages, this would get ahead of its revisions.
+
+    Returns:
+        list: the steps that were applied
+    """
+    migrator = OnlineMigrator(engine if engine is not None else db.engine, batch_size=batch_size)
+    steps = migrator.plan()
+    if steps:
+        print(f"🔧 Schema differs from the models: {len(steps)} online change(s)")
+        migrator.apply(steps)
+
+    # Resume backfills an earlier run left unfinished
+    for row in migrator.status():
+        if row['status'] == 'running' and row['task'].startswith('backfill:'):
+            table_name, column_name = row['task'][len('backfill:'):].split('.', 1)
+            value = backfill_value(migrator.metadata.tables[table_name].c[column_name])
+            if value is not None:
+                migrator.backfill(table_name, column_name, value)
+    return steps
+
+
+def report_schema_drift(engine=None):
+    """
+    Print how the database differs from the models, without changing it
+
+    Returns:
+        list: the planned steps (see OnlineMigrator.plan)
+    """
+    steps = OnlineMigrator(engine if engine is not None else db.engine).plan()
+    if steps:
+        print(f"⚠️ Database schema differs from the models ({len(steps)} change(s)):")
+        for action, table_name, name in steps:
+            print(f"   - {action} {table_name}{'.' + name if name else ''}")
+        print("   Run 'flask db upgrade', or 'flask schema migrate' for a database outside Alembic")
+    return steps
+
+
+# ---------------------------------------------------------------------- CLI
+
+schema_cli = AppGroup('schema', help='Online, resumable schema migrations.')
+
+
+@schema_cli.command('status')
+def schema_status():
+    """Show pending schema changes and migration checkpoints."""
+    migrator = OnlineMigrator(db.engine)
+    steps = migrator.plan()
+    click.echo(f"Pending changes: {len(steps)}")
+    for action, table_name, name in steps:
+        click.echo(f"  - {action} {table_name}{'.' + name if name else ''}")
+    for row in migrator.status():
+        click.echo(f"{row['task']}: {row['done_rows']}/{row['total_rows']} rows, "
+                   f"last id {row['last_id']} ({row['status']}, updated {row['updated_at']})")
+
+
+@schema_cli.command('migrate')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, show_default=True)
+def schema_migrate(batch_size):
+    """Add missing tables, columns and indexes, and run backfills."""
+    migrate_schema(db.engine, batch_size=batch_size)
+    click.echo("✅ Schema is up to date")
+
+
+@schema_cli.command('rebuild')
+@click.argument('table_name')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--pause', type=float, default=DEFAULT_PAUSE, show_default=True, help='Seconds between batches')
+def schema_rebuild(table_name, batch_size, pause):
+    """Rebuild TABLE_NAME to match its model, copying rows in batches (resumable)."""
+    if table_name not in db.metadata.tables:
+        raise click.BadParameter(f"No model table named {table_name}")
+    OnlineMigrator(db.engine, batch_size=batch_size, pause=pause).rebuild_table(table_name)
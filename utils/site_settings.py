@@ -78,3 +78,20 @@ def create_or_update_setting(key, value, language='ENG', description=None):
     
     setting.value = value
     return setting
+
+
+def save_settings(values, language='ENG'):
+    """
+    Write unit (utils.write_queue.run_write) that creates or updates several
+    settings of one language without committing
+    
+    Args:
+        values (dict): Setting values by key
+        language (str): Language code ('ENG' or 'MON')
+    
+    Returns:
+        int: Number of settings written
+    """
+    for key, value in values.items():
+        create_or_update_setting(key, value, language)
+    return len(values)
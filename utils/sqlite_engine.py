@@ -0,0 +1,103 @@
+"""
+SQLite connection tuning
+The pragmas in SQLITE_PRAGMAS (set per config class) are applied to every
+new connection from a 'connect' engine event, so pooled connections, the
+background workers and the scheduled-task scripts all run with the same
+settings: WAL journaling, synchronous=NORMAL, a larger page cache, memory
+mapped reads, a busy timeout instead of immediate "database is locked"
+errors, and temporary tables in memory.
+"""
+
+from sqlalchemy import event
+
+from db import db
+
+# Applied in this order: journal_mode first, since synchronous=NORMAL is only
+# safe in WAL mode
+PRAGMA_ORDER = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Run the PRAGMA statements on a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in sorted(pragmas, key=lambda name: PRAGMA_ORDER.index(name) if name in PRAGMA_ORDER else len(PRAGMA_ORDER)):
+            cursor.execute(f"PRAGMA {name}={pragmas[name]}")
+    finally:
+        cursor.close()
+
+
+def configure_sqlite_engine(engine, pragmas):
+    """
+    Apply `pragmas` to every connection the engine opens from now on
+
+    Returns:
+        bool: False for engines that are not SQLite (left untouched)
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return False
+
+    pragmas = dict(pragmas)
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    # Connections opened before the listener was added get the pragmas on their next checkout
+    engine.pool.dispose()
+    return True
+
+
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    # pysqlite would otherwise only BEGIN right before DML, so a SAVEPOINT
+    # issued first would run outside any transaction and RELEASE would commit
+    dbapi_connection.isolation_level = None
+
+
+def _begin_transaction(connection):
+    mode = connection.get_execution_options().get('sqlite_begin', 'DEFERRED')
+    connection.exec_driver_sql(f"BEGIN {mode}")
+
+
+def enable_sqlite_transactions(engine):
+    """
+    Let SQLAlchemy issue BEGIN itself on a SQLite engine (SQLAlchemy's pysqlite recipe)
+
+    With it, SAVEPOINTs nest inside the outer transaction and RELEASE no
+    longer commits. Pass execution_options={'sqlite_begin': 'IMMEDIATE'}
+    to take the write lock when the transaction starts.
+
+    Returns:
+        bool: False for engines that are not SQLite (left untouched)
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    if not event.contains(engine, 'begin', _begin_transaction):
+        event.listen(engine, 'connect', _disable_pysqlite_transactions)
+        event.listen(engine, 'begin', _begin_transaction)
+        # Pooled connections were opened in pysqlite's own transaction mode
+        engine.pool.dispose()
+    return True
+
+
+def get_sqlite_pragmas(engine):
+    """The pragma values a connection of this engine actually runs with"""
+    if engine.dialect.name != 'sqlite':
+        return {}
+
+    with engine.connect() as connection:
+        return {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in PRAGMA_ORDER
+        }
+
+
+def init_sqlite_engine(app):
+    """Tune the app's SQLite engines with app.config['SQLITE_PRAGMAS'] (call after db.init_app)"""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return False
+
+    with app.app_context():
+        configured = [configure_sqlite_engine(engine, pragmas) for engine in db.engines.values()]
+    return any(configured)
@@ -0,0 +1,247 @@
+"""
+Group-commit write queue for SQLite
+SQLite lets one connection write at a time and every commit pays its own
+fsync, so concurrent request threads mostly wait on each other. With
+SQLITE_GROUP_COMMIT on, request threads hand their write transaction to a
+single writer thread instead. The writer runs whatever units are queued,
+each inside its own SAVEPOINT of one outer transaction, commits them
+together with one fsync and reports every unit's result, or its own
+exception, back to the waiting request. The writer has an engine of its
+own running SQLAlchemy's pysqlite transaction recipe (utils/sqlite_engine.py):
+without it pysqlite never sends BEGIN before a SAVEPOINT and each RELEASE
+commits. db.engine stays in pysqlite's default mode, where a read does not
+open a transaction, so request threads that still commit directly do not
+hold read snapshots that a later write would conflict with.
+
+Write units are functions that change db.session without committing and
+return plain values (ids, counts), not ORM objects: they run on the writer
+thread's session.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import sqlalchemy as sa
+
+from db import db
+from utils.sqlite_engine import configure_sqlite_engine, enable_sqlite_transactions
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_DELAY = 0.002   # Seconds the writer waits for more units before committing
+DEFAULT_TIMEOUT = 10        # Seconds a request waits for its commit
+
+# Writer running in this process, or None when writes commit in the request thread
+_writer = None
+
+
+def _info_snapshot(session):
+    """Lengths of the lists hooks keep in session.info (outbox, reminders, events)"""
+    return {key: len(value) for key, value in session.info.items() if isinstance(value, list)}
+
+
+def _restore_info(session, snapshot):
+    """Forget what a rolled-back unit added to session.info"""
+    for key in list(session.info):
+        value = session.info[key]
+        if isinstance(value, list):
+            if key in snapshot:
+                del value[snapshot[key]:]
+            else:
+                del session.info[key]
+        elif key not in snapshot:
+            del session.info[key]
+
+
+def create_writer_engine(app):
+    """An engine on the app's database for the writer thread, with the same pragmas and explicit BEGIN"""
+    with app.app_context():
+        engine = sa.create_engine(db.engine.url)
+    configure_sqlite_engine(engine, app.config.get('SQLITE_PRAGMAS'))
+    enable_sqlite_transactions(engine)
+    return engine
+
+
+class GroupCommitWriter:
+    """
+    One thread that owns all writes and commits them in groups
+
+    While a commit is in progress new units queue up and go into the next
+    group, so under load many requests share one fsync, and a lone request
+    waits at most `max_delay` longer than a direct commit.
+    """
+
+    def __init__(self, app, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY, timeout=DEFAULT_TIMEOUT):
+        self.app = app
+        self.engine = create_writer_engine(app)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"units": 0, "failed": 0, "commits": 0, "largest_group": 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+        self.engine.dispose()
+
+    def submit(self, unit, *args, **kwargs):
+        """Queue a write unit; returns a Future for its result"""
+        future = Future()
+        self._queue.put((future, unit, args, kwargs))
+        return future
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["units_per_commit"] = round(stats["units"] / stats["commits"], 2) if stats["commits"] else 0
+        return stats
+
+    def _collect(self, first):
+        """The first unit plus whatever else arrives within max_delay, up to max_batch"""
+        group = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(group) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Stop after this group
+                break
+            group.append(item)
+        return group
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                try:
+                    self._commit_group(self._collect(first))
+                except Exception as e:
+                    print(f"❌ Group commit writer error: {e}")
+                finally:
+                    db.session.remove()
+
+    def _commit_group(self, group):
+        # The units use db.session: make this thread's one the writer engine's
+        db.session.remove()
+        session = db.session(bind=self.engine)
+        # One outer transaction holding the write lock from the start, so
+        # each unit's SAVEPOINT nests in it and nothing is durable before
+        # the commit below
+        session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+        done = []
+        for future, unit, args, kwargs in group:
+            if not future.set_running_or_notify_cancel():
+                continue
+            snapshot = _info_snapshot(session)
+            savepoint = session.begin_nested()
+            try:
+                result = unit(*args, **kwargs)
+                savepoint.commit()
+                done.append((future, result))
+            except Exception as e:
+                # Only this unit is undone; the rest of the group still commits
+                if savepoint.is_active:
+                    savepoint.rollback()
+                _restore_info(session, snapshot)
+                future.set_exception(e)
+
+        try:
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            failed = len(group)
+        else:
+            for future, result in done:
+                future.set_result(result)
+            failed = len(group) - len(done)
+
+        with self._lock:
+            self._stats["units"] += len(group)
+            self._stats["failed"] += failed
+            self._stats["commits"] += 1
+            self._stats["largest_group"] = max(self._stats["largest_group"], len(group))
+
+
+def run_write(unit, *args, **kwargs):
+    """
+    Run a write unit and commit it
+
+    Goes through the group-commit writer when it is enabled, otherwise runs
+    in this thread and commits directly (rolling back on error). Either way
+    the unit's return value comes back, or its exception is raised here.
+    """
+    writer = _writer
+    if writer is None:
+        try:
+            result = unit(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+
+    return writer.submit(unit, *args, **kwargs).result(timeout=writer.timeout)
+
+
+def get_write_queue_status():
+    """Group-commit counters for the status endpoints (None when disabled)"""
+    return _writer.stats() if _writer is not None else None
+
+
+def init_write_queue(app):
+    """Start the group-commit writer if SQLITE_GROUP_COMMIT is on"""
+    global _writer
+
+    if not app.config.get('SQLITE_GROUP_COMMIT'):
+        return None
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    if not uri.startswith('sqlite'):
+        print("⚠️ SQLITE_GROUP_COMMIT only applies to SQLite, writes commit directly")
+        return None
+    if sa.engine.make_url(uri).database in (None, '', ':memory:'):
+        print("⚠️ SQLITE_GROUP_COMMIT needs a database file (the writer opens its own connection), "
+              "writes commit directly")
+        return None
+
+    if _writer is None:
+        _writer = GroupCommitWriter(
+            app,
+            max_batch=int(app.config.get('GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH)),
+            max_delay=float(app.config.get('GROUP_COMMIT_MAX_DELAY_MS', DEFAULT_MAX_DELAY * 1000)) / 1000,
+            timeout=float(app.config.get('GROUP_COMMIT_TIMEOUT', DEFAULT_TIMEOUT))
+        ).start()
+        atexit.register(_writer.stop)
+        print(f"✍️ Group-commit writer started (up to {_writer.max_batch} writes per commit, "
+              f"{_writer.max_delay * 1000:g}ms max delay)")
+    return _writer
+
+
+def stop_write_queue():
+    """Commit what is queued and go back to committing in request threads"""
+    global _writer
+
+    if _writer is not None:
+        _writer.stop()
+        _writer = None